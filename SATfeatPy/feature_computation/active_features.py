@@ -1,5 +1,11 @@
 # sys.path.append("/Users/bprovan/Insight/SAT-features/feature_computation")
-from feature_computation.enums import VarState, ClauseState
+from array import array
+
+import numpy as np
+
+from feature_computation import reordering
+from feature_computation.cnf import CNF, compact_variables
+from feature_computation.enums import VAR_UNASSIGNED, CLAUSE_ACTIVE, CLAUSE_PASSIVE
 
 """
 First we need to compute the active variables and clauses
@@ -9,111 +15,134 @@ This information is used when probing, and performing unit propagation.
 """
 
 
-def get_active_features(sat_instance, clauses, c, v):
-
-    # initialize the lists that contain information on the clauses and variables
-    clause_states = [ClauseState.PASSIVE] * c
-    num_active_clauses_with_var = [0] * (v + 1)
-    num_bin_clauses_with_var = [0] * (v + 1)
-    clause_lengths = [0] * c
-
-    unit_clauses = []
-
-    # These are used at some point...
-    num_unit_clauses = 0
-    num_binary_clauses = 0
-    num_ternary_clauses = 0
-
-    clauses_with_positive_var = []
-    clauses_with_negative_var = []
-
-    for k in range(v+1):
-        clauses_with_positive_var.append([])
-        clauses_with_negative_var.append([])
-
-    # basically we want to remove literals if they appear twice
-    # and remove the clause if it is a tautology (if variable both positive and negated appears in the clause)
-
-    # sort the clauses. Make it a set, to remove duplicates, and iterate pairwaise,
-    # check if variables are negations, and if so we have a tautology
-
-    for clause_i in range(c):
-
-        clause = clauses[clause_i]
-        num_literals = len(clause)
-        clause.sort(key=lambda x: abs(x))
-
-        # mark and remove redundant literals
-        for i in range(num_literals -1):
-            j = i+1
-            if clause[i] == -clause[j]:
-                # we have a tautology
-                clauses[clause_i] = []
-                break
-        # remove duplicates
-        clause = list(set(clause))
-        clauses[clause_i] = clause
-        # print(clause)
-
-    # remove tautologies
-    clauses = [c for c in clauses if len(c) > 0]
-    num_active_clauses = len(clauses)
-
-    # Clause is sorted in terms of literals, and duplicates have been removed
-
-    # Iterate through clauses again, add to binary clauses, count binary and ternary clauses
-    for clause_i in range(len(clauses)):
-
-        clause = clauses[clause_i]
-        num_literals = len(clause)
-        # set length of clause and
-        clause_lengths[clause_i] = num_literals
-        clause_states[clause_i] = ClauseState.ACTIVE
-
-        if num_literals == 1:
-            unit_clauses.append(clause_i)
-            num_unit_clauses += 1
-        if num_literals == 2:
-
-            for i in range(num_literals):
-                num_bin_clauses_with_var[abs(clause[i])] += 1
-            num_binary_clauses += 1
-        if num_literals == 3:
-            num_ternary_clauses += 1
-
-        # now go through all literals in the clause, add number of active clauses with the variable
-        # and mark the clauses with positive literals, and negative literals
-        for literal in clause:
-
-            if literal < 0:
-                clauses_with_negative_var[abs(literal)].append(clause_i)
-            else:
-                clauses_with_positive_var[literal].append(clause_i)
-
-            num_active_clauses_with_var[abs(literal)] += 1
-
-    # filter out the ignored clauses
-
-    # Now remove the redundant variables
-    num_active_vars = v
-    var_states = [VarState.UNASSIGNED] * (v+1)
-
-    var_states[0] = VarState.IRRELEVANT
-
-    # check if the variable is present in any clause
-    for i in range(1, v+1):
-        if num_active_clauses_with_var[i] == 0:
-            var_states[i] = VarState.IRRELEVANT
-            num_active_vars -= 1
-        else:
-            # redundant
-            var_states[i] = VarState.UNASSIGNED
+def get_active_features(sat_instance, literals, clause_offsets, c, v, compact=False, reorder=False):
+    """
+    Normalize the parsed clauses and set up the clause and variable states of the sat instance.
+    :param sat_instance:
+    :param literals: literals of the parsed clauses, in CSR form
+    :param clause_offsets: clause offsets of the parsed clauses
+    :param c: number of clauses in the header
+    :param v: number of variables in the header
+    :param compact: renumber the variables left in the normalized clauses to 1..v', and drop the removed clauses. The
+    clause and variable states are sized by the compacted counts, the counts of the sat instance stay the header ones.
+    :param reorder: renumber the variables and clauses by a locality improving order, see reordering
+    :return:
+    """
+    literals, clause_offsets, num_active_clauses_with_var, num_bin_clauses_with_var = \
+        normalize_clauses(literals, clause_offsets, v)
+
+    if compact:
+        literals, var_map = compact_variables(literals, v)
+        num_active_clauses_with_var = num_active_clauses_with_var[var_map]
+        num_bin_clauses_with_var = num_bin_clauses_with_var[var_map]
+        sat_instance.var_map = var_map
+        c = len(clause_offsets) - 1
+        v = len(var_map) - 1
+
+    if reorder:
+        var_order, clause_order = reordering.rcm_order(literals, clause_offsets, v)
+        literals, clause_offsets = reordering.reorder_clauses(literals, clause_offsets, var_order, clause_order)
+        num_active_clauses_with_var = num_active_clauses_with_var[var_order]
+        num_bin_clauses_with_var = num_bin_clauses_with_var[var_order]
+        sat_instance.var_map = var_order if sat_instance.var_map is None else sat_instance.var_map[var_order]
+        sat_instance.clause_map = clause_order
+
+    # the core data structure builds the lists of clauses with positive and negative literals of each variable
+    cnf = CNF(literals, clause_offsets, v)
+
+    return set_active_features(sat_instance, cnf, c, v, num_active_clauses_with_var, num_bin_clauses_with_var)
+
+
+def normalize_clauses(literals, clause_offsets, v):
+    """
+    Sort the literals of each clause by variable, remove duplicate literals, and remove tautologies (clauses with a
+    variable both positive and negated) and empty clauses. All clauses are processed at once on the CSR arrays.
+
+    The number of clauses, and of binary clauses, each variable occurs in is counted on the normalized clauses.
+    :param literals:
+    :param clause_offsets:
+    :param v: number of variables
+    :return: normalized literals and clause offsets, and the two counts indexed by variable
+    """
+    num_clauses = len(clause_offsets) - 1
+    clause_ids = np.repeat(np.arange(num_clauses, dtype=np.int64), np.diff(clause_offsets))
+    variables = np.abs(literals).astype(np.int64)
+
+    # sort by (clause, variable, sign), so that duplicates and complementary literals are adjacent
+    # the clauses are already in order, so this only sorts the literals within each clause
+    order = np.argsort((clause_ids * (v + 1) + variables) * 2 + (literals > 0), kind="stable")
+    literals = literals[order]
+    variables = variables[order]
+
+    same_clause = clause_ids[1:] == clause_ids[:-1]
+    same_var = same_clause & (variables[1:] == variables[:-1])
+    duplicate = same_var & (literals[1:] == literals[:-1])
+    complement = same_var & ~duplicate
+
+    keep = np.ones(len(literals), dtype=bool)
+    keep[1:] = ~duplicate
+    tautology = np.zeros(num_clauses, dtype=bool)
+    tautology[clause_ids[1:][complement]] = True
+    keep &= ~tautology[clause_ids]
+
+    literals = literals[keep]
+    variables = variables[keep]
+    clause_ids = clause_ids[keep]
+
+    # tautologies and empty clauses are left with no literals, and are dropped
+    lengths = np.bincount(clause_ids, minlength=num_clauses)
+    lengths = lengths[lengths > 0]
+    clause_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=clause_offsets[1:])
+
+    num_active_clauses_with_var = np.bincount(variables, minlength=v + 1)
+    num_bin_clauses_with_var = np.bincount(variables[np.repeat(lengths == 2, lengths)], minlength=v + 1)
+
+    return literals, clause_offsets, num_active_clauses_with_var, num_bin_clauses_with_var
+
+
+def set_active_features(sat_instance, cnf, c, v, num_active_clauses_with_var=None, num_bin_clauses_with_var=None):
+    """
+    Set up the clause and variable states of the sat instance from a CNF whose clauses have already been normalized
+    (sorted, duplicates and tautologies removed), e.g. one loaded from the instance cache.
+    :param sat_instance:
+    :param cnf: CNF core of the normalized clauses
+    :param c: number of clauses in the header, or of the cnf if its variables are compacted
+    :param v: number of variables of the cnf
+    :param num_active_clauses_with_var: number of clauses each variable occurs in, counted from the cnf if not given
+    :param num_bin_clauses_with_var: number of binary clauses each variable occurs in, counted from the cnf if not given
+    :return:
+    """
+    num_clauses = cnf.num_clauses
+    lengths = cnf.clause_lengths()
+
+    # clauses removed as tautologies leave passive entries of length 0 at the end
+    # the states are int8 arrays of the integer state codes (see enums), that numpy can view without a copy
+    clause_states = array("b", bytes([CLAUSE_ACTIVE]) * num_clauses + bytes([CLAUSE_PASSIVE]) * (c - num_clauses))
+    clause_lengths = lengths.tolist() + [0] * (c - num_clauses)
+
+    unit_clauses = np.flatnonzero(lengths == 1).tolist()
+
+    # number of active clauses, and of binary clauses, that each variable occurs in
+    if num_active_clauses_with_var is None:
+        num_active_clauses_with_var = cnf.variable_occurrences()
+    if num_bin_clauses_with_var is None:
+        binary_literals = np.repeat(lengths == 2, lengths)
+        num_bin_clauses_with_var = np.bincount(cnf.literal_variables()[binary_literals], minlength=v + 1)
+    num_active_clauses_with_var = num_active_clauses_with_var.tolist()
+    num_bin_clauses_with_var = num_bin_clauses_with_var.tolist()
+
+    num_active_clauses = num_clauses
+
+    # variables not present in any clause are irrelevant
+    num_active_vars = int(np.count_nonzero(cnf.var_states == VAR_UNASSIGNED))
+    var_states = array("b", cnf.var_states.tobytes())
 
     # set the satinstance class variables
+    sat_instance.cnf = cnf
     sat_instance.num_active_vars = num_active_vars
     sat_instance.num_active_clauses = num_active_clauses
 
-    sat_instance.clauses = clauses
     sat_instance.clause_states = clause_states
     sat_instance.clause_lengths = clause_lengths
     sat_instance.num_active_clauses_with_var = num_active_clauses_with_var
@@ -122,8 +151,5 @@ def get_active_features(sat_instance, clauses, c, v):
     sat_instance.unit_clauses = unit_clauses
 
     sat_instance.var_states = var_states
-    # all of the clauses that contain a positive version of this variable
-    sat_instance.clauses_with_positive_var = clauses_with_positive_var
-    sat_instance.clauses_with_negative_var = clauses_with_negative_var
 
-    return num_active_vars, num_active_clauses, clause_states, clauses, num_bin_clauses_with_var, var_states
+    return num_active_vars, num_active_clauses, clause_states, cnf, num_bin_clauses_with_var, var_states
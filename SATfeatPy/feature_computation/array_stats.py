@@ -1,5 +1,6 @@
 import statistics as stats
 import math
+import numpy as np
 import scipy.stats as sci_stats
 """
 File to control the computation and aggregation of statistics for lists of values.
@@ -50,12 +51,7 @@ def scipy_entropy_discrete(l, num_outcomes):
     :param num_outcomes: The total possible number of outcomes
     :return: Entropy of l
     """
-    p = [0] * num_outcomes
-
-    for elem in l:
-        p[elem] += 1
-
-    p = [x/len(l) for x in p]
+    p = np.bincount(np.asarray(l, dtype=np.int64), minlength=num_outcomes) / len(l)
 
     entropy = sci_stats.entropy(pk=p)
     return entropy
@@ -168,3 +164,164 @@ def entropy_int_array(l,number_of_outcomes):
 
     return -1 * entropy
 
+
+# distinct values a ValueSketch keeps exactly, and the relative error of its buckets past that
+MAX_EXACT_VALUES = 1 << 16
+RELATIVE_ACCURACY = 0.01
+
+
+def value_counts(values):
+    """
+    :param values: numpy array
+    :return: the distinct values, sorted, and the number of times each occurs
+    """
+    if values.dtype.kind in "iu" and len(values) > 0:
+        low = values.min()
+        span = int(values.max()) - int(low)
+        # counting is cheaper than sorting when the values are dense
+        if span <= max(len(values), MAX_EXACT_VALUES):
+            counts = np.bincount((values - low).astype(np.int64), minlength=span + 1)
+            present = np.flatnonzero(counts)
+            return present + low, counts[present]
+    return np.unique(values, return_counts=True)
+
+
+def sum_counts(values, counts):
+    """
+    :param values: numpy array of values, possibly repeated
+    :param counts: count of each value
+    :return: the distinct values, sorted, and their total counts
+    """
+    distinct, inverse = np.unique(values, return_inverse=True)
+    return distinct, np.bincount(inverse.ravel(), weights=counts, minlength=len(distinct)).astype(np.int64)
+
+
+class ValueSketch:
+    """
+    Mergeable one pass summary of a stream of non-negative values (graph node degrees or edge weights), chunk by
+    chunk. Each chunk is reduced to its distinct values and their counts, from which the count, zeros, minimum,
+    maximum, mean and variance (merged as in Chan et al.), and the sums for the entropy of the values taken as a
+    distribution are exact.
+
+    The mode and the quartiles come from a histogram of the values, exact as long as there are at most max_exact
+    distinct values. Past that, the values are mapped to logarithmic buckets (as in DDSketch) and replaced by their
+    bucket's representative, within relative_accuracy of them, so the mode, its rate and the quartiles are those of
+    the bucketed values.
+    """
+
+    def __init__(self, max_exact=MAX_EXACT_VALUES, relative_accuracy=RELATIVE_ACCURACY):
+        self.max_exact = max_exact
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.bucketed = False
+
+        self.count = 0
+        self.zeros = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        # sums of v and of v log v, for the entropy
+        self.total = 0.0
+        self.total_log = 0.0
+
+        # histogram, None until the first values
+        self.values = None
+        self.counts = None
+
+    def update(self, chunk):
+        """
+        :param chunk: array or list of values
+        """
+        values, counts = value_counts(np.asarray(chunk).ravel())
+        if len(values) == 0:
+            return
+        count = int(counts.sum())
+        mean = float(np.dot(values, counts)) / count
+        m2 = float(np.dot(counts, (values - mean) ** 2))
+        positive = values > 0
+        total_log = float(np.dot(counts[positive], values[positive] * np.log(values[positive])))
+
+        self._merge_moments(count, int(counts[0]) if values[0] == 0 else 0, values[0], values[-1], mean, m2,
+                            float(np.dot(values, counts)), total_log)
+        self._merge_histogram(values, counts, False)
+
+    def merge(self, other):
+        """
+        Add the values summarised by another sketch
+        :param other: ValueSketch
+        """
+        if other.count == 0:
+            return
+        self._merge_moments(other.count, other.zeros, other.min, other.max, other.mean, other.m2, other.total,
+                            other.total_log)
+        self._merge_histogram(other.values, other.counts, other.bucketed)
+
+    def _merge_moments(self, count, zeros, min_val, max_val, mean, m2, total, total_log):
+        new_count = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / new_count
+        self.mean += delta * count / new_count
+        self.count = new_count
+        self.zeros += zeros
+        self.min = min_val if self.min is None else min(self.min, min_val)
+        self.max = max_val if self.max is None else max(self.max, max_val)
+        self.total += total
+        self.total_log += total_log
+
+    def bucket(self, values):
+        """
+        :param values: array of values
+        :return: the representative of the logarithmic bucket of each value (0 for 0)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        representatives = np.zeros(len(values))
+        positive = values > 0
+        index = np.ceil(np.log(values[positive]) / np.log(self.gamma))
+        representatives[positive] = 2 * self.gamma ** index / (self.gamma + 1)
+        return representatives
+
+    def _merge_histogram(self, values, counts, bucketed):
+        if bucketed and not self.bucketed:
+            self._bucket_histogram()
+        elif self.bucketed and not bucketed:
+            values = self.bucket(values)
+
+        if self.values is not None:
+            values = np.concatenate((self.values, values))
+            counts = np.concatenate((self.counts, counts))
+        self.values, self.counts = sum_counts(values, counts)
+
+        if not self.bucketed and len(self.values) > self.max_exact:
+            self._bucket_histogram()
+
+    def _bucket_histogram(self):
+        self.bucketed = True
+        if self.values is not None:
+            self.values, self.counts = sum_counts(self.bucket(self.values), self.counts)
+
+    def quantiles(self, probs=(0.25, 0.5, 0.75), alphap=0.4, betap=0.4):
+        """
+        :return: the quantiles of the values, as scipy.stats.mstats.mquantiles computes them
+        """
+        if self.count == 1:
+            return [self.values[0]] * len(probs)
+        probs = np.asarray(probs)
+        aleph = self.count * probs + alphap + probs * (1 - alphap - betap)
+        k = np.floor(aleph.clip(1, self.count - 1)).astype(np.int64)
+        gamma = (aleph - k).clip(0, 1)
+
+        ends = np.cumsum(self.counts)
+        below = self.values[np.searchsorted(ends, k - 1, side="right")]
+        above = self.values[np.searchsorted(ends, k, side="right")]
+        return ((1 - gamma) * below + gamma * above).tolist()
+
+    def stats(self):
+        """
+        :return: minimum, maximum, mode (the smallest of the most frequent values), mean, standard deviation, number of
+        zeros, entropy of the values as a distribution, quartiles, and the rate of the mode
+        """
+        mode_index = int(np.argmax(self.counts))
+        entropy = math.log(self.total) - self.total_log / self.total if self.total > 0 else math.nan
+        q1, q2, q3 = self.quantiles()
+        return [self.min, self.max, self.values[mode_index], self.mean, math.sqrt(self.m2 / self.count), self.zeros,
+                entropy, q1, q2, q3, self.counts[mode_index] / self.count]
@@ -1,81 +1,50 @@
+import numpy as np
 
 
-def compute_balance_features(clauses, c, v):
+def compute_balance_features(cnf, c, v):
     """
     Computes the balance features
-    :param clauses: List of clauses of the cnf
+    :param cnf: CNF core of the cnf
     :param c: number of clauses
     :param v: number of variables
     :return:
     """
+    literals = cnf.literals
+    clause_ids = cnf.literal_clause_ids()
+    variables = cnf.literal_variables()
+    clause_lengths = cnf.clause_lengths()
+    positive = literals > 0
 
-    variables_pos_count = [0] * v
-    variables_neg_count = [0] * v
-    pos_neg_variable_ratios = []
-    pos_neg_variable_balance = []
-    # positive and negative counts of variables (literal instances)
-
-    pos_neg_clause_ratios = []
-    pos_neg_clause_balance = []
-    num_horn_clauses = 0
-    num_binary_clauses = 0
-    num_ternary_clauses = 0
-
-    horn_clause_variable_count = [0] * v
-
-    for clause in clauses:
-
-        if len(clause) == 2:
-            num_binary_clauses += 1
-        if len(clause) == 3:
-            num_ternary_clauses += 1
-
-        pos = 0
-        neg = 0
+    num_binary_clauses = int(np.count_nonzero(clause_lengths == 2))
+    num_ternary_clauses = int(np.count_nonzero(clause_lengths == 3))
 
-        for literal in clause:
-            if literal < 0:
-                neg += 1
-                literal = abs(literal)
+    # positive and negative literals of each clause
+    pos = np.bincount(clause_ids[positive], minlength=cnf.num_clauses)
+    neg = clause_lengths - pos
 
-                variables_neg_count[literal - 1] += 1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pos_neg_clause_ratios = np.where(neg == 0, 1, pos / neg)
+    pos_neg_clause_balance = 2.0 * np.abs(0.5 - pos / (pos + neg))
 
-            else:
-                pos += 1
-                variables_pos_count[literal - 1] += 1
+    # clause is a horn clause if it has at most 1 positive literal
+    horn = pos <= 1
+    num_horn_clauses = int(np.count_nonzero(horn))
+    horn_clause_variable_count = np.bincount(variables[horn[clause_ids]] - 1, minlength=v)
 
-        if neg == 0:
-            ratio = 1
-        else:
-            ratio = pos / neg
-        pos_neg_clause_ratios.append(ratio)
-
-        pos_neg_clause_balance.append(2.0 * abs(0.5 - (pos / (pos + neg))))
-
-        # clause is a horn clause if it has at most 1 positive literal
-        if pos <= 1:
-            num_horn_clauses += 1
-
-            for literal in clause:
-                horn_clause_variable_count[abs(literal) - 1] += 1
+    # positive and negative counts of variables (literal instances)
+    variables_pos_count = np.bincount(variables[positive] - 1, minlength=v)
+    variables_neg_count = np.bincount(variables[~positive] - 1, minlength=v)
 
     # calculate the ratio of positive and negative literals
     # per variable
-    for i in range(v):
-        pos_instances = variables_pos_count[i]
-        neg_instances = variables_neg_count[i]
-        if neg_instances == 0:
-            vi_ratio = 1
-        else:
-            vi_ratio = pos_instances / neg_instances
-
-        pos_neg_variable_ratios.append(vi_ratio)
-
-        if (pos_instances == 0) and (neg_instances == 0):
-            pos_neg_variable_balance.append(0.0)
-        else:
-            pos_neg_variable_balance.append(2.0 * abs(0.5 - (pos_instances / (pos_instances + neg_instances))))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pos_neg_variable_ratios = np.where(variables_neg_count == 0, 1,
+                                           variables_pos_count / variables_neg_count)
+        pos_neg_variable_balance = np.where(variables_pos_count + variables_neg_count == 0, 0.0,
+                                            2.0 * np.abs(0.5 - variables_pos_count /
+                                                         (variables_pos_count + variables_neg_count)))
 
     # dictionary could be a cleaner way to format and return the results
-    return pos_neg_clause_ratios, pos_neg_clause_balance, pos_neg_variable_ratios, pos_neg_variable_balance, \
-        num_binary_clauses, num_ternary_clauses, num_horn_clauses, horn_clause_variable_count
+    return pos_neg_clause_ratios.tolist(), pos_neg_clause_balance.tolist(), pos_neg_variable_ratios.tolist(), \
+        pos_neg_variable_balance.tolist(), num_binary_clauses, num_ternary_clauses, num_horn_clauses, \
+        horn_clause_variable_count.tolist()
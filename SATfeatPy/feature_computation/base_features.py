@@ -29,7 +29,7 @@ def write_entropy_continous(l, name, features_dict):
     features_dict[name + "_entropy"] = entropy
 
 
-def compute_base_features(preprocess, clauses, c, v, num_active_vars, num_active_clauses):
+def compute_base_features(preprocess, cnf, c, v, num_active_vars, num_active_clauses):
     features_dict = {}
 
     # 1-3
@@ -45,7 +45,7 @@ def compute_base_features(preprocess, clauses, c, v, num_active_vars, num_active
         v = num_active_vars
 
     # Variable Clause Graph features
-    vcg_v_node_degrees, vcg_c_node_degrees = graph_features.create_vcg(clauses, c, v)
+    vcg_v_node_degrees, vcg_c_node_degrees = graph_features.create_vcg(cnf, c, v)
     # variable node degrees divided by number of active clauses
     vcg_v_node_degrees_norm = [x / c for x in vcg_v_node_degrees]
     # 4-8
@@ -61,7 +61,7 @@ def compute_base_features(preprocess, clauses, c, v, num_active_vars, num_active
     # write_entropy(vcg_c_node_degrees, "vcg_clause", features_dict, c, v)
 
     # Variable graph features
-    vg_node_degrees = graph_features.create_vg(clauses)
+    vg_node_degrees = graph_features.create_vg(cnf)
     # 14-17
     # variable node degrees divided by number of active clauses
     vg_node_degrees_norm = [x / c for x in vg_node_degrees]
@@ -71,7 +71,7 @@ def compute_base_features(preprocess, clauses, c, v, num_active_vars, num_active
     # Balance features
     pos_neg_clause_ratios, pos_neg_clause_balance, pos_neg_variable_ratios, pos_neg_variable_balance, \
         num_binary_clauses, num_ternary_clauses, num_horn_clauses, horn_clause_variable_count = \
-        balance_features.compute_balance_features(clauses, c, v)
+        balance_features.compute_balance_features(cnf, c, v)
     # 18-20
     write_stats(pos_neg_clause_balance, "pnc_ratio", features_dict)
     # write_entropy_float(pos_neg_clause_balance, "pnc_ratio", features_dict, c)
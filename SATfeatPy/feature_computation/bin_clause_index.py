@@ -0,0 +1,116 @@
+import heapq
+
+from feature_computation.enums import VAR_UNASSIGNED
+
+"""
+Selection of the unassigned variables that occur in the most binary clauses, used by the unit propagation probe.
+
+The order of the selected variables is the one of the original insertion sort over all variables: the first k-1 are the
+best by (number of binary clauses, variable index), both descending. The insertion sort always inserts, dropping the
+last entry when the array is full, so the last slot holds the highest unassigned variable, unless that variable is
+already among the first k-1, in which case it holds the k-th best.
+"""
+
+
+def probe_order(best, last_unassigned, num_unassigned, k):
+    """
+    Arrange the best variables in the order of the insertion sort of the unit propagation probe.
+    :param best: the (up to) k best unassigned variables, by (number of binary clauses, variable) descending
+    :param last_unassigned: the highest unassigned variable
+    :param num_unassigned: number of unassigned variables
+    :param k: number of variables to select
+    :return: list of variables
+    """
+    if num_unassigned <= k:
+        return best
+
+    top = best[:k - 1]
+    if last_unassigned in top:
+        return top + [best[k - 1]]
+    return top + [last_unassigned]
+
+
+class BinClauseIndex:
+    """
+    Max heap over the unassigned variables, keyed by (number of binary clauses, variable). Entries are not updated in
+    place: DPLLProbing records the clauses whose binary status changed and the variables that became unassigned again,
+    and fresh entries for their variables are pushed when the next selection is made. Entries that no longer match the
+    counts or the variable state are dropped when they reach the top. The highest unassigned variable, for probe_order,
+    comes from a second max heap over the unassigned variables, kept the same way, so a selection of k variables is
+    O((k + changes) log v) rather than a scan over the variables.
+    """
+
+    def __init__(self, sat_instance, counts):
+        """
+        :param sat_instance:
+        :param counts: number of binary clauses of each variable, kept up to date by the prober
+        """
+        self.sat_instance = sat_instance
+        self.counts = counts
+        self.literals, self.clause_offsets = sat_instance.cnf.memoryviews()[:2]
+        self.changed_clauses = []
+        self.changed_vars = []
+        self.heap = []
+        self.unassigned_heap = []
+        self.rebuild()
+
+    def rebuild(self):
+        counts = self.counts
+        var_states = self.sat_instance.var_states
+
+        unassigned = [var for var in range(1, self.sat_instance.cnf.num_vars + 1) if var_states[var] == VAR_UNASSIGNED]
+        self.heap = [(-counts[var], -var) for var in unassigned]
+        heapq.heapify(self.heap)
+        self.unassigned_heap = [-var for var in unassigned]
+        heapq.heapify(self.unassigned_heap)
+        self.changed_clauses = []
+        self.changed_vars = []
+
+    def top_k(self, k):
+        """
+        :param k: number of variables to select
+        :return: the unassigned variables in the most binary clauses, in the order of the unit propagation probe
+        """
+        sat_instance = self.sat_instance
+        counts = self.counts
+        var_states = sat_instance.var_states
+
+        # stale entries accumulate, start over once they outnumber the variables
+        num_vars = sat_instance.cnf.num_vars
+        if len(self.heap) + len(self.unassigned_heap) + len(self.changed_clauses) + len(self.changed_vars) > \
+                4 * (num_vars + 1):
+            self.rebuild()
+        heap = self.heap
+        unassigned_heap = self.unassigned_heap
+
+        changed = set(self.changed_vars)
+        for var in changed:
+            if var_states[var] == VAR_UNASSIGNED:
+                heapq.heappush(unassigned_heap, -var)
+        literals = self.literals
+        clause_offsets = self.clause_offsets
+        for clause_num in self.changed_clauses:
+            for literal in literals[clause_offsets[clause_num]:clause_offsets[clause_num + 1]]:
+                changed.add(abs(literal))
+        self.changed_clauses = []
+        self.changed_vars = []
+        for var in changed:
+            if var_states[var] == VAR_UNASSIGNED:
+                heapq.heappush(heap, (-counts[var], -var))
+
+        best = []
+        while heap and len(best) < k:
+            neg_count, neg_var = heapq.heappop(heap)
+            var = -neg_var
+            if var_states[var] != VAR_UNASSIGNED or counts[var] != -neg_count or var in best:
+                continue
+            best.append(var)
+        for var in best:
+            heapq.heappush(heap, (-counts[var], -var))
+
+        # the variables assigned since they were pushed are dropped from the top
+        while unassigned_heap and var_states[-unassigned_heap[0]] != VAR_UNASSIGNED:
+            heapq.heappop(unassigned_heap)
+        last_unassigned = -unassigned_heap[0] if unassigned_heap else 0
+
+        return probe_order(best, last_unassigned, sat_instance.num_active_vars, k)
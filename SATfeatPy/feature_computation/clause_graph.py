@@ -0,0 +1,276 @@
+import random
+
+import numpy as np
+
+from feature_computation.variable_graph import MAX_VG_PAIRS
+
+"""
+Clause graph (CG) and resolution graph (RG) on the literal occurrence index, without networkx. The CG has a node for
+each clause and an edge between two clauses that share a literal.
+
+Only clauses that share a literal are paired: the occurrences of each literal are grouped, and every pair (a, b), a < b,
+of positions in the occurrence list of a literal gives the edge of clauses occ[a] < occ[b], with weight b - a (the
+number of clauses after occ[a] up to occ[b] that contain the literal). Edges are deduplicated with a sort, and, as when
+they are added one by one to a networkx Graph (for each clause, for each of its literals, for each later clause with
+the literal), an edge keeps the weight of the last literal of the first clause that it shares with the second.
+
+A literal in m clauses gives m(m-1)/2 pairs, so the literals in more than max_fanout clauses only pair a uniform random
+sample of max_fanout of their clauses (the sample reservoir sampling keeps), drawn with the random module. The weights
+of the sampled pairs still count all of the clauses of the literal. The fanout is lowered further, to the largest one
+whose pairs fit, when the instance has more than max_pairs pairs in total (the same budget as the VG).
+
+The RG has an edge between two clauses that clash on exactly one variable (x in one, -x in the other), so that they
+resolve to a clause that is not a tautology. The candidate pairs are the clauses of x against the clauses of -x, for
+every variable x, and a candidate found through a single variable clashes only on it. When a literal is in more than
+max_fanout clauses, or when the candidates are over the same max_pairs budget, its clauses are sampled as for the CG,
+and since a second clash may then be missed, the candidates are checked against the literals of the other clause, a
+budget of literals at a time.
+"""
+
+# most clauses of a literal that are paired with each other
+MAX_CG_FANOUT = 1024
+MAX_RG_FANOUT = 1024
+# budget of clause pairs held in memory at once, shared with the VG
+MAX_CG_PAIRS = MAX_VG_PAIRS
+MAX_RG_PAIRS = MAX_VG_PAIRS
+
+
+def fanout_for_budget(pairs_within, max_fanout, max_pairs):
+    """
+    :param pairs_within: number of pairs when every literal keeps at most the given number of clauses
+    :param max_fanout: most clauses kept per literal
+    :param max_pairs: budget of clause pairs
+    :return: the largest fanout, at most max_fanout, whose pairs fit in the budget (at least 1)
+    """
+    if pairs_within(max_fanout) <= max_pairs:
+        return max_fanout
+
+    low, high = 1, max_fanout - 1
+    while low < high:
+        mid = (low + high + 1) // 2
+        if pairs_within(mid) <= max_pairs:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def literal_occurrences(cnf, max_fanout=MAX_CG_FANOUT, max_pairs=MAX_CG_PAIRS):
+    """
+    Group the clauses of each literal, each clause once per literal.
+    :param cnf: CNF core of the cnf
+    :param max_fanout: most clauses kept per literal
+    :param max_pairs: budget of clause pairs, see fanout_for_budget
+    :return: for each kept occurrence, in order of literal then clause: its clause, its literal index in the
+    literals array, its position in the full occurrence list of its literal, and the start of the group of its literal
+    """
+    literal_codes = cnf.literals.astype(np.int64) + cnf.num_vars
+    clause_ids = cnf.literal_clause_ids().astype(np.int64)
+
+    order = np.lexsort((clause_ids, literal_codes))
+    literal_codes = literal_codes[order]
+    clause_ids = clause_ids[order]
+
+    # a literal repeated in a clause is one occurrence
+    new_literal = np.concatenate(([True], literal_codes[1:] != literal_codes[:-1]))[:len(order)]
+    repeated = np.concatenate(([False], ~new_literal[1:] & (clause_ids[1:] == clause_ids[:-1])))[:len(order)]
+    order = order[~repeated]
+    clause_ids = clause_ids[~repeated]
+    new_literal = new_literal[~repeated]
+
+    group_starts = np.flatnonzero(new_literal)
+    group_sizes = np.diff(np.append(group_starts, len(order)))
+    positions = np.arange(len(order)) - np.repeat(group_starts, group_sizes)
+
+    def pairs_within(fanout):
+        kept = np.minimum(group_sizes, fanout)
+        return int((kept * (kept - 1) // 2).sum())
+
+    fanout = fanout_for_budget(pairs_within, max_fanout, max_pairs)
+    keep = np.ones(len(order), dtype=bool)
+    for start, size in zip(group_starts[group_sizes > fanout].tolist(), group_sizes[group_sizes > fanout].tolist()):
+        keep[start:start + size] = False
+        keep[start + np.array(sorted(random.sample(range(size), fanout)), dtype=np.int64)] = True
+
+    kept_groups = np.repeat(np.arange(len(group_starts)), group_sizes)[keep]
+    kept_starts = np.flatnonzero(np.concatenate(([True], kept_groups[1:] != kept_groups[:-1]))[:len(kept_groups)])
+    group_of = np.repeat(kept_starts, np.diff(np.append(kept_starts, len(kept_groups))))
+    return clause_ids[keep], order[keep], positions[keep], group_of
+
+
+def occurrence_pairs(group_of):
+    """
+    :param group_of: start of the group of each occurrence
+    :return: the index of the first and of the second occurrence of every pair within a group
+    """
+    starts, sizes = np.unique(group_of, return_counts=True)
+
+    firsts = []
+    seconds = []
+    for m in np.unique(sizes[sizes >= 2]).tolist():
+        a, b = np.triu_indices(m, 1)
+        group_starts = starts[sizes == m][:, None]
+        firsts.append((group_starts + a).ravel())
+        seconds.append((group_starts + b).ravel())
+
+    if not firsts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def cg_degrees_weights(cnf, max_fanout=MAX_CG_FANOUT, max_pairs=MAX_CG_PAIRS):
+    """
+    :param cnf: CNF core of the cnf
+    :param max_fanout: most clauses of a literal that are paired, see literal_occurrences
+    :param max_pairs: budget of clause pairs, see literal_occurrences
+    :return: the degree of each node, as an array in node order, and the weight of each edge, as an array in the order of
+    the edges of a networkx Graph: by the first of their two nodes, then in the order they were added
+    """
+    clause_ids, literal_index, positions, group_of = literal_occurrences(cnf, max_fanout, max_pairs)
+    first, second = occurrence_pairs(group_of)
+
+    i = clause_ids[first]
+    j = clause_ids[second]
+    weight = positions[second] - positions[first]
+    # the edge is set while visiting the literal of clause i, for the later clauses j in order
+    set_key = literal_index[first] * cnf.num_clauses + j
+
+    # each edge is added by its first setting, and keeps the weight of its last one
+    edge = i * cnf.num_clauses + j
+    by_edge = np.lexsort((set_key, edge))
+    edge = edge[by_edge]
+    changes = edge[1:] != edge[:-1]
+    starts = np.flatnonzero(np.concatenate(([True], changes))[:len(edge)])
+    ends = np.flatnonzero(np.concatenate((changes, [True]))[:len(edge)])
+    added = set_key[by_edge][starts]
+    weights = weight[by_edge][ends]
+
+    return graph_lists(i[by_edge][starts], j[by_edge][starts], added, weights, cnf.num_clauses)
+
+
+def graph_lists(first, second, added, weights, num_nodes):
+    """
+    Degree and weight lists of a graph given by its distinct edges (no self loops), in the order of a networkx Graph
+    that the edges are added to in the order of added, the first node of an edge before the second
+    :param first: first node of each edge
+    :param second: second node of each edge
+    :param added: distinct keys, in the order the edges are added
+    :param weights: weight of each edge
+    :param num_nodes: nodes are numbered below num_nodes
+    :return: the degree of each node, as an array in node order, and the weight of each edge, as an array by the first of
+    their two nodes, then in the order they were added
+    """
+    # nodes in order of their first edge
+    endpoints = np.concatenate((first, second))
+    first_seen = np.concatenate((added * 2, added * 2 + 1))
+    by_seen = np.lexsort((first_seen, endpoints))
+    node_starts = np.flatnonzero(np.concatenate(([True], np.diff(endpoints[by_seen]) != 0))[:len(endpoints)])
+    nodes = endpoints[by_seen][node_starts]
+    node_order = np.argsort(first_seen[by_seen][node_starts])
+    rank = np.zeros(num_nodes, dtype=np.int64)
+    rank[nodes[node_order]] = np.arange(len(nodes))
+
+    degrees = np.bincount(rank[endpoints], minlength=len(nodes))
+
+    edge_order = np.lexsort((added, np.minimum(rank[first], rank[second])))
+    return degrees, np.asarray(weights)[edge_order]
+
+
+def sample_occurrences(occ, offsets, max_fanout):
+    """
+    :param occ: clauses of each variable, in CSR form (e.g. the positive occurrences of the CNF core)
+    :param offsets: offsets of occ, indexed by variable
+    :param max_fanout: most clauses kept per variable
+    :return: occurrence array and offsets with a uniform random sample of the clauses of the larger lists, and whether
+    any list was sampled
+    """
+    counts = np.diff(offsets)
+    large = np.flatnonzero(counts > max_fanout)
+    if len(large) == 0:
+        return occ, offsets, False
+
+    keep = np.ones(len(occ), dtype=bool)
+    for var in large.tolist():
+        start = int(offsets[var])
+        keep[start:start + int(counts[var])] = False
+        keep[start + np.array(sorted(random.sample(range(int(counts[var])), max_fanout)), dtype=np.int64)] = True
+
+    new_offsets = np.zeros(len(offsets), dtype=np.int64)
+    np.cumsum(np.minimum(counts, max_fanout), out=new_offsets[1:])
+    return occ[keep], new_offsets, True
+
+
+def clash_counts(cnf, first, second, max_pairs=MAX_RG_PAIRS):
+    """
+    :param cnf: CNF core of the cnf
+    :param first: a clause of each pair
+    :param second: the other clause of each pair
+    :param max_pairs: most literals of the first clauses looked up at once
+    :return: number of literals of each first clause whose negation is in the second clause
+    """
+    num_codes = 2 * cnf.num_vars + 1
+    lengths = cnf.clause_lengths()
+    entries = np.sort(cnf.literal_clause_ids().astype(np.int64) * num_codes + cnf.literals + cnf.num_vars)
+
+    counts = np.zeros(len(first), dtype=np.int64)
+    ends = np.cumsum(lengths[first])
+    start = 0
+    while start < len(first):
+        # the pairs whose literals fit in the budget, at least one
+        end = max(int(np.searchsorted(ends, ends[start] - lengths[first[start]] + max_pairs, side="right")), start + 1)
+        chunk_lengths = lengths[first[start:end]]
+
+        pair_of = np.repeat(np.arange(start, end), chunk_lengths)
+        within = np.arange(len(pair_of)) - np.repeat(np.cumsum(chunk_lengths) - chunk_lengths, chunk_lengths)
+        literals = cnf.literals[cnf.clause_offsets[first][pair_of] + within].astype(np.int64)
+
+        query = second[pair_of] * num_codes - literals + cnf.num_vars
+        found = entries[np.minimum(np.searchsorted(entries, query), len(entries) - 1)] == query
+        counts[start:end] = np.bincount(pair_of[found] - start, minlength=end - start)
+        start = end
+    return counts
+
+
+def rg_degrees_weights(cnf, max_fanout=MAX_RG_FANOUT, max_pairs=MAX_RG_PAIRS):
+    """
+    :param cnf: CNF core of the cnf
+    :param max_fanout: most clauses of a literal that are paired, see sample_occurrences
+    :param max_pairs: budget of candidate pairs, see fanout_for_budget
+    :return: the degree of each node, as an array in node order, and the weight of each edge, 2^-(k-2) for clauses with
+    k literals together, as an array in the order of the edges of a networkx Graph that the clause pairs are added to in
+    order
+    """
+    pos_counts = cnf.positive_occurrences()
+    neg_counts = cnf.negative_occurrences()
+
+    def pairs_within(fanout):
+        return int((np.minimum(pos_counts, fanout) * np.minimum(neg_counts, fanout)).sum())
+
+    fanout = fanout_for_budget(pairs_within, max_fanout, max_pairs)
+    pos_occ, pos_offsets, pos_sampled = sample_occurrences(cnf.pos_occ, cnf.pos_occ_offsets, fanout)
+    neg_occ, neg_offsets, neg_sampled = sample_occurrences(cnf.neg_occ, cnf.neg_occ_offsets, fanout)
+
+    # every clause of x against every clause of -x
+    pos_counts = np.diff(pos_offsets)
+    neg_counts = np.diff(neg_offsets)
+    num_pairs = pos_counts * neg_counts
+    var_of_pair = np.repeat(np.arange(len(num_pairs)), num_pairs)
+    t = np.arange(len(var_of_pair)) - np.repeat(np.cumsum(num_pairs) - num_pairs, num_pairs)
+    i = pos_occ[pos_offsets[var_of_pair] + t // neg_counts[var_of_pair]].astype(np.int64)
+    j = neg_occ[neg_offsets[var_of_pair] + t % neg_counts[var_of_pair]].astype(np.int64)
+
+    # pairs found through more than one variable clash on two variables or more
+    different = i != j
+    edge, counts = np.unique(np.minimum(i, j)[different] * cnf.num_clauses + np.maximum(i, j)[different],
+                             return_counts=True)
+    edge = edge[counts == 1]
+    first = edge // cnf.num_clauses
+    second = edge % cnf.num_clauses
+    if pos_sampled or neg_sampled:
+        single = clash_counts(cnf, first, second, max_pairs) == 1
+        edge, first, second = edge[single], first[single], second[single]
+
+    lengths = cnf.clause_lengths()
+    weights = np.ldexp(1.0, -(lengths[first] + lengths[second] - 2))
+
+    return graph_lists(first, second, edge, weights, cnf.num_clauses)
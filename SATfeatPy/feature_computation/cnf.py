@@ -0,0 +1,211 @@
+import numpy as np
+
+from feature_computation.enums import VAR_UNASSIGNED, VAR_IRRELEVANT, CLAUSE_ACTIVE
+
+"""
+Compact core representation of a cnf, shared by the feature modules.
+
+Clauses are stored in compressed sparse row (CSR) form: clause i is literals[clause_offsets[i]:clause_offsets[i + 1]].
+The literal occurrence lists are stored the same way: the clauses that contain variable x positively are
+pos_occ[pos_occ_offsets[x]:pos_occ_offsets[x + 1]], in increasing clause order (likewise neg_occ for -x).
+Variables are numbered 1..num_vars, index 0 of the per variable arrays is unused.
+"""
+
+
+class CNF:
+    """
+    Clause database in CSR form, with literal occurrence lists and int8 variable and clause state arrays. The arrays
+    may be read only (e.g. memory mapped from the instance cache), none of the views modify them.
+
+    The derived views (clause lengths, occurrence counts, ...) are computed once, on first use.
+    """
+
+    def __init__(self, literals, clause_offsets, num_vars, pos_occ=None, pos_occ_offsets=None, neg_occ=None,
+                 neg_occ_offsets=None):
+        self.literals = np.asarray(literals, dtype=np.int32)
+        self.clause_offsets = np.asarray(clause_offsets, dtype=np.int64)
+        self.num_vars = num_vars
+        self.num_clauses = len(self.clause_offsets) - 1
+
+        if pos_occ is None:
+            pos_occ, pos_occ_offsets = self._build_occurrences(self.literals > 0)
+            neg_occ, neg_occ_offsets = self._build_occurrences(self.literals < 0)
+
+        self.pos_occ = np.asarray(pos_occ, dtype=np.int32)
+        self.pos_occ_offsets = np.asarray(pos_occ_offsets, dtype=np.int64)
+        self.neg_occ = np.asarray(neg_occ, dtype=np.int32)
+        self.neg_occ_offsets = np.asarray(neg_occ_offsets, dtype=np.int64)
+
+        # variables that occur in no clause are irrelevant, as is the unused index 0
+        self.var_states = np.full(num_vars + 1, VAR_UNASSIGNED, dtype=np.int8)
+        self.var_states[self.variable_occurrences() == 0] = VAR_IRRELEVANT
+        self.var_states[0] = VAR_IRRELEVANT
+        self.clause_states = np.full(self.num_clauses, CLAUSE_ACTIVE, dtype=np.int8)
+
+        self._clause_lists = None
+        self._occurrence_lists = None
+
+    @classmethod
+    def from_clauses(cls, clauses, num_vars):
+        """
+        Build a CNF from a list of clauses (lists of literals). The lists are kept as the list view of the CNF.
+        :param clauses:
+        :param num_vars:
+        :return: CNF
+        """
+        literals, clause_offsets = lists_to_csr(clauses)
+        cnf = cls(literals, clause_offsets, num_vars)
+        cnf._clause_lists = clauses
+        return cnf
+
+    def _build_occurrences(self, mask):
+        """
+        Group the clause ids of the selected literals by variable.
+        :param mask: boolean mask over the literals
+        :return: occurrence array, offsets (length num_vars + 2, indexed by variable)
+        """
+        variables = np.abs(self.literals[mask])
+        clause_ids = self.literal_clause_ids()[mask]
+
+        # a stable sort keeps the clause ids of each variable in increasing order
+        order = np.argsort(variables, kind="stable")
+        occ = clause_ids[order].astype(np.int32)
+
+        offsets = np.zeros(self.num_vars + 2, dtype=np.int64)
+        np.cumsum(np.bincount(variables, minlength=self.num_vars + 1), out=offsets[1:])
+        return occ, offsets
+
+    # cached views
+
+    def clause_lengths(self):
+        """
+        :return: number of literals of each clause
+        """
+        if not hasattr(self, "_clause_lengths"):
+            self._clause_lengths = np.diff(self.clause_offsets)
+        return self._clause_lengths
+
+    def literal_clause_ids(self):
+        """
+        :return: for each entry of literals, the index of the clause it belongs to
+        """
+        if not hasattr(self, "_literal_clause_ids"):
+            self._literal_clause_ids = np.repeat(np.arange(self.num_clauses, dtype=np.int32), self.clause_lengths())
+        return self._literal_clause_ids
+
+    def literal_variables(self):
+        """
+        :return: for each entry of literals, its variable
+        """
+        if not hasattr(self, "_literal_variables"):
+            self._literal_variables = np.abs(self.literals)
+        return self._literal_variables
+
+    def positive_occurrences(self):
+        """
+        :return: number of clauses that contain each variable positively (indexed by variable)
+        """
+        return np.diff(self.pos_occ_offsets)
+
+    def negative_occurrences(self):
+        """
+        :return: number of clauses that contain each variable negatively (indexed by variable)
+        """
+        return np.diff(self.neg_occ_offsets)
+
+    def variable_occurrences(self):
+        """
+        :return: number of literal occurrences of each variable (indexed by variable)
+        """
+        if not hasattr(self, "_variable_occurrences"):
+            self._variable_occurrences = self.positive_occurrences() + self.negative_occurrences()
+        return self._variable_occurrences
+
+    # access to single clauses and literals
+
+    def clause(self, i):
+        """
+        :param i: clause index
+        :return: the literals of clause i
+        """
+        return self.literals[self.clause_offsets[i]:self.clause_offsets[i + 1]]
+
+    def clauses_with_literal(self, literal):
+        """
+        :param literal:
+        :return: indices of the clauses that contain the literal
+        """
+        if literal > 0:
+            return self.pos_occ[self.pos_occ_offsets[literal]:self.pos_occ_offsets[literal + 1]]
+        return self.neg_occ[self.neg_occ_offsets[-literal]:self.neg_occ_offsets[-literal + 1]]
+
+    def memoryviews(self):
+        """
+        Memoryviews of the clause and occurrence arrays, for the python loops of the probers: indexing and slicing them
+        gives python ints without copying the arrays into lists, and memory mapped arrays stay shared.
+        :return: literals, clause_offsets, pos_occ, pos_occ_offsets, neg_occ, neg_occ_offsets
+        """
+        return tuple(memoryview(a) for a in (self.literals, self.clause_offsets, self.pos_occ, self.pos_occ_offsets,
+                                             self.neg_occ, self.neg_occ_offsets))
+
+    # list views, for the modules that still iterate over python lists
+
+    def clause_lists(self):
+        """
+        :return: the clauses as a list of lists of ints
+        """
+        if self._clause_lists is None:
+            self._clause_lists = csr_to_lists(self.literals, self.clause_offsets)
+        return self._clause_lists
+
+    def occurrence_lists(self):
+        """
+        :return: for each variable, the list of clauses that contain it positively, and the same for negatively
+        """
+        if self._occurrence_lists is None:
+            self._occurrence_lists = (csr_to_lists(self.pos_occ, self.pos_occ_offsets),
+                                      csr_to_lists(self.neg_occ, self.neg_occ_offsets))
+        return self._occurrence_lists
+
+
+def compact_variables(literals, num_vars):
+    """
+    Renumber the variables that occur in the literals to 1..n, in their original order.
+    :param literals:
+    :param num_vars: number of variables before renumbering
+    :return: renumbered literals, and var_map, the original variable of each new one (var_map[0] is 0)
+    """
+    variables = np.abs(literals)
+    occurring = np.bincount(variables, minlength=num_vars + 1) > 0
+    occurring[0] = False
+
+    new_ids = np.cumsum(occurring)
+    var_map = np.concatenate(([0], np.flatnonzero(occurring)))
+    compacted = (np.sign(literals) * new_ids[variables]).astype(literals.dtype)
+    return compacted, var_map
+
+
+def lists_to_csr(lists, dtype=np.int32):
+    """
+    Flatten a list of lists into CSR form.
+    :param lists:
+    :param dtype: dtype of the values
+    :return: values, offsets
+    """
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(l) for l in lists], out=offsets[1:])
+
+    values = np.fromiter((x for l in lists for x in l), dtype=dtype, count=int(offsets[-1]))
+    return values, offsets
+
+
+def csr_to_lists(values, offsets):
+    """
+    Split CSR arrays back into a list of lists.
+    :param values:
+    :param offsets:
+    :return: list of lists of python ints
+    """
+    flat = values.tolist()
+    bounds = offsets.tolist()
+    return [flat[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
@@ -0,0 +1,116 @@
+import bz2
+import gzip
+import lzma
+import os
+import tempfile
+
+"""
+Transparent access to compressed cnf files. The anni_2022 benchmarks are distributed as .cnf.xz (and other codecs),
+these helpers pick the codec from the magic bytes at the start of the file, so the file extension does not matter.
+"""
+
+# magic bytes at the start of the file for each supported codec
+CODEC_MAGIC = {
+    "gzip": b"\x1f\x8b",
+    "bz2": b"BZh",
+    "xz": b"\xfd7zXZ\x00",
+    "zstd": b"\x28\xb5\x2f\xfd",
+}
+
+CNF_SUFFIXES = (".cnf", ".cnf.gz", ".cnf.bz2", ".cnf.xz", ".cnf.zst")
+
+# bytes copied per read when decompressing to a file
+COPY_CHUNK_SIZE = 1 << 22
+
+
+def detect_codec(cnf_path):
+    """
+    Detect the compression codec of a file from its magic bytes
+    :param cnf_path:
+    :return: name of the codec (key of CODEC_MAGIC), or None for an uncompressed file
+    """
+    with open(cnf_path, "rb") as f:
+        head = f.read(6)
+
+    for codec, magic in CODEC_MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def is_cnf_file(file_name):
+    """
+    :param file_name:
+    :return: True if the name has one of the (possibly compressed) cnf suffixes
+    """
+    return file_name.endswith(CNF_SUFFIXES)
+
+
+def open_cnf(cnf_path):
+    """
+    Open a cnf file for binary reading, decompressing on the fly if it is compressed. The returned stream decodes
+    incrementally, so the decompressed file is never held in memory or on disk as a whole.
+    :param cnf_path:
+    :return: binary file like object, to be used as a context manager
+    """
+    codec = detect_codec(cnf_path)
+
+    if codec is None:
+        return open(cnf_path, "rb")
+    if codec == "gzip":
+        return gzip.open(cnf_path, "rb")
+    if codec == "bz2":
+        return bz2.open(cnf_path, "rb")
+    if codec == "xz":
+        return lzma.open(cnf_path, "rb")
+
+    # zstd is not part of the standard library
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("reading " + cnf_path + " requires the zstandard package: pip install zstandard") from None
+    return zstandard.ZstdDecompressor().stream_reader(open(cnf_path, "rb"), closefd=True)
+
+
+def decompress_to_file(cnf_path, out_path, max_bytes=None):
+    """
+    Stream the decompressed contents of cnf_path into out_path, for tools that need a plain file (SatELite, ubcsat).
+    :param cnf_path:
+    :param out_path:
+    :param max_bytes: upper bound on the decompressed size, None for no bound
+    :return: number of bytes written
+    """
+    written = 0
+    with open_cnf(cnf_path) as src, open(out_path, "wb") as dst:
+        while True:
+            chunk = src.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if max_bytes is not None and written > max_bytes:
+                raise ValueError("decompressed " + cnf_path + " exceeds " + str(max_bytes) + " bytes")
+            dst.write(chunk)
+
+    return written
+
+
+def plain_cnf_path(cnf_path, max_bytes=None):
+    """
+    Return a path to an uncompressed version of the cnf. Uncompressed files are returned as is, compressed files are
+    decompressed into a temporary file, which the caller is responsible for removing.
+    :param cnf_path:
+    :param max_bytes: upper bound on the decompressed size, None for no bound
+    :return: path to an uncompressed cnf, and whether it is a temporary file
+    """
+    if detect_codec(cnf_path) is None:
+        return cnf_path, False
+
+    tmp = tempfile.NamedTemporaryFile(prefix="cnf-", suffix=".cnf", delete=False)
+    tmp.close()
+    try:
+        decompress_to_file(cnf_path, tmp.name, max_bytes)
+    except BaseException:
+        os.remove(tmp.name)
+        raise
+
+    return tmp.name, True
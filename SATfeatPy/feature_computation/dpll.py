@@ -1,8 +1,48 @@
-import math
+import multiprocessing
 import random
-from feature_computation.enums import VarState, ClauseState
+
+import numpy as np
+
+from feature_computation.bin_clause_index import BinClauseIndex
+from feature_computation.bit_parallel_probing import BitParallelProbes, LANES
+from feature_computation.enums import VAR_TRUE, VAR_FALSE, VAR_UNASSIGNED, VAR_IRRELEVANT, CLAUSE_ACTIVE, CLAUSE_PASSIVE
+from feature_computation.lobjois_estimator import LobjoisEstimator
 from feature_computation.stopwatch import Stopwatch
-import statistics
+from feature_computation.unassigned_vars import UnassignedVars
+
+# prober that forked workers run their probes on, see run_probe_workers
+_worker_prober = None
+
+# number of clauses from which restore updates the variable counts with numpy, fewer are updated one literal at a time
+VECTORIZED_RESTORE_MIN_CLAUSES = 1024
+
+
+def _run_probe_worker(task):
+    method, seed, args = task
+    random.seed(seed)
+    return getattr(_worker_prober, method)(*args)
+
+
+def variable_deltas(cnf, clause_ids, clause_deltas):
+    """
+    Spread per clause deltas over the variables of the clauses
+    :param cnf: CNF core
+    :param clause_ids: clauses
+    :param clause_deltas: arrays of a delta for each clause
+    :return: the variables that occur in the clauses, and for each array of deltas, the sum for each variable (lists)
+    """
+    clause_ids = np.asarray(clause_ids, dtype=np.int64)
+    starts = cnf.clause_offsets[clause_ids]
+    lengths = cnf.clause_offsets[clause_ids + 1] - starts
+
+    # positions of the literals of the clauses in the CSR arrays
+    first = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts - first, lengths) + np.arange(int(lengths.sum()))
+
+    variables, inverse = np.unique(cnf.literal_variables()[positions], return_inverse=True)
+    sums = [np.bincount(inverse, weights=np.repeat(deltas, lengths), minlength=len(variables)).astype(np.int64).tolist()
+            for deltas in clause_deltas]
+    return variables.tolist(), sums
 
 
 class DPLLProbing:
@@ -35,6 +75,10 @@ class DPLLProbing:
     def __init__(self, sat_instance):
         self.sat_instance = sat_instance
         self.verbose = sat_instance.verbose
+
+        # the clauses and occurrence lists of the CNF core, as memoryviews of its arrays
+        self.literals, self.clause_offsets, self.pos_occ, self.pos_occ_offsets, self.neg_occ, self.neg_occ_offsets = \
+            sat_instance.cnf.memoryviews()
         self.num_vars_to_try = 10
         self.num_probes = 5
 
@@ -43,6 +87,18 @@ class DPLLProbing:
         # not sure what 2 is in this case(perhaps 2 seconds?)
         self.time_limit = 2
 
+        # lobjois probing stops early once the relative half width of the 95% confidence interval of the log number of
+        # nodes is at most lobjois_relative_ci (None to always use the full budget), after at least lobjois_min_probes
+        self.lobjois_relative_ci = None
+        self.lobjois_min_probes = 30
+        # run the lobjois probes LANES at a time with bit parallel propagation, see bit_parallel_probing
+        self.bit_parallel_lobjois = False
+
+        # number of processes the random probes (search_space_probe, combined_probing) are spread over, each with the
+        # full time limit, and the seed of their random streams (drawn from random when None)
+        self.num_workers = 1
+        self.seed = None
+
         # two stacks
         self.num_reduced_clauses = []
         self.num_reduced_vars = []
@@ -59,6 +115,12 @@ class DPLLProbing:
         self.depths_knuth = []
 
         self.probing_stopwatch = Stopwatch()
+
+        # index of the variables in the most binary clauses, only kept up to date during the unit propagation probe
+        self.bin_clause_index = None
+
+        # the unassigned variables, to sample the random decisions from
+        self.unassigned_vars = UnassignedVars(sat_instance.var_states)
     # unit propagation
 
 # num_bin_clauses_with_var, int array containing the number of binary clauses with a certain variable (index),
@@ -69,6 +131,7 @@ class DPLLProbing:
         Randomly choose a variable, propagate, and see how deep you get. This generates the mean depth to contradiction
         and an estimate on the number of nodes.
         Timeout of 2 seconds (can be changed, more runs means a more accurate result, as the algorithm is stochastic)
+        With several workers, each probes for the whole time limit and the depths of all of them are used.
         :param halt_on_assignment:
         :return:
         """
@@ -79,14 +142,60 @@ class DPLLProbing:
         sw = Stopwatch()
         sw.start()
 
+        # the probes are shared out between the workers
+        num_workers = self.worker_count()
+        num_probes = [self.num_lob_probe // num_workers + (i < self.num_lob_probe % num_workers)
+                      for i in range(num_workers)]
+        results = self.run_probe_workers("lobjois_depths", [(n, halt_on_assignment) for n in num_probes])
+        if any(depths is None for depths in results):
+            return
+
+        depths = [depth for worker_depths in results for depth in worker_depths]
+        estimator = LobjoisEstimator.from_depths(depths)
+
+        mean_depth_to_con_over_vars = estimator.mean_depth()/self.sat_instance.v
+        # print("mean depth over variables: ", mean_depth_to_contradiction_over_vars)
+
+        self.unit_props_log_nodes_dict["mean_depth_to_contradiction_over_vars"] = mean_depth_to_con_over_vars
+
+        lobjois = estimator.log_num_nodes()
+        res = lobjois/self.sat_instance.v
+
+        self.unit_props_log_nodes_dict["estimate_log_number_nodes_over_vars"] = res
+        # print("lobjois log num nodes over vars", lobjois/self.sat_instance.v)
+
+        # how many probes the estimate is based on, and how precise it is
+        self.unit_props_log_nodes_dict["lobjois_num_probes"] = estimator.num_samples
+        self.unit_props_log_nodes_dict["lobjois_log_num_nodes_relative_ci"] = estimator.relative_ci()
+
+        # also should be timed
+        if self.verbose:
+            print("total time:", sw.lap())
+
+    def lobjois_depths(self, num_probes, halt_on_assignment=False):
+        """
+        Run lobjois probes from the current state until the time limit or the number of probes is reached, or the
+        estimate has converged (see lobjois_relative_ci)
+        :param num_probes: maximum number of probes
+        :param halt_on_assignment:
+        :return: list of the depth to contradiction of each probe, or None if halted on a satisfying assignment
+        """
+        if self.bit_parallel_lobjois:
+            return self.bit_parallel_lobjois_depths(num_probes, halt_on_assignment)
+
+        sw = Stopwatch()
+        sw.start()
+
         depths = []
+        estimator = LobjoisEstimator()
 
         orig_num_active_vars = self.sat_instance.num_active_vars
+        root = self.mark()
 
         probe_num = 0
 
         # while probe_num < self.num_lob_probe and stopwatch.lap() < self.lobjois_tim_limit:
-        while probe_num < self.num_lob_probe and sw.lap() < self.time_limit:
+        while probe_num < num_probes and sw.lap() < self.time_limit:
 
             # randomly choose an unassigned variable and a value propagate this, and continue until a contradiction is reached. This result is the depth to contradiction.
             # Do this while within the time limit, and within the number of probes
@@ -100,22 +209,12 @@ class DPLLProbing:
                 if self.sat_instance.num_active_vars == 0:
                     if self.sat_instance.num_active_clauses == 0 and halt_on_assignment:
                         print("finished")
-                        return
+                        return None
                     else:
                         break
 
-                # chooses a random unassigned variable, should be between 1 and v
-                var = 0
-                randnum = random.randint(1, self.sat_instance.num_active_vars)
-                for stepsleft in range(randnum, 0, -1):
-                    var += 1
-
-                    while self.sat_instance.var_states[var] != VarState.UNASSIGNED:
-                        var += 1
-                        # This upper limit should be v, as the actual array of variables does not change, but the just
-                        # states of the variables
-                        if var == self.sat_instance.v:
-                            var = 1
+                # chooses a random unassigned variable, uniformly
+                var = self.unassigned_vars.sample()
 
                 # Choose a random value to propagate
                 val = random.random() < 0.5
@@ -125,36 +224,85 @@ class DPLLProbing:
 
             # print("reached bottom")
             depths.append(orig_num_active_vars - self.sat_instance.num_active_vars)
+            estimator.add(depths[-1])
 
             # reset the problem
-            while self.sat_instance.num_active_vars != orig_num_active_vars:
-                self.backtrack()
+            self.restore(root)
 
             probe_num += 1
 
-        mean_depth_to_con_over_vars = statistics.mean(depths)/self.sat_instance.v
-        # print("mean depth over variables: ", mean_depth_to_contradiction_over_vars)
+            if self.lobjois_relative_ci is not None and \
+                    estimator.converged(self.lobjois_relative_ci, self.lobjois_min_probes):
+                break
 
-        self.unit_props_log_nodes_dict["mean_depth_to_contradiction_over_vars"] = mean_depth_to_con_over_vars
+        return depths
 
-        max_depth = max(depths)
+    def bit_parallel_lobjois_depths(self, num_probes, halt_on_assignment=False):
+        """
+        lobjois_depths, with the probes run in batches of LANES by BitParallelProbes. The time limit is checked between
+        batches, so the last batch finishes all of its probes, as a single probe of lobjois_depths does.
+        :param num_probes: maximum number of probes
+        :param halt_on_assignment:
+        :return: list of the depth to contradiction of each probe, or None if halted on a satisfying assignment
+        """
+        sw = Stopwatch()
+        sw.start()
 
-        res = 0.0
-        for i in range(probe_num):
-            res += math.pow(2, (depths[i] - max_depth))
+        probes = BitParallelProbes(self.sat_instance)
+        # seeded from random, so that seeding random seeds the batches too
+        rng = np.random.default_rng(random.getrandbits(64))
 
-        lobjois = max_depth + (math.log(res/probe_num) / math.log(2.0))
-        if probe_num == 0:
-            res = 0
-        else:
-            res = lobjois/self.sat_instance.v
+        depths = []
+        estimator = LobjoisEstimator()
+        while len(depths) < num_probes and sw.lap() < self.time_limit:
+            batch_depths, solved = probes.run(rng, min(LANES, num_probes - len(depths)))
+            if solved and halt_on_assignment:
+                print("finished")
+                return None
 
-        self.unit_props_log_nodes_dict["estimate_log_number_nodes_over_vars"] = res
-        # print("lobjois log num nodes over vars", lobjois/self.sat_instance.v)
+            for depth in batch_depths:
+                depths.append(depth)
+                estimator.add(depth)
 
-        # also should be timed
-        if self.verbose:
-            print("total time:", sw.lap())
+            if self.lobjois_relative_ci is not None and \
+                    estimator.converged(self.lobjois_relative_ci, self.lobjois_min_probes):
+                break
+
+        return depths
+
+    def worker_count(self):
+        """
+        :return: number of workers for the random probes, 1 where processes cannot be forked
+        """
+        if "fork" not in multiprocessing.get_all_start_methods():
+            return 1
+        return max(1, self.num_workers)
+
+    def run_probe_workers(self, method, worker_args):
+        """
+        Run a probing method once per worker. The workers are forked, so that they share the clause database and state
+        of this prober copy on write, and each seeds random with its own seed, drawn from self.seed. With one worker
+        the method runs in this process, on the current random stream (seeded with self.seed if it is set).
+        :param method: name of the method
+        :param worker_args: tuple of the arguments of the method, for each worker, see worker_count
+        :return: list of the results of each worker, in order
+        """
+        global _worker_prober
+
+        if len(worker_args) == 1:
+            if self.seed is not None:
+                random.seed(self.seed)
+            return [getattr(self, method)(*worker_args[0])]
+
+        seeds = random.Random(self.seed) if self.seed is not None else random
+        tasks = [(method, seeds.getrandbits(64), args) for args in worker_args]
+
+        _worker_prober = self
+        try:
+            with multiprocessing.get_context("fork").Pool(len(tasks)) as pool:
+                return pool.map(_run_probe_worker, tasks, chunksize=1)
+        finally:
+            _worker_prober = None
 
     def unit_propagation_probe(self, haltOnAssignment=False):
         """
@@ -167,6 +315,7 @@ class DPLLProbing:
         # the depths are manually set, multiples of 4 each time
         current_depth = 0
         orig_num_active_vars = self.sat_instance.num_active_vars
+        root = self.mark()
         reached_bottom = False
 
         sw = Stopwatch()
@@ -186,27 +335,9 @@ class DPLLProbing:
             while current_depth < next_probe_depth and not reached_bottom and sw.lap() < self.time_limit:
                 # print("c depth", current_depth)
 
-                vars_in_most_bin_clauses = [0] * self.num_vars_to_try
-                num_bin = [0] * self.num_vars_to_try
-
-                array_size = 0
-                for var in range(1, self.sat_instance.v + 1):
-                    # if the variable is not unassigned, skip it (it already has a value (true, false) or it is irrelevant
-                    if self.sat_instance.var_states[var] != VarState.UNASSIGNED: continue
-
-                    if array_size < self.num_vars_to_try: array_size += 1
-
-                    j = 0
-                    while j < array_size - 1 and self.sat_instance.num_bin_clauses_with_var[var] < num_bin[j]:
-                        j += 1
-
-                    # what is this actually doing... somehow sorting and keeping track of the top 10 vars that occur in the most binary clauses??
-                    for k in range(array_size - 1, j, -1):
-                        vars_in_most_bin_clauses[k] = vars_in_most_bin_clauses[k - 1]
-                        num_bin[k] = num_bin[k - 1]
-
-                    vars_in_most_bin_clauses[j] = var
-                    num_bin[j] = self.sat_instance.num_bin_clauses_with_var[var]
+                # the (up to) 10 unassigned variables that occur in the most binary clauses
+                vars_in_most_bin_clauses = self.top_bin_clause_vars(self.num_vars_to_try)
+                array_size = len(vars_in_most_bin_clauses)
 
                 max_props_var = 0
                 max_props_val = False
@@ -214,13 +345,15 @@ class DPLLProbing:
                 # if there are no binary clauses, just take the first unassigned var
                 if array_size == 0:
                     max_props_var = 1
-                    while self.sat_instance.var_states[max_props_var] != VarState.UNASSIGNED and max_props_var < self.sat_instance.v:
+                    while self.sat_instance.var_states[max_props_var] != VAR_UNASSIGNED and max_props_var < self.sat_instance.cnf.num_vars:
                         max_props_var += 1
 
                     max_props_val = True
 
                 else:
                     max_props = -1
+                    # each trial assignment is undone by returning to this checkpoint
+                    trial = self.mark()
 
                     for var_num in range(array_size):
 
@@ -252,7 +385,7 @@ class DPLLProbing:
                                 max_props_var = vars_in_most_bin_clauses[var_num]
                                 max_props_val = value
 
-                            self.backtrack()
+                            self.restore(trial)
 
                             value = not value
 
@@ -283,17 +416,51 @@ class DPLLProbing:
             # print("vars reduced depth ", next_probe_depth)
             # print((orig_num_active_vars - self.sat_instance.num_active_vars - current_depth) / self.sat_instance.v)
 
-        while(self.sat_instance.num_active_vars != orig_num_active_vars):
-            self.backtrack()
+        self.restore(root)
+
+        # stop tracking the binary clause counts
+        self.bin_clause_index = None
+
+    def bin_clause_counts(self):
+        """
+        :return: the number of binary clauses that each variable occurs in, indexed by variable
+        """
+        return self.sat_instance.num_bin_clauses_with_var
+
+    def top_bin_clause_vars(self, k):
+        """
+        Select the unassigned variables that occur in the most binary clauses, see bin_clause_index
+        :param k: number of variables
+        :return: list of at most k variables
+        """
+        if self.bin_clause_index is None:
+            self.bin_clause_index = BinClauseIndex(self.sat_instance, self.sat_instance.num_bin_clauses_with_var)
+        return self.bin_clause_index.top_k(k)
+
+    def bin_clause_changed(self, clause_num):
+        """
+        Record that the binary status of a clause changed, so the counts of its variables changed
+        :param clause_num:
+        :return:
+        """
+        if self.bin_clause_index is not None:
+            self.bin_clause_index.changed_clauses.append(clause_num)
 
     def combined_probing(self):
-        self.start_probing()
-        self.reset_estimators_data()
+        """
+        Random probes for the knuth, weighted backtrack and recursive search tree size estimates. With several workers,
+        each probes for the whole time limit, and the estimator data of all of them is merged.
+        :return:
+        """
+        results = self.run_probe_workers("combined_probe_data", [() for _ in range(self.worker_count())])
 
-        while self.probing_stopwatch.lap() < self.time_limit:
-            if not self.make_decision_and_propagate():
-                self.update_estimators_data()
-                self.backtrack()
+        self.reset_estimators_data()
+        for left_subtree_size, branch_lengths, branch_probabilities, depths_knuth in results:
+            for depth, size in enumerate(left_subtree_size):
+                self.left_subtree_size[depth] += size
+            self.branch_lengths += branch_lengths
+            self.branch_probabilities += branch_probabilities
+            self.depths_knuth += depths_knuth
 
         weighted_backtrack_estimate = self.calculate_weighted_backtrack_estimate()
         recursive_estimate = self.estimate_tree_size(0)
@@ -303,6 +470,21 @@ class DPLLProbing:
         self.search_space_measures_dict["weighted_backtrack_estimate"] = weighted_backtrack_estimate
         self.search_space_measures_dict["recursive_estimate"] = recursive_estimate
 
+    def combined_probe_data(self):
+        """
+        Probe until the time limit
+        :return: the estimator data: left subtree sizes, branch lengths, branch probabilities and knuth depths
+        """
+        self.start_probing()
+        self.reset_estimators_data()
+
+        while self.probing_stopwatch.lap() < self.time_limit:
+            if not self.make_decision_and_propagate():
+                self.update_estimators_data()
+                self.backtrack()
+
+        return self.left_subtree_size, self.branch_lengths, self.branch_probabilities, self.depths_knuth
+
     def reset_estimators_data(self):
         self.left_subtree_size = [0] * (self.sat_instance.v + 1)
         self.branch_lengths = []
@@ -325,10 +507,7 @@ class DPLLProbing:
         return self.set_var_and_prop(var, value)
 
     def select_unassigned_variable(self):
-        for var in range(1, self.sat_instance.v + 1):
-            if self.sat_instance.var_states[var] == VarState.UNASSIGNED:
-                return var
-        return None
+        return self.unassigned_vars.sample()
 
     def calculate_weighted_backtrack_estimate(self):
         if not self.branch_lengths:
@@ -358,6 +537,23 @@ class DPLLProbing:
 
     def start_probing(self):
         self.probing_stopwatch.start()
+
+    def clause(self, clause_num):
+        """
+        :param clause_num:
+        :return: the literals of the clause
+        """
+        return self.literals[self.clause_offsets[clause_num]:self.clause_offsets[clause_num + 1]]
+
+    def clauses_with_literal(self, literal):
+        """
+        :param literal:
+        :return: the clauses that contain the literal
+        """
+        if literal > 0:
+            return self.pos_occ[self.pos_occ_offsets[literal]:self.pos_occ_offsets[literal + 1]]
+        return self.neg_occ[self.neg_occ_offsets[-literal]:self.neg_occ_offsets[-literal + 1]]
+
     def set_var_and_prop(self, var, value):
         """
         Sets the variable to the value, and then propagates the assignment
@@ -370,16 +566,17 @@ class DPLLProbing:
         num_vars_reduced = 1
 
         # can only set an unassigned variable to a value
-        assert self.sat_instance.var_states[var] == VarState.UNASSIGNED
+        assert self.sat_instance.var_states[var] == VAR_UNASSIGNED
 
         # set the value of the variable
         if value:
-            self.sat_instance.var_states[var] = VarState.TRUE_VAL
+            self.sat_instance.var_states[var] = VAR_TRUE
             literal = var
         else:
-            self.sat_instance.var_states[var] = VarState.FALSE_VAL
+            self.sat_instance.var_states[var] = VAR_FALSE
             literal = -var
 
+        self.unassigned_vars.remove(var)
         self.reduced_vars.append(var)
         self.sat_instance.num_active_vars -= 1
 
@@ -405,67 +602,77 @@ class DPLLProbing:
         # we are trying to assign this literal value to true (in all clauses that contain it)
         # "remove" vars from inconsistent clauses
         # check which clauses contain the negative of this literal, and remove that negative literal from them
-
-        for clause_num in self.sat_instance.clauses_with_literal(-orig_literal):
+        sat_instance = self.sat_instance
+        # local references, the loops below are the hot path of probing
+        literals = self.literals
+        clause_offsets = self.clause_offsets
+        clause_states = sat_instance.clause_states
+        clause_lengths = sat_instance.clause_lengths
+        num_bin_clauses_with_var = sat_instance.num_bin_clauses_with_var
+
+        for clause_num in self.clauses_with_literal(-orig_literal):
             # iterate through all of the clauses that contain this literal
             # if it is active
-            if self.sat_instance.clause_states[clause_num] == ClauseState.ACTIVE:
+            if clause_states[clause_num] == CLAUSE_ACTIVE:
                 self.reduced_clauses.append(clause_num)
                 num_clauses_reduced += 1
 
                 # decrease the size (this length actually represents the number of yet to be assigned variables within that clause)
-                self.sat_instance.clause_lengths[clause_num] -= 1
+                clause_lengths[clause_num] -= 1
 
-                if self.sat_instance.clause_lengths[clause_num] == 2:
+                if clause_lengths[clause_num] == 2:
+                    self.bin_clause_changed(clause_num)
                     # 0 marked as the end of the clause
                     # for (int i=0; clauses[clause][i] != 0; i++)
 
                     # iterate through the clause
-                    # for j in range(len(self.feats.clauses[clause_num])):
-                    for literal in self.sat_instance.clauses[clause_num]:
+                    for literal in literals[clause_offsets[clause_num]:clause_offsets[clause_num + 1]]:
                         # still a bit strange, does this not mark duplicates??
-                        # self.feats.num_bin_clauses_with_var[abs(self.feats.clauses[clause_num][j])] += 1
-                        self.sat_instance.num_bin_clauses_with_var[abs(literal)] += 1
+                        num_bin_clauses_with_var[abs(literal)] += 1
 
-                elif self.sat_instance.clause_lengths[clause_num] == 1:
+                elif clause_lengths[clause_num] == 1:
+                    self.bin_clause_changed(clause_num)
                     # for (int i=0; clauses[clause][i] != 0; i++)
                     # clauses themselves are never actually edited, just the values in varstates, clausestates, clauselengths etc.
-                    # for j in range(len(self.feats.clauses[clause_num])):
-                    for literal in self.sat_instance.clauses[clause_num]:
-                        self.sat_instance.num_bin_clauses_with_var[abs(literal)] -= 1
+                    for literal in literals[clause_offsets[clause_num]:clause_offsets[clause_num + 1]]:
+                        num_bin_clauses_with_var[abs(literal)] -= 1
 
                     # now a unit clause
                     # print(clause_num, "is unit clause")
-                    self.sat_instance.unit_clauses.append(clause_num)
+                    sat_instance.unit_clauses.append(clause_num)
 
-                elif self.sat_instance.clause_lengths[clause_num] == 0:
+                elif clause_lengths[clause_num] == 0:
                     # inconsistent, the last literal in the clause has been removed, and it has to be satisfied, as opposed to being removed
                     return False, num_clauses_reduced, num_vars_reduced
 
         # satisfy the consistent clauses
-        # print("consisten clause", self.feats.clauses_with_literal(orig_literal))
-        for i in range(len(self.sat_instance.clauses_with_literal(orig_literal))):
-            clause_num = self.sat_instance.clauses_with_literal(orig_literal)[i]
-            if self.sat_instance.clause_states[clause_num] == ClauseState.ACTIVE:
+        num_active_clauses_with_var = sat_instance.num_active_clauses_with_var
+        var_states = sat_instance.var_states
+        for clause_num in self.clauses_with_literal(orig_literal):
+            if clause_states[clause_num] == CLAUSE_ACTIVE:
                 # print("pacify ", clause_num)
 
-                self.sat_instance.clause_states[clause_num] = ClauseState.PASSIVE
+                clause_states[clause_num] = CLAUSE_PASSIVE
                 self.reduced_clauses.append(clause_num)
-                self.sat_instance.num_active_clauses -= 1
+                sat_instance.num_active_clauses -= 1
+                binary = clause_lengths[clause_num] == 2
+                if binary:
+                    self.bin_clause_changed(clause_num)
 
-                for j in range(len(self.sat_instance.clauses[clause_num])):
-                    curr_var = abs(self.sat_instance.clauses[clause_num][j])
-                    self.sat_instance.num_active_clauses_with_var[curr_var] -= 1
+                for literal in literals[clause_offsets[clause_num]:clause_offsets[clause_num + 1]]:
+                    curr_var = abs(literal)
+                    num_active_clauses_with_var[curr_var] -= 1
 
-                    if self.sat_instance.clause_lengths[clause_num] == 2:
-                        self.sat_instance.num_bin_clauses_with_var[curr_var] -= 1
+                    if binary:
+                        num_bin_clauses_with_var[curr_var] -= 1
 
                     # is the variable now irrelevant (active, but existing in no clauses)
-                    if self.sat_instance.num_active_clauses_with_var[curr_var] == 0 and self.sat_instance.var_states[curr_var] == VarState.UNASSIGNED:
-                        self.sat_instance.var_states[curr_var] = VarState.IRRELEVANT
+                    if num_active_clauses_with_var[curr_var] == 0 and var_states[curr_var] == VAR_UNASSIGNED:
+                        var_states[curr_var] = VAR_IRRELEVANT
+                        self.unassigned_vars.remove(curr_var)
                         self.reduced_vars.append(curr_var)
-                        self.sat_instance.num_active_vars -=1
-                        num_vars_reduced +=1
+                        sat_instance.num_active_vars -= 1
+                        num_vars_reduced += 1
 
                 num_clauses_reduced += 1
 
@@ -488,26 +695,22 @@ class DPLLProbing:
 
             # skip inactive clauses
             # print("cstate", self.feats.clause_states[clause_number])
-            if self.sat_instance.clause_states[clause_number] != ClauseState.ACTIVE: continue
+            if self.sat_instance.clause_states[clause_number] != CLAUSE_ACTIVE: continue
             # print("unit clause number", clause_number)
 
-            lit_num = 0
-
-            # while the current literal is not unassigned
-            # get the next possible unassigned literal
-            while (self.sat_instance.var_states[abs(self.sat_instance.clauses[clause_number][lit_num])] != VarState.UNASSIGNED):
-                lit_num += 1
+            # get the next possible unassigned literal, the literal literal (excuse the pun)
+            for literal in self.clause(clause_number):
+                if self.sat_instance.var_states[abs(literal)] == VAR_UNASSIGNED:
+                    break
 
             assert self.sat_instance.clause_lengths[clause_number] == 1
 
-            # get the literal literal (excuse the pun)
-            literal = self.sat_instance.clauses[clause_number][lit_num]
-
             if literal > 0:
-                self.sat_instance.var_states[abs(literal)] = VarState.TRUE_VAL
+                self.sat_instance.var_states[abs(literal)] = VAR_TRUE
             else:
-                self.sat_instance.var_states[abs(literal)] = VarState.FALSE_VAL
+                self.sat_instance.var_states[abs(literal)] = VAR_FALSE
 
+            self.unassigned_vars.remove(abs(literal))
             self.reduced_vars.append(abs(literal))
             self.sat_instance.num_active_vars -= 1
             num_vars_reduced += 1
@@ -531,8 +734,11 @@ class DPLLProbing:
         # for all the vars that were reduced, unassign them
         for i in range(num_vars_reduced):
             var = self.reduced_vars.pop()
-            self.sat_instance.var_states[var] = VarState.UNASSIGNED
+            self.sat_instance.var_states[var] = VAR_UNASSIGNED
+            self.unassigned_vars.add(var)
             self.sat_instance.num_active_vars += 1
+            if self.bin_clause_index is not None:
+                self.bin_clause_index.changed_vars.append(var)
 
         # for all of the clauses that were reduced
         num_clauses_reduced = self.num_reduced_clauses.pop()
@@ -540,33 +746,150 @@ class DPLLProbing:
             clause_num = self.reduced_clauses.pop()
 
             # re activate the clause
-            if self.sat_instance.clause_states[clause_num] != ClauseState.ACTIVE:
+            if self.sat_instance.clause_states[clause_num] != CLAUSE_ACTIVE:
                 self.sat_instance.num_active_clauses += 1
-                self.sat_instance.clause_states[clause_num] = ClauseState.ACTIVE
+                self.sat_instance.clause_states[clause_num] = CLAUSE_ACTIVE
 
                 if self.sat_instance.clause_lengths[clause_num] == 2:
-                    for j in range(len(self.sat_instance.clauses[clause_num])):
-                        literal = self.sat_instance.clauses[clause_num][j]
+                    self.bin_clause_changed(clause_num)
+                    for literal in self.clause(clause_num):
                         self.sat_instance.num_active_clauses_with_var[abs(literal)] += 1
                         self.sat_instance.num_bin_clauses_with_var[abs(literal)] += 1
                 else:
-                    for j in range(len(self.sat_instance.clauses[clause_num])):
-                        literal = self.sat_instance.clauses[clause_num][j]
+                    for literal in self.clause(clause_num):
                         self.sat_instance.num_active_clauses_with_var[abs(literal)] += 1
 
             else:
                 self.sat_instance.clause_lengths[clause_num] += 1
 
                 if self.sat_instance.clause_lengths[clause_num] == 2:
-                    for j in range(len(self.sat_instance.clauses[clause_num])):
-                        literal = self.sat_instance.clauses[clause_num][j]
+                    self.bin_clause_changed(clause_num)
+                    for literal in self.clause(clause_num):
                         self.sat_instance.num_bin_clauses_with_var[abs(literal)] += 1
 
                 elif self.sat_instance.clause_lengths[clause_num] == 3:
-                    for j in range(len(self.sat_instance.clauses[clause_num])):
-                        literal = self.sat_instance.clauses[clause_num][j]
+                    self.bin_clause_changed(clause_num)
+                    for literal in self.clause(clause_num):
                         self.sat_instance.num_bin_clauses_with_var[abs(literal)] -= 1
 
         # empty out unit clauses
         self.sat_instance.unit_clauses = []
 
+    def restore_clause(self, clause_num, reductions):
+        """
+        Reactivate a clause and give it back the literals it lost since a mark
+        :param clause_num:
+        :param reductions: number of times the clause was reduced since the mark
+        :return: the change of the active and of the binary clause count of each of its variables
+        """
+        sat_instance = self.sat_instance
+        passive = sat_instance.clause_states[clause_num] != CLAUSE_ACTIVE
+        length = sat_instance.clause_lengths[clause_num]
+        orig_length = length + reductions - passive
+
+        bin_delta = (orig_length == 2) - (not passive and length == 2)
+        if bin_delta:
+            self.bin_clause_changed(clause_num)
+        if passive:
+            sat_instance.clause_states[clause_num] = CLAUSE_ACTIVE
+            sat_instance.num_active_clauses += 1
+        sat_instance.clause_lengths[clause_num] = orig_length
+        return int(passive), bin_delta
+
+    def restore_clauses(self, reduced):
+        """
+        restore for a short trail of reduced clauses (e.g. a single trial assignment of the unit propagation probe):
+        the reductions are undone one by one, latest first, as backtrack does, without counting them first
+        :param reduced: the clauses reduced since the mark, a clause once per reduction
+        :return:
+        """
+        sat_instance = self.sat_instance
+        clause_states = sat_instance.clause_states
+        clause_lengths = sat_instance.clause_lengths
+        num_active_clauses_with_var = sat_instance.num_active_clauses_with_var
+        num_bin_clauses_with_var = sat_instance.num_bin_clauses_with_var
+        literals = self.literals
+        clause_offsets = self.clause_offsets
+
+        for clause_num in reversed(reduced):
+            if clause_states[clause_num] != CLAUSE_ACTIVE:
+                # re activate the clause
+                sat_instance.num_active_clauses += 1
+                clause_states[clause_num] = CLAUSE_ACTIVE
+                if clause_lengths[clause_num] == 2:
+                    self.bin_clause_changed(clause_num)
+                    for literal in literals[clause_offsets[clause_num]:clause_offsets[clause_num + 1]]:
+                        num_active_clauses_with_var[abs(literal)] += 1
+                        num_bin_clauses_with_var[abs(literal)] += 1
+                else:
+                    for literal in literals[clause_offsets[clause_num]:clause_offsets[clause_num + 1]]:
+                        num_active_clauses_with_var[abs(literal)] += 1
+            else:
+                length = clause_lengths[clause_num] + 1
+                clause_lengths[clause_num] = length
+                if length == 2 or length == 3:
+                    self.bin_clause_changed(clause_num)
+                    bin_delta = 1 if length == 2 else -1
+                    for literal in literals[clause_offsets[clause_num]:clause_offsets[clause_num + 1]]:
+                        num_bin_clauses_with_var[abs(literal)] += bin_delta
+
+    def mark(self):
+        """
+        Checkpoint of the probing state, to return to with restore
+        :return: trail position
+        """
+        return len(self.num_reduced_vars), len(self.reduced_vars), len(self.reduced_clauses), \
+            list(self.sat_instance.unit_clauses)
+
+    def restore(self, mark):
+        """
+        Undo all of the set_var_and_prop calls since the mark, as that many calls of backtrack would, but in one pass:
+        on a long trail, each clause reduced since the mark is repaired once, and the counts of its variables are updated
+        together, a short one is undone entry by entry, see restore_clauses.
+        The unit clauses pending at the mark are restored too.
+        :param mark: trail position from mark
+        :return:
+        """
+        sat_instance = self.sat_instance
+        num_levels, num_vars, num_clauses, unit_clauses = mark
+
+        var_states = sat_instance.var_states
+        unassigned_vars = self.unassigned_vars
+        changed_vars = self.bin_clause_index.changed_vars if self.bin_clause_index is not None else None
+        for var in reversed(self.reduced_vars[num_vars:]):
+            var_states[var] = VAR_UNASSIGNED
+            unassigned_vars.add(var)
+            if changed_vars is not None:
+                changed_vars.append(var)
+        sat_instance.num_active_vars += len(self.reduced_vars) - num_vars
+
+        if len(self.reduced_clauses) > num_clauses:
+            # every clause reduced since the mark was active then, and it was reduced once for each of its literals
+            # that was set false, and once more if it was satisfied
+            reduced = self.reduced_clauses[num_clauses:]
+            if len(reduced) < VECTORIZED_RESTORE_MIN_CLAUSES:
+                self.restore_clauses(reduced)
+            else:
+                clause_ids, num_reductions = np.unique(reduced, return_counts=True)
+                changed = []
+                active_deltas = []
+                bin_deltas = []
+                for clause_num, reductions in zip(clause_ids.tolist(), num_reductions.tolist()):
+                    active_delta, bin_delta = self.restore_clause(clause_num, reductions)
+                    if active_delta or bin_delta:
+                        changed.append(clause_num)
+                        active_deltas.append(active_delta)
+                        bin_deltas.append(bin_delta)
+
+                variables, (active_sums, bin_sums) = variable_deltas(sat_instance.cnf, changed,
+                                                                     [active_deltas, bin_deltas])
+                for var, active_sum, bin_sum in zip(variables, active_sums, bin_sums):
+                    sat_instance.num_active_clauses_with_var[var] += active_sum
+                    sat_instance.num_bin_clauses_with_var[var] += bin_sum
+
+        del self.reduced_vars[num_vars:]
+        del self.reduced_clauses[num_clauses:]
+        del self.num_reduced_vars[num_levels:]
+        del self.num_reduced_clauses[num_levels:]
+
+        sat_instance.unit_clauses = list(unit_clauses)
@@ -0,0 +1,392 @@
+import numpy as np
+
+from feature_computation.bin_clause_index import BinClauseIndex
+from feature_computation.cnf import csr_to_lists
+from feature_computation.dpll import DPLLProbing, variable_deltas, VECTORIZED_RESTORE_MIN_CLAUSES
+from feature_computation.enums import VAR_TRUE, VAR_FALSE, VAR_UNASSIGNED, VAR_IRRELEVANT
+
+
+class WatchedDPLLProbing(DPLLProbing):
+    """
+    DPLL probing on a two watched literal propagation core, selected with SATInstance(..., watched_literals=True).
+
+    Assigning a literal only visits the clauses that watch its negation, instead of every clause that contains it, and
+    clauses that are already satisfied are skipped. The assigned and irrelevant variables and the satisfied clauses are
+    recorded on flat trails, and backtracking truncates them, so clause lengths never need to be repaired.
+
+    The probes see exactly the same state as with DPLLProbing: unit clauses are kept on the same stack and pushed in the
+    same order, and a conflict is found at the same assignment, so num_active_vars, num_active_clauses and the
+    variable states agree after every step.
+
+    The number of binary clauses of each variable is only kept up to date while the unit propagation probe selects
+    variables with a BinClauseIndex: the number of literals that are not false of each clause is then counted on every
+    assignment, as the clause lengths of DPLLProbing are.
+    """
+
+    def __init__(self, sat_instance):
+        super().__init__(sat_instance)
+        v = sat_instance.cnf.num_vars
+
+        # literal indexed lists have 2v+1 entries, a negative literal -x indexes entry 2v+1-x
+        # value of each literal: 1 true, -1 false, 0 unassigned, 2 irrelevant (neither false nor unassigned)
+        var_states = np.frombuffer(sat_instance.var_states, dtype=np.int8)
+        lit_values = np.where(var_states != VAR_UNASSIGNED, 2, 0)
+        lit_values[0] = 0
+        self.lit_values = np.concatenate((lit_values, lit_values[:0:-1])).tolist()
+
+        # own copy of the literals, the two watched literals of each clause are kept at its first two positions
+        cnf = sat_instance.cnf
+        self.watched_literals = memoryview(cnf.literals.copy())
+        self.watches = self.build_watches(cnf, v)
+
+        self.satisfied = bytearray(sat_instance.cnf.num_clauses)
+        self.num_unsatisfied_clauses_with_var = list(sat_instance.num_active_clauses_with_var)
+
+        # flat trail of the satisfied clauses, self.reduced_vars is the trail of assigned and irrelevant variables
+        self.satisfied_clauses = []
+        # trail lengths at the start of each set_var_and_prop
+        self.trail_limits = []
+
+        # while bin_clause_index is set: the number of literals that are not false of each clause, and the number of
+        # unsatisfied clauses with two of them that each variable occurs in
+        self.free_lengths = None
+        self.bin_counts = None
+
+    @staticmethod
+    def build_watches(cnf, v):
+        """
+        :return: for each literal, the list of clauses that watch it, in increasing order: the first two literals of
+        each clause, or the one literal of a unit clause
+        """
+        starts = cnf.clause_offsets[:-1]
+        longer = np.flatnonzero(cnf.clause_lengths() > 1)
+        watched = np.concatenate((cnf.literals[starts], cnf.literals[starts[longer] + 1])) % (2 * v + 1)
+        clause_ids = np.concatenate((np.arange(cnf.num_clauses, dtype=np.int32), longer.astype(np.int32)))
+
+        order = np.lexsort((clause_ids, watched))
+        offsets = np.zeros(2 * v + 2, dtype=np.int64)
+        np.cumsum(np.bincount(watched, minlength=2 * v + 1), out=offsets[1:])
+        return csr_to_lists(clause_ids[order], offsets)
+
+    def set_var_and_prop(self, var, value):
+        """
+        Sets the variable to the value, and then propagates the assignment
+        :param var: integer, the variable
+        :param value: boolean, value that the variable should get set to
+        :return: False if propagation reached a conflict
+        """
+        assert self.sat_instance.var_states[var] == VAR_UNASSIGNED
+
+        self.trail_limits.append((len(self.reduced_vars), len(self.satisfied_clauses)))
+
+        consistent = self.assign(var if value else -var)
+        if consistent:
+            consistent = self.unit_prop(0, 0)[0]
+
+        return consistent
+
+    def unit_prop(self, num_clauses_reduced, num_vars_reduced):
+        """
+        Propagates the unit clauses
+        :param num_clauses_reduced:
+        :param num_vars_reduced:
+        :return:
+        """
+        num_vars = len(self.reduced_vars)
+        num_clauses = len(self.satisfied_clauses)
+        unit_clauses = self.sat_instance.unit_clauses
+
+        consistent = True
+        while unit_clauses and consistent:
+            clause_num = unit_clauses.pop()
+            if self.satisfied[clause_num]:
+                continue
+
+            # the remaining literal of a unit clause is its first watch
+            literal = self.watched_literals[self.clause_offsets[clause_num]]
+            assert self.lit_values[literal] == 0
+            consistent = self.assign(literal)
+
+        return consistent, num_clauses_reduced + len(self.satisfied_clauses) - num_clauses, \
+            num_vars_reduced + len(self.reduced_vars) - num_vars
+
+    def assign(self, literal):
+        """
+        Set the literal to true. Clauses watching its negation move the watch to another literal that is not false,
+        or become unit, and the clauses that contain the literal are satisfied. Variables left in no unsatisfied clause
+        become irrelevant.
+        :param literal:
+        :return: False if a clause has all of its literals false
+        """
+        sat_instance = self.sat_instance
+        lit_values = self.lit_values
+        var_states = sat_instance.var_states
+        satisfied = self.satisfied
+
+        var = abs(literal)
+        lit_values[literal] = 1
+        lit_values[-literal] = -1
+        var_states[var] = VAR_TRUE if literal > 0 else VAR_FALSE
+        self.unassigned_vars.remove(var)
+        self.reduced_vars.append(var)
+        sat_instance.num_active_vars -= 1
+
+        # clauses watching the false literal
+        false_lit = -literal
+        tracking = self.bin_clause_index is not None
+        if tracking:
+            self.free_lengths_changed(false_lit, -1)
+        watched = self.watched_literals
+        clause_offsets = self.clause_offsets
+        watch_list = self.watches[false_lit]
+        kept = []
+        new_units = []
+        for i in range(len(watch_list)):
+            clause_num = watch_list[i]
+            if satisfied[clause_num]:
+                kept.append(clause_num)
+                continue
+
+            start = clause_offsets[clause_num]
+            end = clause_offsets[clause_num + 1]
+            # the other watched literal, a unit clause only watches the false literal
+            other = watched[start]
+            if end - start > 1:
+                # keep the false literal at the second position
+                if other == false_lit:
+                    other = watched[start + 1]
+                    watched[start] = other
+                    watched[start + 1] = false_lit
+
+                # look for another literal to watch
+                moved = False
+                for k in range(start + 2, end):
+                    lit = watched[k]
+                    if lit_values[lit] != -1:
+                        watched[start + 1] = lit
+                        watched[k] = false_lit
+                        self.watches[lit].append(clause_num)
+                        moved = True
+                        break
+                if moved:
+                    continue
+
+            kept.append(clause_num)
+            if lit_values[other] == -1:
+                # conflict, the remaining clauses keep watching the literal
+                kept.extend(watch_list[i + 1:])
+                self.watches[false_lit] = kept
+                return False
+            new_units.append(clause_num)
+        self.watches[false_lit] = kept
+
+        # DPLLProbing finds the new unit clauses in clause order
+        new_units.sort()
+        sat_instance.unit_clauses.extend(new_units)
+
+        # satisfy the clauses that contain the literal
+        num_unsatisfied = self.num_unsatisfied_clauses_with_var
+        literals = self.literals
+        for clause_num in self.clauses_with_literal(literal):
+            if satisfied[clause_num]:
+                continue
+            satisfied[clause_num] = 1
+            self.satisfied_clauses.append(clause_num)
+            sat_instance.num_active_clauses -= 1
+            if tracking and self.free_lengths[clause_num] == 2:
+                self.bin_counts_changed(clause_num, -1)
+
+            for lit in literals[clause_offsets[clause_num]:clause_offsets[clause_num + 1]]:
+                curr_var = abs(lit)
+                num_unsatisfied[curr_var] -= 1
+                if num_unsatisfied[curr_var] == 0 and var_states[curr_var] == VAR_UNASSIGNED:
+                    var_states[curr_var] = VAR_IRRELEVANT
+                    lit_values[curr_var] = 2
+                    lit_values[-curr_var] = 2
+                    self.unassigned_vars.remove(curr_var)
+                    self.reduced_vars.append(curr_var)
+                    sat_instance.num_active_vars -= 1
+
+        return True
+
+    def backtrack(self):
+        """
+        Undo the last call of set_var_and_prop
+        :return:
+        """
+        sat_instance = self.sat_instance
+        reduced_len, satisfied_len = self.trail_limits.pop()
+
+        # in the reverse order of assignment, as DPLLProbing does, so both sample the same variables
+        for var in reversed(self.reduced_vars[reduced_len:]):
+            if self.bin_clause_index is not None:
+                self.unassign_tracked(var)
+            sat_instance.var_states[var] = VAR_UNASSIGNED
+            self.unassigned_vars.add(var)
+            self.lit_values[var] = 0
+            self.lit_values[-var] = 0
+        sat_instance.num_active_vars += len(self.reduced_vars) - reduced_len
+        del self.reduced_vars[reduced_len:]
+
+        num_unsatisfied = self.num_unsatisfied_clauses_with_var
+        for clause_num in self.satisfied_clauses[satisfied_len:]:
+            self.satisfied[clause_num] = 0
+            for lit in self.clause(clause_num):
+                num_unsatisfied[abs(lit)] += 1
+            if self.bin_clause_index is not None and self.free_lengths[clause_num] == 2:
+                self.bin_counts_changed(clause_num, 1)
+        sat_instance.num_active_clauses += len(self.satisfied_clauses) - satisfied_len
+        del self.satisfied_clauses[satisfied_len:]
+
+        # empty out unit clauses
+        sat_instance.unit_clauses = []
+
+    def mark(self):
+        """
+        Checkpoint of the probing state, to return to with restore
+        :return: trail position
+        """
+        return len(self.trail_limits), len(self.reduced_vars), len(self.satisfied_clauses), \
+            list(self.sat_instance.unit_clauses)
+
+    def restore(self, mark):
+        """
+        Undo all of the set_var_and_prop calls since the mark, truncating the trails in one pass. The counts of the
+        variables of the clauses that are no longer satisfied are updated together.
+        :param mark: trail position from mark
+        :return:
+        """
+        sat_instance = self.sat_instance
+        num_levels, num_vars, num_clauses, unit_clauses = mark
+
+        var_states = sat_instance.var_states
+        lit_values = self.lit_values
+        unassigned_vars = self.unassigned_vars
+        tracking = self.bin_clause_index is not None
+        for var in reversed(self.reduced_vars[num_vars:]):
+            if tracking:
+                self.unassign_tracked(var)
+            var_states[var] = VAR_UNASSIGNED
+            unassigned_vars.add(var)
+            lit_values[var] = 0
+            lit_values[-var] = 0
+        sat_instance.num_active_vars += len(self.reduced_vars) - num_vars
+        del self.reduced_vars[num_vars:]
+
+        unsatisfied = self.satisfied_clauses[num_clauses:]
+        satisfied = self.satisfied
+        num_unsatisfied = self.num_unsatisfied_clauses_with_var
+        if len(unsatisfied) >= VECTORIZED_RESTORE_MIN_CLAUSES:
+            for clause_num in unsatisfied:
+                satisfied[clause_num] = 0
+            variables, (sums,) = variable_deltas(sat_instance.cnf, unsatisfied, [np.ones(len(unsatisfied))])
+            for var, delta in zip(variables, sums):
+                num_unsatisfied[var] += delta
+        else:
+            for clause_num in unsatisfied:
+                satisfied[clause_num] = 0
+                for lit in self.clause(clause_num):
+                    num_unsatisfied[abs(lit)] += 1
+        if tracking:
+            for clause_num in unsatisfied:
+                if self.free_lengths[clause_num] == 2:
+                    self.bin_counts_changed(clause_num, 1)
+        sat_instance.num_active_clauses += len(unsatisfied)
+        del self.satisfied_clauses[num_clauses:]
+
+        del self.trail_limits[num_levels:]
+        sat_instance.unit_clauses = list(unit_clauses)
+
+    def unassign_tracked(self, var):
+        """
+        Update the tracked counts for a variable about to be unassigned: the literal that was false is not any more
+        :param var: assigned or irrelevant variable
+        :return:
+        """
+        state = self.sat_instance.var_states[var]
+        if state == VAR_TRUE:
+            self.free_lengths_changed(-var, 1)
+        elif state == VAR_FALSE:
+            self.free_lengths_changed(var, 1)
+        self.bin_clause_index.changed_vars.append(var)
+
+    def free_lengths_changed(self, literal, delta):
+        """
+        Count the literal as false (delta -1) or no longer false (delta 1) in the clauses that contain it, and update
+        the binary clause counts of those that are unsatisfied
+        :param literal:
+        :param delta:
+        :return:
+        """
+        free_lengths = self.free_lengths
+        satisfied = self.satisfied
+        for clause_num in self.clauses_with_literal(literal):
+            length = free_lengths[clause_num] + delta
+            free_lengths[clause_num] = length
+            if not satisfied[clause_num]:
+                if length == 2:
+                    self.bin_counts_changed(clause_num, 1)
+                elif length - delta == 2:
+                    self.bin_counts_changed(clause_num, -1)
+
+    def bin_counts_changed(self, clause_num, delta):
+        """
+        Add delta to the binary clause counts of the variables of a clause that became binary (1) or stopped being
+        binary (-1)
+        :param clause_num:
+        :param delta:
+        :return:
+        """
+        bin_counts = self.bin_counts
+        for lit in self.clause(clause_num):
+            bin_counts[abs(lit)] += delta
+        self.bin_clause_changed(clause_num)
+
+    def variable_values(self):
+        """
+        :return: numpy array of the value of the positive literal of each variable
+        """
+        return np.array(self.lit_values[:self.sat_instance.cnf.num_vars + 1], dtype=np.int8)
+
+    def bin_clause_counts(self):
+        """
+        Number of binary clauses each variable occurs in: unsatisfied clauses with exactly two literals that are not
+        false, counting all of their literals, as maintained by DPLLProbing.
+        :return: list indexed by variable
+        """
+        return self.bin_clause_count_array(self.variable_values()).tolist()
+
+    def free_length_array(self, values):
+        """
+        :param values: value of the positive literal of each variable
+        :return: numpy array of the number of literals of each clause that are not false
+        """
+        cnf = self.sat_instance.cnf
+        literal_false = values[cnf.literal_variables()] * np.sign(cnf.literals) == -1
+        return cnf.clause_lengths() - np.bincount(cnf.literal_clause_ids()[literal_false], minlength=cnf.num_clauses)
+
+    def bin_clause_count_array(self, values):
+        """
+        :param values: value of the positive literal of each variable
+        :return: numpy array of the number of binary clauses of each variable
+        """
+        cnf = self.sat_instance.cnf
+        unsatisfied = np.frombuffer(self.satisfied, dtype=np.uint8) == 0
+        binary = unsatisfied & (self.free_length_array(values) == 2)
+
+        return np.bincount(cnf.literal_variables()[binary[cnf.literal_clause_ids()]], minlength=cnf.num_vars + 1)
+
+    def top_bin_clause_vars(self, k):
+        """
+        Select the unassigned variables that occur in the most binary clauses, see bin_clause_index. The counts are
+        computed from the current assignment once, and then kept up to date on every assignment and backtrack until
+        bin_clause_index is reset.
+        :param k: number of variables
+        :return: list of at most k variables
+        """
+        if self.bin_clause_index is None:
+            values = self.variable_values()
+            self.free_lengths = self.free_length_array(values).tolist()
+            self.bin_counts = self.bin_clause_count_array(values).tolist()
+            self.bin_clause_index = BinClauseIndex(self.sat_instance, self.bin_counts)
+        return self.bin_clause_index.top_k(k)
@@ -1,13 +1,24 @@
-from enum import Enum
+from enum import IntEnum
 
 
-class VarState(Enum):
+# the states are stored as their integer codes, in int8 arrays, and the members compare equal to the codes
+class VarState(IntEnum):
     TRUE_VAL = 1
     FALSE_VAL = 2
     UNASSIGNED = 3
     IRRELEVANT = 4
 
 
-class ClauseState(Enum):
+class ClauseState(IntEnum):
     ACTIVE = 1
     PASSIVE = 2
+
+
+# integer codes of the states, used in the int8 state arrays
+VAR_TRUE = VarState.TRUE_VAL.value
+VAR_FALSE = VarState.FALSE_VAL.value
+VAR_UNASSIGNED = VarState.UNASSIGNED.value
+VAR_IRRELEVANT = VarState.IRRELEVANT.value
+
+CLAUSE_ACTIVE = ClauseState.ACTIVE.value
+CLAUSE_PASSIVE = ClauseState.PASSIVE.value
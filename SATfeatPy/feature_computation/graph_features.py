@@ -1,68 +1,47 @@
-import networkx as nx
+import numpy as np
 
+from feature_computation import variable_graph
 
-def create_vcg(clauses, c, v):
+
+def create_vcg(cnf, c, v):
     """
     Create VCG
     Variable-Clause Graph features
     A variable-clause graph (VCG) is a bipartite graph with a node for each variable, a node for each clause,
     and an edge between them whenever a variable occurs in a clause
 
-    :param clauses:
-    :param c:
-    :param v:
-    :return: Variable node degrees and clause node degrees
-    """
-    vcg = nx.Graph()
-
-    # Node for each variable
-    # node for each clause
+    The graph is not built: the degree of a clause is the number of distinct variables it contains, and the degree of
+    a variable the number of clauses it occurs in, both counted with np.bincount over the (clause, variable) pairs of
+    the CNF core.
 
-    for i, clause in enumerate(clauses):
-        c_node = "c_" + str(i)
-
-        for literal in clause:
-            v_node = "v_" + str(abs(literal))
-
-            vcg.add_edge(c_node, v_node)
+    :param cnf: CNF core of the cnf
+    :param c: number of clause nodes, clauses 0..c-1
+    :param v: number of variable nodes, variables 1..v
+    :return: Variable node degrees and clause node degrees, 0 for nodes without edges
+    """
+    clause_ids = cnf.literal_clause_ids().astype(np.int64)
+    variables = cnf.literal_variables().astype(np.int64)
 
-    v_node_degrees = []
-    c_node_degrees = []
-    # get node statistics
-    for i in range(c):
-        degree = len(nx.edges(vcg, "c_" + str(i)))
-        c_node_degrees.append(degree)
+    # a variable repeated in a clause is a single edge. Normalized clauses have their literals sorted by distinct
+    # variable, so the pairs are already strictly increasing and no sort is needed
+    pairs = clause_ids * (cnf.num_vars + 1) + variables
+    if len(pairs) > 1 and not np.all(pairs[1:] > pairs[:-1]):
+        pairs = np.unique(pairs)
+        clause_ids = pairs // (cnf.num_vars + 1)
+        variables = pairs % (cnf.num_vars + 1)
 
-    for i in range(1, v + 1):
-        degree = len(nx.edges(vcg, "v_" + str(i)))
-        v_node_degrees.append(degree)
+    c_node_degrees = np.bincount(clause_ids, minlength=c)[:c]
+    v_node_degrees = np.bincount(variables, minlength=v + 1)[1:v + 1]
 
-    return v_node_degrees, c_node_degrees
+    return v_node_degrees.tolist(), c_node_degrees.tolist()
 
 
-def create_vg(clauses):
+def create_vg(cnf):
     """
     A variable graph (VG) has a node for each variable, and an edge between variables that occur together in at least one clause
 
-    :param clauses:
+    :param cnf: CNF core of the cnf
     :return: The degree of each node in the variable graph
     """
-
-    # for each literal in a clause, for all the other literals in that clause
-    vg = nx.Graph()
-
-    for k, clause in enumerate(clauses):
-
-        for i in range(len(clause)):
-            for j in range(i + 1, len(clause)):
-                v_node_i = "v_" + str(abs(clause[i]))
-                v_node_j = "v_" + str(abs(clause[j]))
-                vg.add_edge(v_node_i, v_node_j)
-
-    node_degrees = []
-
-    for n in vg.nodes:
-        degree = len(nx.edges(vg, n))
-        node_degrees.append(degree)
-
-    return node_degrees
+    node_degrees, _ = variable_graph.vg_degrees_weights(cnf)
+    return node_degrees.tolist()
@@ -39,35 +39,31 @@ We can find this maximum partition with the community package (uses louvain meth
 """
 
 
-def estimate_power_law_alpha(clauses, c, v):
+def estimate_power_law_alpha(cnf, c, v):
     """
     Estimates the power law alpha (Code adapted from Ansotegui implementation)
-    :param clauses:
+    :param cnf: CNF core of the cnf
     :param c:
     :param v:
     :return: best fit estimated alpha
     """
-    X, Y, Sylogx, Syx = variable_occurrences(clauses, c, v)
+    X, Y, Sylogx, Syx = variable_occurrences(cnf, c, v)
     alpha = most_likely(X, Y, Sylogx, Syx)
 
     return alpha
 
 
-def variable_occurrences(clauses, c, v):
+def variable_occurrences(cnf, c, v):
     """
     Computes the number of occurrences of each variable, and extra values based on these occurrences needed to estimate the power law fit
-    :param clauses:
+    :param cnf: CNF core of the cnf
     :param c:
     :param v:
     :return:
     """
     # variable count is needed
     # index of the variable will contain the number of times it occurs in the cnf formula (in all clauses)
-    variable_count = [0] * (v + 1)
-
-    for clause in clauses:
-        for literal in clause:
-            variable_count[abs(literal)] += 1
+    variable_count = cnf.variable_occurrences().tolist()
 
     # compute the function f_v(k), which is the number of variables that have a number of occurrences equal to k, divided by the number of variables n.
     f_v_k = [0] * (c + 1)
@@ -1,327 +1,171 @@
-import networkx as nx
 import numpy as np
-from scipy import stats
 
+from feature_computation import array_stats, variable_graph, clause_graph, implication_graph
 
-def create_vcg(clauses):
+# the outputs of graph_features, in the order they are computed
+GRAPHS = ("vcg", "vg", "cg", "rg", "big", "big_equiv") + implication_graph.GATE_GRAPHS
+
+
+def create_vcg(cnf):
     """
     Create VCG
     Variable-Clause Graph features
     A variable-clause graph (VCG) is a bipartite graph with a node for each variable, a node for each clause,
     and an edge between them whenever a variable occurs in a clause
 
-    :param clauses:
+    The graph is split into the edges of positive and of negative literals. The degrees are the literal counts of the
+    CNF core, listed in the order the nodes are first seen in the clauses.
+
+    :param cnf: CNF core of the cnf
     :return: Variable node degrees and clause node degrees
     """
-    vcgpos = nx.Graph()
-    vcgneg = nx.Graph()
-
-    # Node for each variable
-    # node for each clause
-
-    for i, clause in enumerate(clauses):
-        c_node = "c_" + str(i)
-
-        for literal in clause:
-            if literal > 0:
-                v_node = "v_" + str(literal)
-                vcgpos.add_edge(c_node, v_node)
-            elif literal < 0:
-                v_node = "v_" + str(literal)
-                vcgneg.add_edge(c_node, v_node)
-
-    v_node_degrees_pos = []
-    v_node_degrees_neg = []
-    c_node_degrees_pos = []
-    c_node_degrees_neg = []
-
-    # get node statistics
-    for i in vcgpos.nodes():
-        if 'c' in i:
-            degree = len(nx.edges(vcgpos, i))
-            c_node_degrees_pos.append(degree)
-        elif 'v' in i:
-            degree = len(nx.edges(vcgpos, i))
-            v_node_degrees_pos.append(degree)
-    for i in vcgneg.nodes():
-        if 'c' in i:
-            degree = len(nx.edges(vcgneg, i))
-            c_node_degrees_neg.append(degree)
-        elif 'v' in i:
-            degree = len(nx.edges(vcgneg, i))
-            v_node_degrees_neg.append(degree)
+    positive = cnf.literals > 0
+    negative = cnf.literals < 0
+
+    v_node_degrees_pos = _degrees_in_order_seen(cnf.literal_variables()[positive])
+    v_node_degrees_neg = _degrees_in_order_seen(cnf.literal_variables()[negative])
+    # clause ids are increasing, so the clauses are seen in order
+    c_node_degrees_pos = _degrees_in_order_seen(cnf.literal_clause_ids()[positive])
+    c_node_degrees_neg = _degrees_in_order_seen(cnf.literal_clause_ids()[negative])
 
     return v_node_degrees_pos, v_node_degrees_neg, c_node_degrees_pos, c_node_degrees_neg
 
 
-def create_vg(clauses):
+def _degrees_in_order_seen(nodes):
     """
-    A variable graph (VG) has a node for each variable, and an edge between variables that occur together in at least
-    one clause
-
-    :param clauses:
-    :return: The degree of each node in the variable graph
+    :param nodes: node of each edge, in order of insertion
+    :return: number of edges of each node, in order of the first edge of the node
     """
+    unique_nodes, first_seen, counts = np.unique(nodes, return_index=True, return_counts=True)
+    return counts[np.argsort(first_seen)]
 
-    # for each literal in a clause, for all the other literals in that clause and the weight for each edge
-    vg = nx.Graph()
-
-    for k, clause in enumerate(clauses):
-
-        for i in range(len(clause)):
-            k = 0
-            for j in range(i + 1, len(clause)):
-                v_node_i = "v_" + str(abs(clause[i]))
-                v_node_j = "v_" + str(abs(clause[j]))
-                k += 1
-                vg.add_edge(v_node_i, v_node_j, weight=pow(2, -k))
-
-    node_degrees = []
-    weights = []
-
-    for n in vg.nodes:
-        degree = len(nx.edges(vg, n))
-        node_degrees.append(degree)
-        for weight in vg.edges.data("weight", n):
-            weights.append(weight[2])
-
-    return node_degrees, weights
 
-
-def create_cg(clauses):
+def create_vg(cnf):
     """
-    A clause graph (CG) has a node for each clause, and an edge between clauses that have the same literal
+    A variable graph (VG) has a node for each variable, and an edge between variables that occur together in at least
+    one clause. The edge of literals i < j of a clause has weight 2^-(j-i), from the last clause with both variables.
+    The graph is not built, see variable_graph.
 
-    :param clauses:
-    :return: The degree of each node in the variable graph and the weight for each edge
+    :param cnf: CNF core of the cnf
+    :return: The degree of each node in the variable graph, and the weight of each edge
     """
+    return variable_graph.vg_degrees_weights(cnf)
 
-    cg = nx.Graph()
-
-    c_node = []
-
-    for i, clause in enumerate(clauses):
-        c_n = "c_" + str(i)
-        c_node.append(c_n)
-
-    for i, clause in enumerate(clauses):
-        for literal in clause:
-            weight = 0
-            for j, clause_next in enumerate(clauses[i + 1:]):
-                if literal in clause_next:
-                    weight += 1
-                    cg.add_edge(c_node[i], c_node[i + 1 + j], weight=weight)
-
-    node_degrees = []
-    weights = []
 
-    for n in cg.nodes:
-        degree = len(nx.edges(cg, n))
-        for weight in cg.edges.data("weight", n):
-            weights.append(weight[2])
-        node_degrees.append(degree)
+def create_cg(cnf):
+    """
+    A clause graph (CG) has a node for each clause, and an edge between clauses that have the same literal. The graph
+    is not built, the edges come from the literal occurrence lists, see clause_graph.
 
-    return node_degrees, weights
+    :param cnf: CNF core of the cnf
+    :return: The degree of each node in the clause graph and the weight of each edge
+    """
+    return clause_graph.cg_degrees_weights(cnf)
 
 
-def create_rg(clauses):
+def create_rg(cnf):
     """
     A resolution graph (RG) has a node for each clause, and an edge between clauses if they produce a
-    non-tautological resolvent
+    non-tautological resolvent, i.e. they clash on exactly one variable. The weight of the edge of clauses with k
+    literals together is 2^-(k-2). The graph is not built, see clause_graph.
 
-    :param clauses:
-    :return: The degree of each node in the variable graph and the weight for each edge
+    :param cnf: CNF core of the cnf
+    :return: The degree of each node in the resolution graph and the weight of each edge
     """
+    return clause_graph.rg_degrees_weights(cnf)
 
-    rg = nx.Graph()
-
-    c_node = []
-
-    for i, clause in enumerate(clauses):
-        c_n = "c_" + str(i)
-        c_node.append(c_n)
-
-    for i, clause in enumerate(clauses):
-        for j, clause_next in enumerate(clauses[i + 1:]):
-            if len(list(set(clause) & set(clause_next))) == 1:
-                k = len(set(clause)) + len(set(clause_next))
-                weight = pow(2, -(k - 2))
-                rg.add_edge(c_node[i], c_node[i + 1 + j], weight=weight)
 
-    node_degrees = []
-    weights = []
-
-    for n in rg.nodes:
-        degree = len(nx.edges(rg, n))
-        for weight in rg.edges.data("weight", n):
-            weights.append(weight[2])
-        node_degrees.append(degree)
-
-    return node_degrees, weights
-
-
-def create_big(clauses):
+def create_big(cnf):
     """
     A binary implication graph (BIG) it's a directed graph that has a node for each literal, and an edge if
-    there's an implication between the literals
+    there's an implication between the literals. It is built once, in CSR form, see implication_graph.
 
-    :param clauses:
-    :return: The degree of each node in the variable graph and the weight of each edge
+    :param cnf: CNF core of the cnf
+    :return: The BIG, the out degree of each node and the weight of each edge
     """
-
-    big = nx.DiGraph()
-
-    for k, clause in enumerate(clauses):
-        for i in range(len(clause)):
-            v_node1 = "v_" + str(abs(clause[i]))
-            v_node2 = "v_" + str(-abs(clause[i]))
-            big.add_node(v_node1)
-            big.add_node(v_node2)
-
-    for clause in clauses:
-        if len(clause) == 2:
-            a = clause[0]
-            b = clause[1]
-            big.add_edge('v_' + str(-a), 'v_' + str(b), weight=1)
-            big.add_edge('v_' + str(-b), 'v_' + str(a), weight=1)
-
-    node_degrees = []
-    weights = []
-
-    for n in big.nodes:
-        degree = len(nx.edges(big, n))
-        for weight in big.edges.data("weight", n):
-            weights.append(weight[2])
-        node_degrees.append(degree)
-
+    big = implication_graph.ImplicationGraph(cnf)
+    node_degrees, weights = implication_graph.big_degrees_weights(cnf, big)
     return big, node_degrees, weights
 
 
-def neighbors_nodes(l, clauses):
-    big, _, _ = create_big(clauses)
-    neighbors = big.neighbors('v_' + str(l))
-    return neighbors
+def get_big_equivalence_stats(cnf, big=None):
+    """
+    Equivalent literals and failed literals of the BIG, from its strongly connected components, see implication_graph
+
+    :param cnf: CNF core of the cnf
+    :param big: BIG of the cnf from create_big, built if not given
+    :return: dictionary with the equivalence class counts and sizes, the failed literals and the size of the
+    transitive reduction
+    """
+    return implication_graph.equivalence_features(cnf, big)
 
 
-def create_exo_and_band(clauses):
+def create_exo_and_band(cnf, big=None):
     """
         Full-AND, Blocked-AND and Exactly One Constraint Graphs
 
-        :param clauses:
-        :return: The degree of each node in the variable graph and the weight of each edge
+        The clauses are scanned once against the BIG, the graphs are not built, see implication_graph.
+
+        :param cnf: CNF core of the cnf
+        :param big: BIG of the cnf from create_big, built if not given
+        :return: The degree of each node and the weight of each edge of the Full-AND, Blocked-AND and Exactly One
+        Constraint Graphs
     """
+    return list(implication_graph.exo_and_band_degrees_weights(cnf, big))
 
-    andg = nx.Graph()
-    bandg = nx.Graph()
-    exog = nx.Graph()
-
-    for k, clause in enumerate(clauses):
-        for i in range(len(clause)):
-            v_node1 = "v_" + str(abs(clause[i]))
-            v_node2 = "v_" + str(-abs(clause[i]))
-            andg.add_node(v_node1)
-            andg.add_node(v_node2)
-            bandg.add_node(v_node1)
-            bandg.add_node(v_node2)
-            exog.add_node(v_node1)
-            exog.add_node(v_node2)
-
-    for clause in clauses:
-        if len(clause) > 2:
-            exo = True
-            for l0 in clause:
-                k = 0
-                rem_clause = clause[:]
-                rem_clause.remove(l0)
-                for l1 in rem_clause:
-                    nodel1neg = 'v_' + str(-l1)
-                    if nodel1neg not in neighbors_nodes(l0, clauses):
-                        exo = False
-                        break
-                    k += 1
-                    andg.add_edge('v_' + str(l1), 'v_' + str(-l0), weight=pow(2, -k))
-                if not exo:
-                    break
-
-            if not exo:
-                obv_block = True
-                for l0 in clause:
-                    k = 0
-                    rem_clause = clause[:]
-                    rem_clause.remove(l0)
-                    for l1 in rem_clause:
-                        if len(clause) > 3:
-                            obv_block = False
-                            break
-                        k += 1
-                        bandg.add_edge('v_' + str(l1), 'v_' + str(-l0), weight=pow(2, -k))
-                    if not obv_block:
-                        break
-            elif exo:
-                for l0 in clause:
-                    rem_clause = clause[:]
-                    rem_clause.remove(l0)
-                    for l1 in rem_clause:
-                        exog.add_edge('v_' + str(l1), 'v_' + str(l0), weight=1)
-
-    return andg, bandg, exog
-
-
-def get_degrees_weights(G):
+
+def graph_features(cnf, graphs=GRAPHS):
     """
-            Function to get node degrees and weights for Full-AND, Blocked-AND and Exactly One Constraint Graphs
+    Statistics of the requested graphs, computed one graph at a time
+
+    The builders share the indexes cached on the CNF core (clause lengths, literal clauses and variables, occurrence
+    lists), and the BIG is built once for the graphs that need it. Each graph's degree and weight lists are turned
+    into statistics before the next graph is built, so the peak memory is the one of the largest graph, and graphs
+    that are not requested are not built.
 
-            :param Graph:
-            :return: The degree of each node in the variable graph and the weight of each edge
+    :param cnf: CNF core of the cnf
+    :param graphs: the outputs to compute, among GRAPHS
+    :return: generator of a dictionary of features per graph
     """
-    node_degrees = []
-    weights = []
+    unknown = set(graphs) - set(GRAPHS)
+    if unknown:
+        raise ValueError("Unknown graphs: " + ", ".join(sorted(unknown)))
 
-    for n in G.nodes:
-        degree = len(nx.edges(G, n))
-        for weight in G.edges.data("weight", n):
-            weights.append(weight[2])
-        node_degrees.append(degree)
+    if "vcg" in graphs:
+        for name, node_degrees in zip(["v_nd_p_", "v_nd_n_", "c_nd_p_", "c_nd_n_"], create_vcg(cnf)):
+            yield get_graph_stats(name, node_degrees)
+    if "vg" in graphs:
+        yield get_graph_stats("vg_al_", *create_vg(cnf))
+    if "cg" in graphs:
+        yield get_graph_stats("cg_al_", *create_cg(cnf))
+    if "rg" in graphs:
+        yield get_graph_stats("rg_", *create_rg(cnf))
 
-    return node_degrees, weights
+    gate_graphs = [name for name in implication_graph.GATE_GRAPHS if name in graphs]
+    if "big" not in graphs and "big_equiv" not in graphs and not gate_graphs:
+        return
+    big = implication_graph.ImplicationGraph(cnf)
+    if "big" in graphs:
+        yield get_graph_stats("big_", *implication_graph.big_degrees_weights(cnf, big))
+    if "big_equiv" in graphs:
+        yield get_big_equivalence_stats(cnf, big)
+    if gate_graphs:
+        for name, (node_degrees, weights) in zip(gate_graphs,
+                                                implication_graph.exo_and_band_degrees_weights(cnf, big, gate_graphs)):
+            yield get_graph_stats(name + "_", node_degrees, weights)
 
 
 def get_graph_stats(name, node_degrees, weights=0):
     """
                 Function to get statistics for different graphs
 
-                :param node_degrees and weights:
+                Each list is summarised in one pass, see array_stats.ValueSketch, and can be given as chunks.
+
+                :param node_degrees and weights: arrays or lists, or iterators of chunks of them
                 :return: dictionary with different stats
     """
-
-    if not node_degrees:
-        node_degrees = [0]
-    if not weights:
-        weights = [0]
-
-    node_min = np.min(node_degrees)
-    node_max = np.max(node_degrees)
-    node_mode = stats.mode(node_degrees)
-    node_mean = np.mean(node_degrees)
-    node_std = np.std(node_degrees)
-    node_zeros = np.count_nonzero(node_degrees == 0)
-    node_entropy = stats.entropy(node_degrees)
-    node_quantiles = stats.mstats.mquantiles(node_degrees)
-    node_val_rate = np.count_nonzero(node_degrees == node_mode) / len(node_degrees)
-    node_stats = [node_min, node_max, node_mode, node_mean, node_std, node_zeros, node_entropy, node_quantiles[0],
-                  node_quantiles[1], node_quantiles[2], node_val_rate]
-
-    weights_min = np.min(weights)
-    weights_max = np.max(weights)
-    weights_mode = stats.mode(weights)
-    weights_mean = np.mean(weights)
-    weights_std = np.std(weights)
-    weights_zeros = np.count_nonzero(weights == 0)
-    weights_entropy = stats.entropy(weights)
-    weights_quantiles = stats.mstats.mquantiles(weights)
-    weights_val_rate = np.count_nonzero(weights == weights_mode) / len(weights)
-    weights_stats = [weights_min, weights_max, weights_mode, weights_mean, weights_std, weights_zeros, weights_entropy,
-                     weights_quantiles[0], weights_quantiles[1], weights_quantiles[2], weights_val_rate]
+    node_stats = value_stats(node_degrees)
+    weights_stats = value_stats(weights)
 
     deg_names = ["node_min", "node_max", "node_mode", "node_mean", "node_std", "node_zeros", "node_entropy", "node_q1",
                  "node_q2", "node_q3", "node_val_rate"]
@@ -336,3 +180,17 @@ def get_graph_stats(name, node_degrees, weights=0):
     stats_dict.update(dict(zip(weights_names, weights_stats)))
 
     return stats_dict
+
+
+def value_stats(values):
+    """
+    :param values: array, list or number, or an iterator of arrays
+    :return: the statistics of the values, 0 if there are none, see array_stats.ValueSketch.stats
+    """
+    sketch = array_stats.ValueSketch()
+    chunks = [values] if np.isscalar(values) or isinstance(values, (list, tuple, np.ndarray)) else values
+    for chunk in chunks:
+        sketch.update(chunk)
+    if sketch.count == 0:
+        sketch.update([0])
+    return sketch.stats()
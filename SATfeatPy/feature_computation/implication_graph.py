@@ -0,0 +1,362 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from feature_computation import array_stats
+
+"""
+Binary implication graph (BIG) and the Full-AND, Blocked-AND and exactly one (EXO) graphs of Manthey-Alfonso, without
+networkx.
+
+Literals are indexed by their code, literal + num_vars. The graphs have a node for both literals of every variable that
+occurs in a clause, ordered by the first occurrence of the variable, the positive literal first. The degree and weight
+lists are in the order of the networkx graphs that the edges are added to clause by clause, with each edge weight
+listed once.
+
+The strongly connected components (SCCs) of the BIG are classes of equivalent literals. They come from scipy's iterative
+Tarjan (Pearce) SCC pass, and a single iterative depth first search over the DAG of the SCCs stamps each component with
+its discovery and finish times, as in Unhiding (Heule, Jarvisalo, Biere). A component is an ancestor of another in the
+search forest when its stamps enclose the other's, which proves a path between them: it finds failed literals (x implies
+-x) and transitive edges, in O(V + E) and without recursion. Paths that the forest does not show are missed, so the
+failed literal count is a lower bound and the reduced edge count an upper bound.
+"""
+
+# the graphs of exactly one and AND gates
+GATE_GRAPHS = ("and", "band", "exo")
+
+
+class ImplicationGraph:
+    """
+    BIG of the binary clauses in CSR form: a binary clause (a, b) gives the implications -a -> b and -b -> a. The
+    successors of the literal with code x are successors[offsets[x]:offsets[x + 1]], in increasing code order.
+    """
+
+    def __init__(self, cnf):
+        self.num_vars = cnf.num_vars
+        num_codes = 2 * cnf.num_vars + 1
+
+        lengths = cnf.clause_lengths()
+        binary = cnf.literals[cnf.clause_offsets[:-1][lengths == 2]].astype(np.int64)
+        binary_second = cnf.literals[cnf.clause_offsets[:-1][lengths == 2] + 1].astype(np.int64)
+
+        # the two implications of each binary clause, in the order they are added
+        sources = np.column_stack((-binary, -binary_second)).ravel() + cnf.num_vars
+        targets = np.column_stack((binary_second, binary)).ravel() + cnf.num_vars
+        keys = sources * num_codes + targets
+        self.edge_keys, first = np.unique(keys, return_index=True)
+        self.added = np.sort(first)
+
+        self.sources = self.edge_keys // num_codes
+        self.successors = self.edge_keys % num_codes
+        self.offsets = np.zeros(num_codes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=num_codes), out=self.offsets[1:])
+
+    def literal_successors(self, literal):
+        """
+        :param literal:
+        :return: the literals implied by the literal
+        """
+        code = literal + self.num_vars
+        return self.successors[self.offsets[code]:self.offsets[code + 1]] - self.num_vars
+
+    def implies(self, sources, targets):
+        """
+        :param sources: array of literals
+        :param targets: array of literals, of the same shape
+        :return: boolean array, whether each source implies its target in one step
+        """
+        num_codes = 2 * self.num_vars + 1
+        keys = (np.asarray(sources, dtype=np.int64) + self.num_vars) * num_codes + \
+            np.asarray(targets, dtype=np.int64) + self.num_vars
+        if len(self.edge_keys) == 0:
+            return np.zeros(keys.shape, dtype=bool)
+        found = np.minimum(np.searchsorted(self.edge_keys, keys), len(self.edge_keys) - 1)
+        return self.edge_keys[found] == keys
+
+
+def literal_node_ranks(cnf):
+    """
+    :param cnf: CNF core of the cnf
+    :return: the node rank of each literal code (-1 for the literals of variables in no clause), and the number of nodes
+    """
+    variables, first_seen = np.unique(cnf.literal_variables(), return_index=True)
+    variables = variables[np.argsort(first_seen)].astype(np.int64)
+
+    rank = np.full(2 * cnf.num_vars + 1, -1, dtype=np.int64)
+    rank[variables + cnf.num_vars] = 2 * np.arange(len(variables))
+    rank[cnf.num_vars - variables] = 2 * np.arange(len(variables)) + 1
+    return rank, 2 * len(variables)
+
+
+def big_degrees_weights(cnf, big=None):
+    """
+    :param cnf: CNF core of the cnf
+    :param big: ImplicationGraph of the cnf, built if not given
+    :return: the out degree of each node, and the weight (1) of each edge
+    """
+    if big is None:
+        big = ImplicationGraph(cnf)
+    rank, num_nodes = literal_node_ranks(cnf)
+
+    degrees = np.bincount(rank[big.sources], minlength=num_nodes)
+    return degrees, np.ones(len(big.edge_keys), dtype=np.int64)
+
+
+def undirected_lists(u, v, added, weights, rank, num_nodes):
+    """
+    Degree and weight lists of an undirected graph with the given nodes, whose edges are added in the order of added
+    and keep the weight of their last addition
+    :param u: literal code of one end of each added edge
+    :param v: literal code of the other end
+    :param added: distinct keys, in the order the edges are added
+    :param weights: weight of each added edge
+    :param rank: node rank of each literal code
+    :param num_nodes:
+    :return: the degree of each node, as an array in node order, and the weight of each edge, as an array by the first of
+    their two nodes, then in the order they were added
+    """
+    low = np.minimum(u, v)
+    high = np.maximum(u, v)
+    edge = low * len(rank) + high
+
+    by_edge = np.lexsort((added, edge))
+    edge = edge[by_edge]
+    changes = edge[1:] != edge[:-1]
+    starts = np.flatnonzero(np.concatenate(([True], changes))[:len(edge)])
+    ends = np.flatnonzero(np.concatenate((changes, [True]))[:len(edge)])
+    low = low[by_edge][starts]
+    high = high[by_edge][starts]
+    first_added = added[by_edge][starts]
+    weights = np.asarray(weights)[by_edge][ends]
+
+    # a self loop adds one to the degree of its node
+    loop = low == high
+    degrees = np.bincount(np.concatenate((rank[low], rank[high[~loop]])), minlength=num_nodes)
+
+    edge_order = np.lexsort((first_added, np.minimum(rank[low], rank[high])))
+    return degrees, weights[edge_order]
+
+
+def gate_edges(cnf, big):
+    """
+    Scan the clauses with more than two literals for exactly one constraints: for each literal l0 of the clause, in
+    order, and each other literal l1, l0 must imply -l1 in the BIG. Every implication found before the first that is
+    missing gives an AND edge (l1, -l0), weighted 2^-k for the k-th literal l1 of l0. Only clauses still passing are
+    scanned further, one l0 at a time for all clauses of the same length.
+    :param cnf: CNF core of the cnf
+    :param big: ImplicationGraph of the cnf
+    :return: the AND edges (u, v, added, weights) as literal code arrays, and the clause numbers of the exactly one
+    constraints
+    """
+    lengths = cnf.clause_lengths()
+    max_length = int(lengths.max()) if cnf.num_clauses > 0 else 1
+
+    edges = []
+    exo_clauses = []
+    for length in np.unique(lengths[lengths > 2]).tolist():
+        clause_nums = np.flatnonzero(lengths == length)
+        starts = cnf.clause_offsets[:-1][clause_nums]
+        clause_literals = cnf.literals[starts[:, None] + np.arange(length)].astype(np.int64)
+
+        alive = np.arange(len(clause_nums))
+        for p in range(length):
+            if len(alive) == 0:
+                break
+            others = np.array([q for q in range(length) if q != p])
+            l0 = clause_literals[alive, p][:, None]
+            l1 = clause_literals[alive][:, others]
+            implied = big.implies(np.broadcast_to(l0, l1.shape), -l1)
+
+            # number of implications found before the first missing one
+            passed = np.where(implied.all(axis=1), length - 1, np.argmin(implied, axis=1))
+            rows, ks = np.nonzero(np.arange(length - 1) < passed[:, None])
+            edges.append((l1[rows, ks], -l0[rows, 0], (starts[alive[rows]] + p) * max_length + ks,
+                          np.ldexp(1.0, -(ks + 1))))
+            alive = alive[passed == length - 1]
+
+        exo_clauses.append(clause_nums[alive])
+
+    if not edges:
+        return [np.zeros(0, dtype=np.int64)] * 3 + [np.zeros(0)], np.zeros(0, dtype=np.int64)
+    u, v, added, weights = [np.concatenate(columns) for columns in zip(*edges)]
+    return (u + cnf.num_vars, v + cnf.num_vars, added, weights), np.concatenate(exo_clauses)
+
+
+def all_pair_edges(cnf, clause_nums, negate_first):
+    """
+    The edges (l1, l0), or (l1, -l0), of every literal l0 of the clauses and every other literal l1, in the order of the
+    clauses, l0, then l1, with weight 2^-k for the k-th literal l1 of l0
+    :param cnf: CNF core of the cnf
+    :param clause_nums: increasing clause numbers
+    :param negate_first: whether the edges go to -l0
+    :return: edges (u, v, added, weights) as literal code arrays
+    """
+    lengths = cnf.clause_lengths()
+    max_length = int(lengths.max()) if cnf.num_clauses > 0 else 1
+
+    edges = []
+    for length in np.unique(lengths[clause_nums]).tolist():
+        starts = cnf.clause_offsets[:-1][clause_nums[lengths[clause_nums] == length]]
+        p, k = np.divmod(np.arange(length * (length - 1)), length - 1)
+        q = k + (k >= p)
+        l0 = cnf.literals[starts[:, None] + p].astype(np.int64)
+        l1 = cnf.literals[starts[:, None] + q].astype(np.int64)
+        added = (starts[:, None] + p) * max_length + k
+        edges.append((l1.ravel(), (-l0 if negate_first else l0).ravel(), added.ravel(),
+                      np.broadcast_to(np.ldexp(1.0, -(k + 1)), l0.shape).ravel()))
+
+    if not edges:
+        return [np.zeros(0, dtype=np.int64)] * 3 + [np.zeros(0)]
+    u, v, added, weights = [np.concatenate(columns) for columns in zip(*edges)]
+    return u + cnf.num_vars, v + cnf.num_vars, added, weights
+
+
+def exo_and_band_degrees_weights(cnf, big=None, graphs=GATE_GRAPHS):
+    """
+    Full-AND, Blocked-AND and EXO graphs. The AND edges come from the exactly one scan (see gate_edges), the clauses
+    with three literals that are not exactly one constraints give Blocked-AND edges (l1, -l0) for every ordered pair of
+    their literals, and the exactly one constraints give EXO edges (l1, l0) of weight 1. The lists of each graph are
+    built when the previous ones have been consumed.
+    :param cnf: CNF core of the cnf
+    :param big: ImplicationGraph of the cnf, built if not given
+    :param graphs: the graphs to build, among GATE_GRAPHS
+    :return: generator of the degree and weight lists of the requested graphs, in the order of GATE_GRAPHS
+    """
+    if big is None:
+        big = ImplicationGraph(cnf)
+    rank, num_nodes = literal_node_ranks(cnf)
+
+    and_edges, exo_clauses = gate_edges(cnf, big)
+    if "and" in graphs:
+        yield undirected_lists(*and_edges, rank, num_nodes)
+    del and_edges
+
+    if "band" in graphs:
+        ternary = np.flatnonzero(cnf.clause_lengths() == 3)
+        yield undirected_lists(*all_pair_edges(cnf, np.setdiff1d(ternary, exo_clauses), True), rank, num_nodes)
+
+    if "exo" in graphs:
+        u, v, added, _ = all_pair_edges(cnf, exo_clauses, False)
+        yield undirected_lists(u, v, added, np.ones(len(u), dtype=np.int64), rank, num_nodes)
+
+
+def strongly_connected_components(big):
+    """
+    :param big: ImplicationGraph
+    :return: number of components, and the component of each literal code
+    """
+    num_codes = 2 * big.num_vars + 1
+    graph = csr_matrix((np.ones(len(big.successors), dtype=np.int8), big.successors, big.offsets),
+                       shape=(num_codes, num_codes))
+    num_components, labels = connected_components(graph, directed=True, connection="strong")
+    return num_components, labels.astype(np.int64)
+
+
+def dag_stamps(offsets, targets, roots):
+    """
+    Iterative depth first search of a DAG from the given roots, in order
+    :param offsets: CSR offsets of the out edges of each node
+    :param targets: CSR targets
+    :param roots: the nodes to start from
+    :return: discovery and finish stamp of each node (-1 if not reached), and its parent in the search forest
+    """
+    num_nodes = len(offsets) - 1
+    offsets = offsets.tolist()
+    targets = targets.tolist()
+    discovered = [-1] * num_nodes
+    finished = [-1] * num_nodes
+    parent = [-1] * num_nodes
+
+    stamp = 0
+    for root in roots.tolist():
+        if discovered[root] >= 0:
+            continue
+        discovered[root] = stamp
+        stamp += 1
+        nodes = [root]
+        next_edge = [offsets[root]]
+        while nodes:
+            node = nodes[-1]
+            edge = next_edge[-1]
+            if edge < offsets[node + 1]:
+                next_edge[-1] = edge + 1
+                child = targets[edge]
+                if discovered[child] < 0:
+                    discovered[child] = stamp
+                    stamp += 1
+                    parent[child] = node
+                    nodes.append(child)
+                    next_edge.append(offsets[child])
+            else:
+                nodes.pop()
+                next_edge.pop()
+                finished[node] = stamp
+                stamp += 1
+
+    return np.array(discovered), np.array(finished), np.array(parent)
+
+
+def equivalence_features(cnf, big=None):
+    """
+    Equivalent literal and failed literal features of the BIG
+    :param cnf: CNF core of the cnf
+    :param big: ImplicationGraph of the cnf, built if not given
+    :return: dictionary of the number of classes of equivalent variables (a class and the class of its negated
+    literals counted once), the variables in them, the statistics of their sizes, the variables equivalent to their own
+    negation, the failed literals found, and the number of BIG edges and of edges left after the transitive reduction
+    found
+    """
+    if big is None:
+        big = ImplicationGraph(cnf)
+    num_components, labels = strongly_connected_components(big)
+
+    variables = np.flatnonzero(cnf.variable_occurrences())
+    positive = labels[variables + cnf.num_vars]
+    negative = labels[cnf.num_vars - variables]
+
+    # variables whose literals are in the same pair of dual components
+    class_of = np.minimum(positive, negative)
+    contradictory = positive == negative
+    class_sizes = np.bincount(class_of[~contradictory], minlength=num_components)
+    class_sizes = class_sizes[class_sizes >= 2]
+
+    # the DAG of the components, searched from its sources
+    sources = labels[big.sources]
+    targets = labels[big.successors]
+    between = sources != targets
+    # the children of a component are visited in decreasing component number, which is topological for the numbering
+    # of Tarjan's algorithm (sinks first), so that the search walks long paths before the edges that skip ahead on them
+    dag_edges = np.sort(sources[between] * num_components + (num_components - 1 - targets[between]))
+    dag_edges = dag_edges[np.concatenate(([True], dag_edges[1:] != dag_edges[:-1]))[:len(dag_edges)]]
+    dag_sources = dag_edges // num_components
+    dag_targets = num_components - 1 - dag_edges % num_components
+    dag_offsets = np.zeros(num_components + 1, dtype=np.int64)
+    np.cumsum(np.bincount(dag_sources, minlength=num_components), out=dag_offsets[1:])
+    in_degrees = np.bincount(dag_targets, minlength=num_components)
+    roots = np.flatnonzero((in_degrees == 0) & (np.diff(dag_offsets) > 0))
+    discovered, finished, parent = dag_stamps(dag_offsets, dag_targets, roots)
+
+    def is_ancestor(a, b):
+        return (discovered[a] >= 0) & (discovered[a] < discovered[b]) & (finished[b] < finished[a])
+
+    # x is failed when its component reaches the one of -x
+    failed = np.concatenate((contradictory | is_ancestor(positive, negative),
+                             contradictory | is_ancestor(negative, positive)))
+    # an edge to a descendant reached through another child is implied by the path through that child
+    transitive = is_ancestor(dag_sources, dag_targets) & (parent[dag_targets] != dag_sources)
+    # a component of k > 1 literals keeps a cycle of k edges
+    component_sizes = np.bincount(labels, minlength=num_components)
+    cycle_edges = int(component_sizes[component_sizes >= 2].sum())
+
+    sizes = class_sizes.tolist() if len(class_sizes) > 0 else [0]
+    size_mean, size_coeff, size_min, size_max = array_stats.get_stats(sizes)
+    return {"big_equiv_classes": len(class_sizes),
+            "big_equiv_vars": int(class_sizes.sum()),
+            "big_equiv_size_mean": size_mean,
+            "big_equiv_size_coeff": size_coeff,
+            "big_equiv_size_min": size_min,
+            "big_equiv_size_max": size_max,
+            "big_contradictory_vars": int(np.count_nonzero(contradictory)),
+            "big_failed_literals": int(np.count_nonzero(failed)),
+            "big_edges": len(big.edge_keys),
+            "big_reduced_edges": len(dag_edges) - int(np.count_nonzero(transitive)) + cycle_edges}
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+
+from feature_computation.cnf import CNF
+
+"""
+On disk cache of parsed instances. After parsing and the active feature setup, the clause database and the literal
+occurrence lists are written once per instance in a flat binary format. Later runs open the file with np.memmap, so no
+parsing is done, and worker processes opening the same instance share the page cache: the loaded instance works on the
+mapped arrays, and only its per clause and per variable state is private.
+
+File layout: MAGIC, 8 byte little endian length of the json header, the json header, then the data section holding
+each array at a 64 byte aligned offset recorded in the header.
+"""
+
+MAGIC = b"SATFPYC\x00"
+CACHE_VERSION = 2
+ALIGNMENT = 64
+
+# anni_2022 benchmarks are named {gbd hash}-{name}.cnf
+_GBD_HASH_NAME = re.compile(r"^([0-9a-f]{32})-")
+
+
+def instance_key(cnf_path):
+    """
+    Content key of a cnf file. The gbd hash at the start of anni_2022 file names is used when present, otherwise the
+    md5 of the file contents.
+    :param cnf_path:
+    :return: hex digest
+    """
+    match = _GBD_HASH_NAME.match(os.path.basename(cnf_path))
+    if match:
+        return match.group(1)
+
+    md5 = hashlib.md5()
+    with open(cnf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 22), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def cache_path(cache_dir, cnf_path, preprocess, compact=False, reorder=False):
+    """
+    Path of the cache file of an instance. Preprocessed and raw instances are cached separately, as are instances with
+    compacted or reordered variables.
+    :param cache_dir:
+    :param cnf_path:
+    :param preprocess: whether the instance is preprocessed with SatELite
+    :param compact: whether the variables of the instance are renumbered to a dense range
+    :param reorder: whether the variables and clauses of the instance are reordered for locality
+    :return: path of the cache file
+    """
+    suffix = "-pre" if preprocess else "-raw"
+    if compact:
+        suffix += "-compact"
+    if reorder:
+        suffix += "-reordered"
+    return os.path.join(cache_dir, instance_key(cnf_path) + suffix + ".satc")
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_cache(path, arrays, header):
+    """
+    Write the arrays and header values of an instance. The file is written under a temporary name and moved into
+    place, so concurrent workers never see a partial file.
+    :param path: cache file to write
+    :param arrays: dictionary of name to numpy array
+    :param header: dictionary of json serializable values (clause and variable counts)
+    :return:
+    """
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    # array offsets are relative to the start of the data section, which follows the json header
+    layout = {}
+    offset = 0
+    for name, a in arrays.items():
+        layout[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset = _align(offset + a.nbytes)
+
+    meta_bytes = json.dumps({"version": CACHE_VERSION, "header": header, "arrays": layout}).encode()
+    data_start = _align(len(MAGIC) + 8 + len(meta_bytes))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(len(meta_bytes).to_bytes(8, "little"))
+            f.write(meta_bytes)
+            for name, a in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(a.tobytes())
+            f.truncate(data_start + offset)
+        # readable by the other workers sharing the cache
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def read_cache(path):
+    """
+    Open a cache file, mapping the arrays read only into memory.
+    :param path:
+    :return: (dictionary of name to read only numpy memmap, header dictionary), or None if the file does not exist or
+    was written by another version
+    """
+    if not os.path.isfile(path):
+        return None
+
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        meta_len = int.from_bytes(f.read(8), "little")
+        meta = json.loads(f.read(meta_len))
+
+    if meta["version"] != CACHE_VERSION:
+        return None
+    data_start = _align(len(MAGIC) + 8 + meta_len)
+
+    arrays = {}
+    for name, info in meta["arrays"].items():
+        shape = tuple(info["shape"])
+        if np.prod(shape) == 0:
+            # np.memmap cannot map zero bytes
+            arrays[name] = np.zeros(shape, dtype=info["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=info["dtype"], mode="r", offset=data_start + info["offset"],
+                                     shape=shape)
+
+    return arrays, meta["header"]
+
+
+def load_cnf(arrays):
+    """
+    Build the CNF core of an instance from the arrays of its cache file, without copying them.
+    :param arrays: dictionary of name to array, as returned by read_cache
+    :return: CNF
+    """
+    # the occurrence offsets have an entry for each variable, for the unused variable 0, and for the end
+    num_vars = len(arrays["pos_occ_offsets"]) - 2
+    return CNF(arrays["literals"], arrays["clause_offsets"], num_vars, arrays["pos_occ"], arrays["pos_occ_offsets"],
+               arrays["neg_occ"], arrays["neg_occ_offsets"])
+
+
+def save_instance(path, sat_instance):
+    """
+    Cache the clause database, occurrence lists and binary clause counts of a sat instance, after the active features
+    have been set up.
+    :param path:
+    :param sat_instance:
+    :return:
+    """
+    cnf = sat_instance.cnf
+    arrays = {"literals": cnf.literals, "clause_offsets": cnf.clause_offsets,
+              "pos_occ": cnf.pos_occ, "pos_occ_offsets": cnf.pos_occ_offsets,
+              "neg_occ": cnf.neg_occ, "neg_occ_offsets": cnf.neg_occ_offsets,
+              "num_bin_clauses_with_var": np.asarray(sat_instance.num_bin_clauses_with_var, dtype=np.int32)}
+    header = {"c": sat_instance.c, "v": sat_instance.v}
+    if sat_instance.var_map is not None:
+        arrays["var_map"] = sat_instance.var_map
+    if sat_instance.clause_map is not None:
+        arrays["clause_map"] = sat_instance.clause_map
+
+    write_cache(path, arrays, header)
@@ -0,0 +1,104 @@
+import math
+
+"""
+Running estimate of the search tree size from the depths to contradiction of the lobjois probes, with its standard
+error, so that probing can stop once the estimate has converged.
+"""
+
+# two sided 95% normal quantile
+Z_95 = 1.959963984540054
+
+
+class LobjoisEstimator:
+    """
+    The log number of nodes is log2 of the mean of 2^depth over the probes. The weights 2^(depth - max_depth) are summed
+    instead, and rescaled when a deeper probe raises max_depth, so that they never overflow.
+
+    The standard error of the log number of nodes follows from the one of the mean weight by the delta method:
+    se(log2(mean)) = se(mean) / (mean * ln 2).
+    """
+
+    def __init__(self):
+        self.num_samples = 0
+        self.sum_depths = 0
+        self.max_depth = 0
+        self.sum_weights = 0.0
+        self.sum_squared_weights = 0.0
+
+    @classmethod
+    def from_depths(cls, depths):
+        """
+        :param depths: depths to contradiction of the probes
+        :return: estimator of the depths, summed in order with the final max_depth
+        """
+        estimator = cls()
+        if not depths:
+            return estimator
+
+        estimator.num_samples = len(depths)
+        estimator.sum_depths = sum(depths)
+        estimator.max_depth = max(depths)
+        for depth in depths:
+            weight = math.pow(2, depth - estimator.max_depth)
+            estimator.sum_weights += weight
+            estimator.sum_squared_weights += weight * weight
+        return estimator
+
+    def add(self, depth):
+        """
+        :param depth: depth to contradiction of a probe
+        :return:
+        """
+        if self.num_samples == 0 or depth > self.max_depth:
+            scale = math.pow(2, self.max_depth - depth) if self.num_samples > 0 else 0.0
+            self.sum_weights *= scale
+            self.sum_squared_weights *= scale * scale
+            self.max_depth = depth
+
+        weight = math.pow(2, depth - self.max_depth)
+        self.sum_weights += weight
+        self.sum_squared_weights += weight * weight
+        self.sum_depths += depth
+        self.num_samples += 1
+
+    def mean_depth(self):
+        return self.sum_depths / self.num_samples
+
+    def log_num_nodes(self):
+        """
+        :return: log2 of the estimated number of nodes of the search tree
+        """
+        return self.max_depth + math.log(self.sum_weights / self.num_samples) / math.log(2.0)
+
+    def log_num_nodes_std_error(self):
+        """
+        :return: standard error of log_num_nodes, infinite with fewer than two samples
+        """
+        if self.num_samples < 2:
+            return math.inf
+
+        mean = self.sum_weights / self.num_samples
+        variance = max(0.0, (self.sum_squared_weights - self.num_samples * mean * mean) / (self.num_samples - 1))
+        return math.sqrt(variance / self.num_samples) / (mean * math.log(2.0))
+
+    def relative_ci(self, z=Z_95):
+        """
+        :param z: normal quantile of the confidence level
+        :return: half width of the confidence interval of log_num_nodes, relative to log_num_nodes
+        """
+        std_error = self.log_num_nodes_std_error()
+        if std_error == 0:
+            return 0.0
+
+        log_num_nodes = self.log_num_nodes()
+        if log_num_nodes <= 0:
+            return math.inf
+        return z * std_error / log_num_nodes
+
+    def converged(self, relative_ci, min_samples):
+        """
+        :param relative_ci: target relative half width of the confidence interval
+        :param min_samples: number of samples needed before the interval is trusted
+        :return: True if the estimate is precise enough to stop probing
+        """
+        return self.num_samples >= min_samples and self.relative_ci() <= relative_ci
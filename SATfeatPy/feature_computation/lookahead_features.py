@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+
+from feature_computation import array_stats
+from feature_computation.bit_parallel_probing import BitParallelProbes, LANES
+from feature_computation.enums import VAR_UNASSIGNED
+
+"""
+Lookahead features: both literals of a sample of the unassigned variables are propagated from the current state, and
+the failed literals, the number of literals each one implies and the lookahead score of each variable are summarised.
+
+All literals of a batch are propagated together by BitParallelProbes, one per lane, so there is no assignment and
+backtrack per literal.
+"""
+
+# weight of the product in the lookahead score of a variable, as in march
+SCORE_PRODUCT_WEIGHT = 1024
+
+
+def lookahead_score(implied_pos, implied_neg):
+    """
+    Lookahead score of a variable, which favours variables whose two literals both imply many literals
+    :param implied_pos: fraction of the active variables implied by the positive literal
+    :param implied_neg: fraction of the active variables implied by the negative literal
+    :return: score
+    """
+    return SCORE_PRODUCT_WEIGHT * implied_pos * implied_neg + implied_pos + implied_neg
+
+
+def compute_lookahead_features(sat_instance, max_vars=256):
+    """
+    :param sat_instance:
+    :param max_vars: number of variables probed, sampled uniformly from the unassigned variables if there are more
+    :return: dictionary of the lookahead features
+    """
+    features_dict = {}
+
+    var_states = np.frombuffer(sat_instance.var_states, dtype=np.int8)
+    unassigned = (np.flatnonzero(var_states[1:] == VAR_UNASSIGNED) + 1).tolist()
+    if len(unassigned) > max_vars:
+        unassigned = sorted(random.sample(unassigned, max_vars))
+
+    probes = BitParallelProbes(sat_instance)
+    failed = {}
+    implied = {}
+    for start in range(0, len(unassigned), LANES // 2):
+        literals = []
+        for var in unassigned[start:start + LANES // 2]:
+            literals += [var, -var]
+
+        batch_failed, batch_implied = probes.propagate_literals(literals)
+        for literal, literal_failed, literal_implied in zip(literals, batch_failed, batch_implied):
+            failed[literal] = literal_failed
+            implied[literal] = literal_implied / sat_instance.num_active_vars
+
+    num_failed_literals = sum(failed.values())
+    num_failed_vars = sum(1 for var in unassigned if failed[var] and failed[-var])
+    implied_fractions = [implied[literal] for literal in implied if not failed[literal]]
+    scores = [lookahead_score(implied[var], implied[-var]) for var in unassigned if not failed[var] and not failed[-var]]
+
+    features_dict["lookahead_num_vars"] = len(unassigned)
+    features_dict["lookahead_failed_literals_ratio"] = num_failed_literals / (2 * len(unassigned)) if unassigned else 0
+    features_dict["lookahead_failed_vars_ratio"] = num_failed_vars / len(unassigned) if unassigned else 0
+    write_stats(implied_fractions, "lookahead_implied", features_dict)
+    write_stats(scores, "lookahead_score", features_dict)
+
+    return features_dict
+
+
+def write_stats(l, name, features_dict):
+    """
+    The four basic stats of l, all 0 if l is empty (e.g. when every probed literal failed)
+    """
+    l_mean, l_coeff, l_min, l_max = array_stats.get_stats(l) if l else (0, 0, 0, 0)
+
+    features_dict[name + "_mean"] = l_mean
+    features_dict[name + "_coeff"] = l_coeff
+    features_dict[name + "_min"] = l_min
+    features_dict[name + "_max"] = l_max
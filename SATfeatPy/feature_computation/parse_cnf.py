@@ -1,29 +1,363 @@
+import multiprocessing
+import os
+import re
+from multiprocessing import resource_tracker, shared_memory
 
+import numpy as np
 
-def parse_cnf(cnf_path):
+from feature_computation.cnf_stream import open_cnf, detect_codec
+
+# bytes read from the cnf file per tokenizer pass
+BLOCK_SIZE = 1 << 22
+# smallest byte range handed to a worker by the parallel parser
+MIN_CHUNK_SIZE = 1 << 24
+
+_HEADER_LINE = re.compile(rb"^p\s+cnf\s+(\d+)\s+(\d+)", re.MULTILINE)
+_SKIPPED_LINE = re.compile(rb"^[cp].*$", re.MULTILINE)
+
+
+def parse_cnf(cnf_path, num_workers=1):
     """
     Parse number of variables, number of clauses and the clauses from a standard .cnf file
     :param cnf_path:
+    :param num_workers: number of processes used to parse the file, see parse_cnf_parallel
     :return: clauses, number of clauses, and number of variables
     """
 
-    with open(cnf_path) as f:
+    literals, clause_offsets, c, v = parse_cnf_arrays(cnf_path, num_workers)
 
-        clauses_list = []
-        c = 0
-        v = 0
+    # split the flat literal buffer back into one list per clause
+    flat = literals.tolist()
+    bounds = clause_offsets.tolist()
+    clauses_list = [flat[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
 
-        for line in f:
-            if line[0] == 'c':
-                continue
-            if line[0] == 'p':
-                sizes = line.split(" ")
-                v = int(sizes[2])
-                c = int(sizes[3])
+    return clauses_list, c, v
 
-            else:
-                # all following lines should represent a clause, so literals separated by spaces, with a 0 at the end,
-                # denoting the end of the line.
-                clauses_list.append([int(x) for x in line.split(" ")[:-1]])
 
-    return clauses_list, c, v
+def parse_cnf_arrays(cnf_path, num_workers=1):
+    """
+    Parse a .cnf file into CSR form (see parse_cnf_csr), in parallel if more than one worker is given.
+    :param cnf_path:
+    :param num_workers: number of processes used to parse the file, see parse_cnf_parallel
+    :return: literals, clause offsets, number of clauses and number of variables
+    """
+
+    if num_workers > 1:
+        return parse_cnf_parallel(cnf_path, num_workers)
+    return parse_cnf_csr(cnf_path)
+
+
+def parse_cnf_csr(cnf_path, block_size=BLOCK_SIZE):
+    """
+    Parse a standard .cnf file into compressed sparse row (CSR) form: one flat int32 buffer holding the literals of all
+    clauses, and an int64 offset array where clause i is literals[clause_offsets[i]:clause_offsets[i + 1]].
+
+    The file is read in blocks of block_size bytes, and each block is tokenized with vectorized numpy operations.
+    Compressed files (gzip, bz2, xz, zstd) are decompressed on the fly, block by block.
+    Clauses are delimited by the terminating 0 only, so several clauses on one line, clauses spanning lines, tabs and
+    a trailing % footer are all handled.
+
+    :param cnf_path:
+    :param block_size: number of bytes read per tokenizer pass
+    :return: literals, clause offsets, number of clauses and number of variables (as given in the p cnf header)
+    """
+
+    with open_cnf(cnf_path) as f:
+        return parse_cnf_stream(f, block_size)
+
+
+def parse_cnf_stream(stream, block_size=BLOCK_SIZE):
+    """
+    Parse an open binary stream of a .cnf file into CSR form, see parse_cnf_csr.
+    :param stream: binary file like object, only read() is used
+    :param block_size: number of bytes read per tokenizer pass
+    :return: literals, clause offsets, number of clauses and number of variables
+    """
+
+    header, literals, ends, _ = _scan_blocks(stream, block_size)
+
+    return _finish_csr(header, literals, ends)
+
+
+def parse_cnf_parallel(cnf_path, num_workers=None, block_size=BLOCK_SIZE, min_chunk_size=MIN_CHUNK_SIZE):
+    """
+    Parse a .cnf file into CSR form (see parse_cnf_csr) with a pool of worker processes. The file is split at line
+    boundaries into one byte range per worker, each range is tokenized independently, and the per range arrays are
+    stitched together, with the clause offsets shifted by the number of literals in the preceding ranges. A clause
+    that spans two ranges needs no special handling, as only the terminating 0s determine the offsets.
+
+    Workers hand their arrays back through shared memory where it is available, and through the result pipe otherwise.
+    Compressed files cannot be split, and are parsed serially.
+
+    :param cnf_path:
+    :param num_workers: number of worker processes, defaults to the number of cores
+    :param block_size: number of bytes read per tokenizer pass
+    :param min_chunk_size: smallest byte range given to a worker, smaller files use fewer workers
+    :return: literals, clause offsets, number of clauses and number of variables
+    """
+
+    if num_workers is None:
+        num_workers = os.cpu_count()
+
+    file_size = os.path.getsize(cnf_path)
+    num_chunks = min(num_workers, file_size // min_chunk_size)
+
+    if num_chunks <= 1 or detect_codec(cnf_path) is not None:
+        return parse_cnf_csr(cnf_path, block_size)
+
+    bounds = _line_aligned_bounds(cnf_path, file_size, num_chunks)
+    tasks = [(cnf_path, bounds[i], bounds[i + 1], block_size) for i in range(len(bounds) - 1)]
+
+    with multiprocessing.Pool(len(tasks)) as pool:
+        results = pool.starmap(_parse_range, tasks)
+
+    header = []
+    literal_chunks = []
+    end_chunks = []
+    num_literals = 0
+
+    for chunk_header, shm_name, lits, ends, footer in results:
+        if shm_name is not None:
+            lits, ends = _take_shared(shm_name, lits, ends)
+
+        header += chunk_header
+        literal_chunks.append(lits)
+        end_chunks.append(ends + num_literals)
+        num_literals += len(lits)
+
+        if footer:
+            # the remaining ranges are after the % footer
+            break
+
+    for chunk_header, shm_name, _, _, _ in results[len(literal_chunks):]:
+        if shm_name is not None:
+            _release_shared(shm_name)
+
+    return _finish_csr(header, np.concatenate(literal_chunks), np.concatenate(end_chunks))
+
+
+def validate_header(literals, clause_offsets, c, v):
+    """
+    Check the parsed clauses against the p cnf header. Downstream arrays are sized from the header, so clauses or
+    variables beyond it are an error.
+    :param literals:
+    :param clause_offsets:
+    :param c: number of clauses in the header
+    :param v: number of variables in the header
+    :return:
+    """
+
+    num_clauses = len(clause_offsets) - 1
+    if num_clauses > c:
+        raise ValueError("cnf contains " + str(num_clauses) + " clauses, header declares " + str(c))
+
+    if len(literals):
+        max_var = max(int(literals.max()), -int(literals.min()))
+        if max_var > v:
+            raise ValueError("cnf contains variable " + str(max_var) + ", header declares " + str(v))
+
+
+def _scan_blocks(stream, block_size):
+    """
+    Tokenize a stream block by block.
+    :param stream: binary file like object
+    :param block_size: number of bytes read per tokenizer pass
+    :return: header entries, int32 literals, int64 clause end offsets (relative to the first literal of the stream) and
+    whether the stream ended at a % footer
+    """
+
+    header = []
+    literal_blocks = []
+    end_blocks = []
+    num_literals = 0
+    footer = False
+
+    carry = b""
+    while True:
+        block = stream.read(block_size)
+        at_eof = not block
+
+        data = carry + block
+        if not at_eof:
+            # only tokenize complete lines, the rest is carried over to the next block
+            cut = data.rfind(b"\n") + 1
+            carry = data[cut:]
+            data = data[:cut]
+
+        data, footer = _strip_footer(data)
+
+        tokens = _tokenize(data, header)
+        if len(tokens):
+            # 0 terminates a clause, every other token is a literal
+            is_end = tokens == 0
+            lits = tokens[~is_end].astype(np.int32)
+            end_positions = np.flatnonzero(is_end)
+            # number of literals before each terminating 0 is the end offset of that clause
+            ends = end_positions - np.arange(len(end_positions)) + num_literals
+
+            literal_blocks.append(lits)
+            end_blocks.append(ends)
+            num_literals += len(lits)
+
+        if at_eof or footer:
+            break
+
+    literals = np.concatenate(literal_blocks) if literal_blocks else np.zeros(0, dtype=np.int32)
+    ends = np.concatenate(end_blocks) if end_blocks else np.zeros(0, dtype=np.int64)
+
+    return header, literals, ends, footer
+
+
+def _finish_csr(header, literals, ends):
+    """
+    Build the clause offsets from the clause end offsets, and check them against the header.
+    :param header: header entries found while tokenizing
+    :param literals:
+    :param ends:
+    :return: literals, clause offsets, number of clauses and number of variables
+    """
+
+    if not header:
+        return np.zeros(0, dtype=np.int32), np.zeros(1, dtype=np.int64), 0, 0
+    v, c = header[0]
+
+    num_literals = len(literals)
+    if num_literals and (len(ends) == 0 or ends[-1] != num_literals):
+        # last clause is missing its terminating 0
+        ends = np.append(ends, num_literals)
+
+    clause_offsets = np.zeros(len(ends) + 1, dtype=np.int64)
+    clause_offsets[1:] = ends
+
+    validate_header(literals, clause_offsets, c, v)
+
+    return literals, clause_offsets, c, v
+
+
+def _line_aligned_bounds(cnf_path, file_size, num_chunks):
+    """
+    Split the file into num_chunks byte ranges, moving each split point forward to the start of the next line.
+    :param cnf_path:
+    :param file_size:
+    :param num_chunks:
+    :return: list of num_chunks + 1 increasing byte positions (fewer for files with very long lines)
+    """
+
+    bounds = [0]
+    with open(cnf_path, "rb") as f:
+        for i in range(1, num_chunks):
+            pos = max(file_size * i // num_chunks, bounds[-1])
+            f.seek(pos)
+            f.readline()
+            pos = f.tell()
+            if bounds[-1] < pos < file_size:
+                bounds.append(pos)
+    bounds.append(file_size)
+
+    return bounds
+
+
+class _RangeReader:
+    """
+    File reader that stops at the end of a byte range.
+    """
+
+    def __init__(self, f, end):
+        self.f = f
+        self.end = end
+
+    def read(self, size):
+        size = min(size, self.end - self.f.tell())
+        if size <= 0:
+            return b""
+        return self.f.read(size)
+
+
+def _parse_range(cnf_path, start, end, block_size):
+    """
+    Worker process: tokenize the byte range [start, end) of the file.
+    :return: header entries, name of the shared memory holding the arrays (None if unavailable), then either the array
+    lengths (shared memory) or the arrays themselves, and whether the range ended at a % footer
+    """
+
+    with open(cnf_path, "rb") as f:
+        f.seek(start)
+        header, lits, ends, footer = _scan_blocks(_RangeReader(f, end), block_size)
+
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=max(lits.nbytes + ends.nbytes, 1))
+    except OSError:
+        return header, None, lits, ends, footer
+
+    np.ndarray(len(lits), dtype=np.int32, buffer=shm.buf)[:] = lits
+    np.ndarray(len(ends), dtype=np.int64, buffer=shm.buf, offset=lits.nbytes)[:] = ends
+    # the parent process takes ownership and unlinks the block
+    resource_tracker.unregister(shm._name, "shared_memory")
+    shm.close()
+
+    return header, shm.name, len(lits), len(ends), footer
+
+
+def _take_shared(shm_name, num_lits, num_ends):
+    """
+    Copy a worker's arrays out of shared memory, and release it.
+    :return: literals, ends
+    """
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        lits = np.ndarray(num_lits, dtype=np.int32, buffer=shm.buf).copy()
+        ends = np.ndarray(num_ends, dtype=np.int64, buffer=shm.buf, offset=lits.nbytes).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return lits, ends
+
+
+def _release_shared(shm_name):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    shm.close()
+    shm.unlink()
+
+
+def _strip_footer(data):
+    """
+    Cut the data at a line starting with %, as used by the SATLIB benchmarks to end the file.
+    :param data: bytes
+    :return: the data before the footer, and whether a footer was found
+    """
+
+    if data.startswith(b"%"):
+        return b"", True
+
+    pos = data.find(b"\n%")
+    if pos == -1:
+        return data, False
+
+    return data[:pos + 1], True
+
+
+def _tokenize(data, header):
+    """
+    Turn a block of complete lines into an int64 array of all the integers it contains. Comment lines and the p cnf
+    line are skipped, the counts of the p cnf line are appended to header.
+    :param data: bytes ending on a line boundary
+    :param header: list that receives (v, c) if the block contains the p cnf line
+    :return: numpy array of the integers in the block
+    """
+
+    if data[:1] in (b"c", b"p") or b"\nc" in data or b"\np" in data:
+        for match in _HEADER_LINE.finditer(data):
+            header.append((int(match.group(1)), int(match.group(2))))
+        data = _SKIPPED_LINE.sub(b"", data)
+
+    if not data.strip():
+        # the reader returns a single 0 for input holding only whitespace
+        return np.zeros(0, dtype=np.int64)
+
+    # numpy's text mode reader splits on any whitespace, so tabs and blank lines need no special handling
+    try:
+        return np.fromstring(data, dtype=np.int64, sep=" ")
+    except ValueError:
+        raise ValueError("cnf contains a token that is not an integer") from None
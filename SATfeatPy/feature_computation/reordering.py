@@ -0,0 +1,85 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+"""
+Locality improving reordering of the clause database. The variables and clauses are renumbered by a reverse
+Cuthill-McKee (RCM) order of the variable-clause incidence graph, so that clauses sharing variables get nearby indices,
+and the variables of a clause are numbered close together. Occurrence list walks, clause visits during propagation and
+the graph builders then touch nearby memory instead of jumping through the whole database.
+"""
+
+
+def rcm_order(literals, clause_offsets, num_vars):
+    """
+    Reverse Cuthill-McKee order of the bipartite variable-clause incidence graph. Node x (1 <= x <= num_vars) is
+    variable x and node num_vars + 1 + i is clause i; node 0 is unused.
+    :param literals:
+    :param clause_offsets:
+    :param num_vars:
+    :return: var_order, the old variable of each new variable (var_order[0] is 0), and clause_order, the old clause of
+    each new clause
+    """
+    num_clauses = len(clause_offsets) - 1
+    num_nodes = num_vars + 1 + num_clauses
+
+    variables = np.abs(literals).astype(np.int64)
+    clause_nodes = num_vars + 1 + np.repeat(np.arange(num_clauses, dtype=np.int64), np.diff(clause_offsets))
+    rows = np.concatenate((variables, clause_nodes))
+    cols = np.concatenate((clause_nodes, variables))
+    graph = csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)), shape=(num_nodes, num_nodes))
+
+    order = reverse_cuthill_mckee(graph, symmetric_mode=True).astype(np.int64)
+    is_var = (order >= 1) & (order <= num_vars)
+    var_order = np.concatenate(([0], order[is_var]))
+    clause_order = order[order > num_vars] - (num_vars + 1)
+    return var_order, clause_order
+
+
+def reorder_clauses(literals, clause_offsets, var_order, clause_order):
+    """
+    Renumber the variables and clauses, keeping the literals of each clause sorted by variable.
+    :param literals:
+    :param clause_offsets:
+    :param var_order: old variable of each new variable
+    :param clause_order: old clause of each new clause
+    :return: literals and clause offsets of the reordered clauses
+    """
+    lengths = np.diff(clause_offsets)[clause_order]
+    new_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+
+    # positions of the literals of the old clauses, in the new clause order
+    clause_ids = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+    positions = clause_offsets[clause_order][clause_ids] + (np.arange(len(clause_ids)) - new_offsets[clause_ids])
+    old_literals = literals[positions]
+
+    new_ids = np.empty(len(var_order), dtype=np.int64)
+    new_ids[var_order] = np.arange(len(var_order))
+    new_variables = new_ids[np.abs(old_literals)]
+
+    order = np.lexsort((new_variables, clause_ids))
+    new_literals = (np.sign(old_literals) * new_variables)[order].astype(literals.dtype)
+    return new_literals, new_offsets
+
+
+def locality(literals, clause_offsets):
+    """
+    Locality measures of a clause database, smaller is better: the mean span of the variables of a clause, and the
+    mean distance between consecutive clauses of the occurrence list of a variable.
+    :param literals:
+    :param clause_offsets:
+    :return: dictionary of the two measures
+    """
+    variables = np.abs(literals).astype(np.int64)
+    starts = clause_offsets[:-1]
+    non_empty = np.diff(clause_offsets) > 0
+    spans = np.maximum.reduceat(variables, starts[non_empty]) - np.minimum.reduceat(variables, starts[non_empty])
+
+    clause_ids = np.repeat(np.arange(len(starts), dtype=np.int64), np.diff(clause_offsets))
+    order = np.lexsort((clause_ids, variables))
+    same_var = variables[order][1:] == variables[order][:-1]
+    gaps = np.diff(clause_ids[order])[same_var]
+
+    return {"clause_var_span": float(spans.mean()) if len(spans) else 0.0,
+            "occurrence_gap": float(gaps.mean()) if len(gaps) else 0.0}
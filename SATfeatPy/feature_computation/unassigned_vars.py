@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+
+from feature_computation.enums import VAR_UNASSIGNED
+
+"""
+Sparse set of the unassigned variables, used to pick the random decisions of the search space probes.
+"""
+
+
+class UnassignedVars:
+    """
+    The unassigned variables are the first size entries of a dense array, and position gives the index of each variable
+    in it. Removing a variable swaps it with the last unassigned one and shrinks size, adding it swaps it with the
+    first assigned one and grows size, so both are O(1). Sampling picks a uniform index below size.
+    """
+
+    def __init__(self, var_states):
+        """
+        :param var_states: states of the variables, indexed by variable
+        """
+        var_states = np.asarray(var_states)
+        variables = np.arange(1, len(var_states))
+        unassigned = var_states[1:] == VAR_UNASSIGNED
+
+        dense = np.concatenate((variables[unassigned], variables[~unassigned]))
+        self.dense = dense.tolist()
+        self.size = int(np.count_nonzero(unassigned))
+
+        position = np.zeros(len(var_states), dtype=np.int64)
+        position[dense] = np.arange(len(dense))
+        self.position = position.tolist()
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, var):
+        return self.position[var] < self.size
+
+    def remove(self, var):
+        """
+        :param var: an unassigned variable, that has been assigned or become irrelevant
+        :return:
+        """
+        i = self.position[var]
+        self.size -= 1
+        last = self.dense[self.size]
+        self.dense[i] = last
+        self.dense[self.size] = var
+        self.position[last] = i
+        self.position[var] = self.size
+
+    def add(self, var):
+        """
+        :param var: a variable that is unassigned again
+        :return:
+        """
+        i = self.position[var]
+        first = self.dense[self.size]
+        self.dense[i] = first
+        self.dense[self.size] = var
+        self.position[first] = i
+        self.position[var] = self.size
+        self.size += 1
+
+    def sample(self):
+        """
+        :return: a uniformly random unassigned variable, or None if all variables are assigned
+        """
+        if self.size == 0:
+            return None
+        return self.dense[random.randrange(self.size)]
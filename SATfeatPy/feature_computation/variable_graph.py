@@ -0,0 +1,123 @@
+import numpy as np
+
+"""
+Variable graph (VG) on the CSR clause database, without networkx. The VG has a node for each variable and an edge
+between two variables that occur together in a clause.
+
+The edges are the literal pairs (i, j), i < j, of every clause, enumerated at once per clause length with numpy and
+deduplicated with a sort. The node order, the edge order, and the weight of each edge (2^-(j-i) of the last clause that
+adds it) are the ones of inserting the pairs one by one, clause by clause, into a networkx Graph.
+
+A clause of length k has k(k-1)/2 pairs, so long clauses (e.g. cardinality encodings) make the number of pairs blow
+up quadratically. When an instance has more than max_pairs pairs, only the pairs with j - i <= band are kept, for the
+largest band that fits, which samples the long clauses only: short clauses keep all of their pairs, and the pairs
+left out of a long clause have the smallest weights.
+"""
+
+# budget of literal pairs held in memory at once, about 40 bytes each
+MAX_VG_PAIRS = 1 << 25
+
+
+def pair_band(lengths, max_pairs=MAX_VG_PAIRS):
+    """
+    :param lengths: clause lengths
+    :param max_pairs: budget of literal pairs
+    :return: the largest offset j - i such that the pairs within it fit in the budget, or None if all pairs fit
+    """
+    lengths = lengths.astype(np.int64)
+    if int((lengths * (lengths - 1) // 2).sum()) <= max_pairs:
+        return None
+
+    def num_pairs(band):
+        # pairs with offset d <= band of a clause of length k: sum over d of (k - d), for d < k
+        d = np.minimum(lengths - 1, band)
+        return int((d * lengths - d * (d + 1) // 2).sum())
+
+    low, high = 1, int(lengths.max()) - 1
+    while low < high:
+        mid = (low + high + 1) // 2
+        if num_pairs(mid) <= max_pairs:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def literal_pairs(cnf, band=None):
+    """
+    The literal pairs (i, j), i < j, of every clause
+    :param cnf: CNF core of the cnf
+    :param band: if given, only the pairs with j - i <= band
+    :return: literal index of the first and of the second literal of each pair, in no particular order
+    """
+    lengths = cnf.clause_lengths()
+
+    # the clauses grouped by length, once
+    by_length = np.argsort(lengths, kind="stable")
+    group_lengths, group_starts = np.unique(lengths[by_length], return_index=True)
+    group_ends = np.append(group_starts[1:], len(by_length))
+
+    firsts = []
+    seconds = []
+    for k, start, end in zip(group_lengths.tolist(), group_starts.tolist(), group_ends.tolist()):
+        if k < 2:
+            continue
+        if band is None:
+            i, j = np.triu_indices(k, 1)
+        else:
+            # only the pairs within the band, without the k(k-1)/2 of the whole clause
+            offsets = np.arange(1, min(band, k - 1) + 1)
+            i = np.concatenate([np.arange(k - d) for d in offsets.tolist()])
+            j = i + np.repeat(offsets, k - offsets)
+        clause_starts = cnf.clause_offsets[by_length[start:end]][:, None]
+        firsts.append((clause_starts + i).ravel())
+        seconds.append((clause_starts + j).ravel())
+
+    if not firsts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def vg_degrees_weights(cnf, max_pairs=MAX_VG_PAIRS):
+    """
+    :param cnf: CNF core of the cnf
+    :param max_pairs: budget of literal pairs, see pair_band
+    :return: the degree of each node, as an array in node order, and the weight of each edge, as an array in the order of
+    the edges of a networkx Graph: by the first of their two nodes, then in the order they were added
+    """
+    variables = cnf.literal_variables().astype(np.int64)
+    first, second = literal_pairs(cnf, pair_band(cnf.clause_lengths(), max_pairs))
+
+    # insertion order of the pairs: by clause and i (the literal index of the first literal), then j
+    max_length = int(cnf.clause_lengths().max()) if cnf.num_clauses > 0 else 1
+    order_key = first * max_length + (second - first)
+
+    u = variables[first]
+    v = variables[second]
+    low = np.minimum(u, v)
+    high = np.maximum(u, v)
+    edge = low * (cnf.num_vars + 1) + high
+
+    # each edge is added by its first pair, and keeps the weight of its last one
+    by_edge = np.lexsort((order_key, edge))
+    edge = edge[by_edge]
+    changes = edge[1:] != edge[:-1]
+    starts = np.flatnonzero(np.concatenate(([True], changes))[:len(edge)])
+    ends = np.flatnonzero(np.concatenate((changes, [True]))[:len(edge)])
+    added = order_key[by_edge][starts]
+    weights = np.ldexp(1.0, -(second - first)[by_edge][ends])
+    low = low[by_edge][starts]
+    high = high[by_edge][starts]
+
+    # nodes in order of their first literal in a clause with at least two literals
+    in_pair = np.repeat(cnf.clause_lengths() >= 2, cnf.clause_lengths())
+    node_vars, first_seen = np.unique(variables[in_pair], return_index=True)
+    rank = np.zeros(cnf.num_vars + 1, dtype=np.int64)
+    rank[node_vars[np.argsort(first_seen)]] = np.arange(len(node_vars))
+
+    # a self loop adds one to the degree of its node
+    loop = low == high
+    degrees = np.bincount(np.concatenate((rank[low], rank[high[~loop]])), minlength=len(node_vars))
+
+    edge_order = np.lexsort((added, np.minimum(rank[low], rank[high])))
+    return degrees, weights[edge_order]
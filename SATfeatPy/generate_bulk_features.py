@@ -4,6 +4,7 @@ from multiprocessing import Process, Queue
 
 import os
 from sat_instance.sat_instance import SATInstance
+from feature_computation.cnf_stream import CNF_SUFFIXES
 import glob
 import csv
 
@@ -12,13 +13,16 @@ Q = Queue()
 def handle_timeout(signum, frame):
     raise TimeoutError
 
-def feature_gen(file_name):
+def feature_gen(file_name, cache_dir=None, lobjois_relative_ci=None):
     signal.signal(signal.SIGALRM, handle_timeout)
     signal.alarm(60)  # 20 seconds
     try:
-        sat_inst = SATInstance(file_name, preprocess=True)
+        sat_inst = SATInstance(file_name, preprocess=True, cache_dir=cache_dir)
         if sat_inst.solved:
             return
+        # stop lobjois probing once the estimate is within the given relative confidence interval (e.g. 0.01),
+        # instead of always probing for the full time limit
+        sat_inst.dpll_prober.lobjois_relative_ci = lobjois_relative_ci
 
         t1 = time.time()
         sat_inst.gen_basic_features()
@@ -45,10 +49,14 @@ def feature_gen(file_name):
     finally:
         signal.alarm(0)
 
-def bulk_gen_features(path_to_cnfs="/projects/satdb/dataset_final/", results_csv="features.csv", file_type="*"):
+def bulk_gen_features(path_to_cnfs="/projects/satdb/dataset_final/", results_csv="features.csv", file_type="*",
+                      cache_dir=None, lobjois_relative_ci=None):
     # for each file, we need to create a sat_instance for it
     # file_list = glob.glob(path_to_cnfs + "sat_4*.cnf")
-    file_list = glob.glob(path_to_cnfs + file_type + ".cnf")
+    # compressed benchmarks are read directly, without unpacking them first
+    file_list = []
+    for suffix in CNF_SUFFIXES:
+        file_list += glob.glob(path_to_cnfs + file_type + suffix)
     dict_keys = ['c', 'v', 'clauses_vars_ratio', 'vars_clauses_ratio', 'vcg_var_mean', 'vcg_var_coeff', 'vcg_var_min',
      'vcg_var_max', 'vcg_var_entropy', 'vcg_clause_mean', 'vcg_clause_coeff', 'vcg_clause_min', 'vcg_clause_max',
      'vcg_clause_entropy', 'vg_mean', 'vg_coeff', 'vg_min', 'vg_max', 'pnc_ratio_mean', 'pnc_ratio_coeff',
@@ -57,6 +65,7 @@ def bulk_gen_features(path_to_cnfs="/projects/satdb/dataset_final/", results_csv
      'hc_fraction', 'hc_var_mean', 'hc_var_coeff', 'hc_var_min', 'hc_var_max', 'hc_var_entropy',
      'unit_props_at_depth_1', 'unit_props_at_depth_4', 'unit_props_at_depth_16', 'unit_props_at_depth_64',
      'unit_props_at_depth_256', 'mean_depth_to_contradiction_over_vars', 'estimate_log_number_nodes_over_vars',
+     'lobjois_num_probes', 'lobjois_log_num_nodes_relative_ci',
      'saps_BestSolution_Mean', 'saps_BestSolution_CoeffVariance', 'saps_FirstLocalMinStep_Mean',
      'saps_FirstLocalMinStep_CoeffVariance', 'saps_FirstLocalMinStep_Median', 'saps_FirstLocalMinStep_Q.10',
      'saps_FirstLocalMinStep_Q.90', 'saps_BestAvgImprovement_Mean', 'saps_BestAvgImprovement_CoeffVariance',
@@ -75,7 +84,7 @@ def bulk_gen_features(path_to_cnfs="/projects/satdb/dataset_final/", results_csv
             print(file_name)
             print("file ", i, " out of ", len(file_list))
             
-            process = Process(target=feature_gen, args=(file_name,))
+            process = Process(target=feature_gen, args=(file_name, cache_dir, lobjois_relative_ci))
             process.start()
             process.join()
             if not Q.empty():
@@ -1,6 +1,8 @@
 from feature_computation import preprocessing, parse_cnf, active_features, base_features, local_search_probing, \
-    graph_features_ansotegui, graph_features_manthey_alfonso, more_graph_features
+    graph_features_ansotegui, graph_features_manthey_alfonso, more_graph_features, cnf_stream, instance_cache, \
+    lookahead_features
 from feature_computation.dpll import DPLLProbing
+from feature_computation.dpll_watched import WatchedDPLLProbing
 from sat_instance import write_to_file
 import os
 import subprocess
@@ -12,17 +14,54 @@ class SATInstance:
     data structures necessary to the perform feature extraction. Then the various features can be generated, and are
     stored in the features dictionary.
 
+    If a cache directory is given, the parsed instance is written there once, and later instances of the same cnf are
+    loaded from the cache instead of being preprocessed and parsed again.
+
+    With watched_literals, DPLL probing propagates with two watched literals (see WatchedDPLLProbing), which allows
+    many more probes within the time limit on large instances. With probe_workers > 1, the random search space probes
+    run in that many forked processes at once (see DPLLProbing.run_probe_workers).
+
+    With compact_vars, the variables left after preprocessing and normalization are renumbered to 1..v' and the removed
+    clauses are dropped, so that every per variable array and scan is sized by the variables that occur (cnf.num_vars
+    and cnf.num_clauses). self.c and self.v stay the header counts, which the features are normalized by, so the
+    features are the same as without compaction. var_map gives the original variable of each variable (see
+    original_var). SatELite already writes its output with dense variables, so this mostly pays off on instances that
+    are not preprocessed.
+
+    With reorder, the variables and clauses are renumbered by a reverse Cuthill-McKee order of the variable-clause
+    incidence graph (see reordering), so that clauses that share variables are stored and numbered close together.
+    var_map and clause_map give the original variable and normalized clause of each variable and clause. Features that
+    only depend on the clauses up to renumbering are unchanged, but the random probes and anything listed in variable
+    or clause order see a different order.
+
     """
 
-    def __init__(self, input_cnf, preprocess=True, verbose=False, preprocess_tmp=True):
+    def __init__(self, input_cnf, preprocess=True, verbose=False, preprocess_tmp=True, cache_dir=None, parse_workers=1,
+                 watched_literals=False, probe_workers=1, compact_vars=False, reorder=False):
         self.verbose = verbose
         self.preprocess = preprocess
         self.path_to_cnf = input_cnf
 
+        cache_file = None
+        cached = None
+        if cache_dir is not None:
+            cache_file = instance_cache.cache_path(cache_dir, input_cnf, preprocess, compact_vars, reorder)
+            cached = instance_cache.read_cache(cache_file)
+
         # satelite preprocessing
         # n.b. satelite only works on linux, mac no longer supports 32 bit binaries...
 
-        if self.preprocess:
+        if cached is not None:
+            if self.verbose:
+                print("Loading cached instance")
+            cached_arrays, cached_header = cached
+            self.c = cached_header["c"]
+            self.v = cached_header["v"]
+            if self.preprocess:
+                # the preprocessed file is only needed by local search probing, which writes it from the clauses
+                self.path_to_cnf = None
+
+        elif self.preprocess:
             if self.verbose:
                 print("Preprocessing with SatELite")
 
@@ -31,7 +70,9 @@ class SATInstance:
             # else:
             #     preprocessed_path = preprocessing.satelite_preprocess(self.path_to_cnf)
             temp_fn = os.popen("mktemp /tmp/prepro-XXXX").read().strip("\n")
-            satelite_command = "./SatELite/SatELite_v1.0_linux " + input_cnf + " " + temp_fn
+            # SatELite cannot read compressed files
+            plain_cnf, plain_is_tmp = cnf_stream.plain_cnf_path(input_cnf)
+            satelite_command = "./SatELite/SatELite_v1.0_linux " + plain_cnf + " " + temp_fn
             args = shlex.split(satelite_command)
             try:
                 subprocess.run(args, timeout=40)
@@ -39,12 +80,16 @@ class SATInstance:
                 print(f"TIMEOUT satelite: Skipped {input_cnf}")
                 self.solved = True
                 return
+            finally:
+                if plain_is_tmp:
+                    os.remove(plain_cnf)
             self.path_to_cnf = temp_fn
 
-        # parse the cnf file
-        if self.verbose:
-            print("Parsing cnf file")
-        self.clauses, self.c, self.v = parse_cnf.parse_cnf(self.path_to_cnf)
+        if cached is None:
+            # parse the cnf file, compressed files are decompressed while parsing
+            if self.verbose:
+                print("Parsing cnf file")
+            literals, clause_offsets, self.c, self.v = parse_cnf.parse_cnf_arrays(self.path_to_cnf, parse_workers)
 
         if self.v == 0 or self.c == 0:
             self.solved = True
@@ -52,11 +97,20 @@ class SATInstance:
         else:
             self.solved = False
 
+        # compact core representation of the clauses, shared by the feature modules
+        self.cnf = None
+        # original variable of each variable, when the variables are compacted or reordered, and original index of
+        # each normalized clause when the clauses are reordered
+        self.compact_vars = compact_vars
+        self.reorder = reorder
+        self.var_map = None
+        self.clause_map = None
+
         # computed with active features
         # These change as they are processed with dpll probing algorithms
         self.num_active_vars = 0
         self.num_active_clauses = 0
-        # states and lengths of the clauses
+        # states (int8 arrays of the codes in enums) and lengths of the clauses
         self.clause_states = []
         self.clause_lengths = []
         # array of the length of the number of variables, containing the number of active clauses, and binary clauses that each variable contains
@@ -65,9 +119,6 @@ class SATInstance:
         # stack of indexes of the clauses that have 1 literal
         self.unit_clauses = []
 
-        # all of the clauses that contain a positive version of this variable
-        self.clauses_with_positive_var = []
-        self.clauses_with_negative_var = []
         # used for dpll operations, perhaps better to keep them in a dpll class...
 
         self.var_states = []
@@ -75,16 +126,46 @@ class SATInstance:
         self.features_dict = {}
 
         # necessary for unit propagation setup
-        if self.verbose:
-            print("Parsing active features")
-        self.parse_active_features()
+        if cached is None:
+            if self.verbose:
+                print("Parsing active features")
+            self.parse_active_features(literals, clause_offsets)
+            if cache_file is not None:
+                instance_cache.save_instance(cache_file, self)
+        else:
+            self.load_active_features(cached_arrays)
 
         # Do first round of unit prop to remove all unit clauses
-        self.dpll_prober = DPLLProbing(self)
+        if watched_literals:
+            self.dpll_prober = WatchedDPLLProbing(self)
+        else:
+            self.dpll_prober = DPLLProbing(self)
+        self.dpll_prober.num_workers = probe_workers
         if self.verbose:
             print("First round of unit propagation")
         self.dpll_prober.unit_prop(0, 0)
 
+    @property
+    def clauses(self):
+        """
+        The normalized clauses as a list of lists, a view of the CNF core built on first use
+        """
+        return self.cnf.clause_lists()
+
+    @property
+    def clauses_with_positive_var(self):
+        """
+        For each variable, the list of clauses that contain a positive version of it
+        """
+        return self.cnf.occurrence_lists()[0]
+
+    @property
+    def clauses_with_negative_var(self):
+        """
+        For each variable, the list of clauses that contain a negated version of it
+        """
+        return self.cnf.occurrence_lists()[1]
+
     def clauses_with_literal(self, literal):
         """
         Returns a list of clauses that contain the literal
@@ -96,9 +177,35 @@ class SATInstance:
         else:
             return self.clauses_with_negative_var[abs(literal)]
 
-    def parse_active_features(self):
+    def original_var(self, var):
+        """
+        :param var: a variable of the instance
+        :return: the variable in the input cnf, which differs if the variables are compacted or reordered
+        """
+        if self.var_map is None:
+            return var
+        return int(self.var_map[var])
+
+    def parse_active_features(self, literals, clause_offsets):
         # self.num_active_vars, self.num_active_clauses, self.clause_states, self.clauses, self.num_bin_clauses_with_var, self.var_states =\
-        active_features.get_active_features(self, self.clauses, self.c, self.v)
+        active_features.get_active_features(self, literals, clause_offsets, self.c, self.v, self.compact_vars,
+                                            self.reorder)
+
+    def load_active_features(self, cached_arrays):
+        """
+        Set up the active features from the normalized clauses and occurrence lists of the instance cache.
+        """
+        if "var_map" in cached_arrays:
+            self.var_map = cached_arrays["var_map"]
+        if "clause_map" in cached_arrays:
+            self.clause_map = cached_arrays["clause_map"]
+        # the clause list views are not built, the features and probes work on the mapped arrays
+        cnf = instance_cache.load_cnf(cached_arrays)
+        # compacted instances have no passive entries for the removed clauses
+        c = cnf.num_clauses if self.compact_vars else self.c
+        num_bin_clauses_with_var = cached_arrays.get("num_bin_clauses_with_var")
+        active_features.set_active_features(self, cnf, c, cnf.num_vars,
+                                            num_bin_clauses_with_var=num_bin_clauses_with_var)
 
     def gen_basic_features(self):
         """
@@ -107,7 +214,7 @@ class SATInstance:
         if self.verbose:
             print("Generating basic features")
 
-        base_features_dict = base_features.compute_base_features(self.preprocess, self.clauses, self.c, self.v, self.num_active_vars,
+        base_features_dict = base_features.compute_base_features(self.preprocess, self.cnf, self.c, self.v, self.num_active_vars,
                                                                  self.num_active_clauses)
         self.features_dict.update(base_features_dict)
 
@@ -127,6 +234,16 @@ class SATInstance:
         self.features_dict.update(self.dpll_prober.unit_props_log_nodes_dict)
         self.features_dict.update(self.dpll_prober.search_space_measures_dict)
 
+    def gen_lookahead_features(self, max_vars=256):
+        """
+        Generates the lookahead features: failed literals, implied literals and lookahead scores of a sample of the
+        unassigned variables (see lookahead_features).
+        """
+        if self.verbose:
+            print("Lookahead probing")
+
+        self.features_dict.update(lookahead_features.compute_lookahead_features(self, max_vars))
+
     def gen_local_search_probing_features(self):
         """
         Generates the local search probing features (including but not limited to 41-48 from the satzilla paper).
@@ -135,7 +252,17 @@ class SATInstance:
         if self.verbose:
             print("Local search probing with SAPS and GSAT")
 
-        saps_res_dict, gsat_res_dict = local_search_probing.local_search_probe(self.path_to_cnf)
+        # ubcsat cannot read compressed files
+        if self.path_to_cnf is None:
+            # instance loaded from the cache without its preprocessed file
+            plain_cnf, plain_is_tmp = write_to_file.write_clauses_to_tmp_cnf(self.clauses, self.cnf.num_vars), True
+        else:
+            plain_cnf, plain_is_tmp = cnf_stream.plain_cnf_path(self.path_to_cnf)
+        try:
+            saps_res_dict, gsat_res_dict = local_search_probing.local_search_probe(plain_cnf)
+        finally:
+            if plain_is_tmp:
+                os.remove(plain_cnf)
 
         self.features_dict.update(saps_res_dict)
         self.features_dict.update(gsat_res_dict)
@@ -149,7 +276,7 @@ class SATInstance:
             self.num_active_clauses = self.c
             self.num_active_vars = self.v    
         
-        alpha = graph_features_ansotegui.estimate_power_law_alpha(self.clauses, self.num_active_clauses,
+        alpha = graph_features_ansotegui.estimate_power_law_alpha(self.cnf, self.num_active_clauses,
                                                                   self.num_active_vars)
 
         vig = graph_features_ansotegui.create_vig(self.clauses, self.num_active_clauses, self.num_active_vars)
@@ -171,47 +298,16 @@ class SATInstance:
 
         self.features_dict.update(ansotegui_features)
 
-    def gen_manthey_alfonso_graph_features(self):
+    def gen_manthey_alfonso_graph_features(self, graphs=graph_features_manthey_alfonso.GRAPHS):
+        """
+        Generates the graph features from the paper of Manthey-Alfonso, and the recursive weight heuristic.
+        :param graphs: the graphs to compute features of (see graph_features_manthey_alfonso.GRAPHS), the others are
+        not built
+        """
         if self.verbose:
             print("Generating features from the paper of Manthey-Alfonso")
 
-        v_nd_p, v_nd_n, c_nd_p, c_nd_n = graph_features_manthey_alfonso.create_vcg(self.clauses)
-
-        all_stats = [graph_features_manthey_alfonso.get_graph_stats("v_nd_p_", v_nd_p),
-                     graph_features_manthey_alfonso.get_graph_stats("v_nd_n_", v_nd_n),
-                     graph_features_manthey_alfonso.get_graph_stats("c_nd_p_", c_nd_p),
-                     graph_features_manthey_alfonso.get_graph_stats("c_nd_n_", c_nd_n)]
-
-        nd, w = graph_features_manthey_alfonso.create_vg(self.clauses)
-        all_stats.append(graph_features_manthey_alfonso.get_graph_stats("vg_al_", nd, w))
-
-        nd, w = graph_features_manthey_alfonso.create_cg(self.clauses)
-        cg_stats = graph_features_manthey_alfonso.get_graph_stats("cg_al_", nd, w)
-        all_stats.append(cg_stats)
-
-        nd, w = graph_features_manthey_alfonso.create_rg(self.clauses)
-        rg_stats = graph_features_manthey_alfonso.get_graph_stats("rg_", nd, w)
-        all_stats.append(rg_stats)
-
-        _, nd, w = graph_features_manthey_alfonso.create_big(self.clauses)
-        big_stats = graph_features_manthey_alfonso.get_graph_stats("big_", nd, w)
-        all_stats.append(big_stats)
-
-        andg, bandg, exog = graph_features_manthey_alfonso.create_exo_and_band(self.clauses)
-
-        nd, w = graph_features_manthey_alfonso.get_degrees_weights(andg)
-        and_stats = graph_features_manthey_alfonso.get_graph_stats("and_", nd, w)
-        all_stats.append(and_stats)
-
-        nd, w = graph_features_manthey_alfonso.get_degrees_weights(bandg)
-        band_stats = graph_features_manthey_alfonso.get_graph_stats("band_", nd, w)
-        all_stats.append(band_stats)
-
-        nd, w = graph_features_manthey_alfonso.get_degrees_weights(exog)
-        exo_stats = graph_features_manthey_alfonso.get_graph_stats("exo_", nd, w)
-        all_stats.append(exo_stats)
-
-        for stats_dict in all_stats:
+        for stats_dict in graph_features_manthey_alfonso.graph_features(self.cnf, graphs):
             self.features_dict.update(stats_dict)
 
         rwh = more_graph_features.recursive_weight_heuristic(10, self.clauses, self.num_active_vars)
@@ -1,6 +1,23 @@
 import json
+import os
+import tempfile
 
 
 def write_features_to_json(results_dict):
     with open("features.json", "w") as f:
         json.dump(results_dict, f)
+
+
+def write_clauses_to_tmp_cnf(clauses, v):
+    """
+    Write clauses to a temporary dimacs file, which the caller is responsible for removing.
+    :param clauses:
+    :param v: number of variables
+    :return: path to the file
+    """
+    fd, path = tempfile.mkstemp(prefix="cnf-", suffix=".cnf")
+    with os.fdopen(fd, "w") as f:
+        f.write("p cnf " + str(v) + " " + str(len(clauses)) + "\n")
+        for clause in clauses:
+            f.write(" ".join(str(x) for x in clause) + " 0\n")
+    return path
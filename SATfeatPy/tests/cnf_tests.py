@@ -0,0 +1,91 @@
+import os
+import unittest
+
+import numpy as np
+
+from feature_computation import reordering
+from feature_computation.active_features import normalize_clauses
+from feature_computation.cnf import CNF, lists_to_csr, compact_variables
+from feature_computation.enums import VAR_UNASSIGNED, VAR_IRRELEVANT
+
+
+class CNFTest(unittest.TestCase):
+    """
+    Run from the project root directory (SATfeatPy)
+    """
+
+    def test_views(self):
+        clauses = [[1, -2], [-1, 2, 3], [2], [-3, -4]]
+        cnf = CNF.from_clauses(clauses, 5)
+
+        self.assertEqual([2, 3, 1, 2], cnf.clause_lengths().tolist())
+        self.assertEqual([0, 2, 3, 2, 1, 0], cnf.variable_occurrences().tolist())
+        self.assertEqual([1, 2], cnf.clauses_with_literal(2).tolist())
+        self.assertEqual([0], cnf.clauses_with_literal(-2).tolist())
+        self.assertEqual([], cnf.clauses_with_literal(5).tolist())
+        self.assertEqual([-1, 2, 3], cnf.clause(1).tolist())
+
+        states = [VAR_IRRELEVANT] + [VAR_UNASSIGNED] * 4 + [VAR_IRRELEVANT]
+        self.assertEqual(states, cnf.var_states.tolist())
+
+    def test_occurrence_lists(self):
+        clauses = [[1, -2], [-1, 2, 3], [2], [-3, -4], [1, 4]]
+        pos = [[] for _ in range(5)]
+        neg = [[] for _ in range(5)]
+        for i, clause in enumerate(clauses):
+            for literal in clause:
+                (pos if literal > 0 else neg)[abs(literal)].append(i)
+
+        cnf = CNF.from_clauses(clauses, 4)
+        self.assertEqual((pos, neg), cnf.occurrence_lists())
+
+        # a CNF built from the arrays only gives the same list views
+        arrays = CNF(cnf.literals, cnf.clause_offsets, 4)
+        self.assertEqual(clauses, arrays.clause_lists())
+        self.assertEqual((pos, neg), arrays.occurrence_lists())
+
+    def test_normalize_clauses(self):
+        clauses = [[3, -1, 3], [2, -2, 1], [], [-4, 1, -4, 2], [1, -3, -1, 1], [5]]
+        literals, clause_offsets = lists_to_csr(clauses)
+
+        literals, clause_offsets, num_active, num_bin = normalize_clauses(literals, clause_offsets, 5)
+        # duplicates are removed, tautologies and empty clauses dropped, and literals sorted by variable
+        self.assertEqual([[-1, 3], [1, 2, -4], [5]], CNF(literals, clause_offsets, 5).clause_lists())
+        self.assertEqual([0, 2, 1, 1, 1, 1], num_active.tolist())
+        self.assertEqual([0, 1, 0, 1, 0, 0], num_bin.tolist())
+        self.assertEqual(np.int64, clause_offsets.dtype)
+
+    def test_compact_variables(self):
+        literals, _ = lists_to_csr([[-7, 2], [9, 2, -4], [-9]])
+
+        compacted, var_map = compact_variables(literals, 10)
+        self.assertEqual([-3, 1, 4, 1, -2, -4], compacted.tolist())
+        self.assertEqual([0, 2, 4, 7, 9], var_map.tolist())
+        self.assertEqual(literals.tolist(), (np.sign(compacted) * var_map[np.abs(compacted)]).tolist())
+        self.assertEqual(literals.dtype, compacted.dtype)
+
+    def test_reorder_clauses(self):
+        # a chain 1-4-2-5-3 of binary clauses, listed out of order
+        clauses = [[2, -5], [1, 4], [-3, 5], [-2, 4]]
+        literals, clause_offsets = lists_to_csr(clauses)
+
+        var_order, clause_order = reordering.rcm_order(literals, clause_offsets, 5)
+        self.assertEqual(0, var_order[0])
+        self.assertEqual(list(range(6)), sorted(var_order.tolist()))
+        self.assertEqual(list(range(4)), sorted(clause_order.tolist()))
+
+        new_literals, new_offsets = reordering.reorder_clauses(literals, clause_offsets, var_order, clause_order)
+        reordered = CNF(new_literals, new_offsets, 5).clause_lists()
+        for new_clause, old_clause in zip(reordered, clause_order):
+            self.assertEqual(sorted(new_clause, key=abs), new_clause)
+            self.assertEqual(sorted(clauses[old_clause]),
+                             sorted(int(np.sign(lit)) * int(var_order[abs(lit)]) for lit in new_clause))
+
+        # consecutive clauses of the chain share a variable, and the variables of a clause are adjacent
+        self.assertEqual({"clause_var_span": 1.0, "occurrence_gap": 1.0},
+                         reordering.locality(new_literals, new_offsets))
+
+
+if __name__ == '__main__':
+    os.chdir("..")
+    unittest.main()
@@ -0,0 +1,303 @@
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from feature_computation.bit_parallel_probing import BitParallelProbes
+from feature_computation.enums import VarState
+from feature_computation.lobjois_estimator import LobjoisEstimator
+from sat_instance.sat_instance import SATInstance
+
+
+def legacy_vars_in_most_bin_clauses(sat_instance, num_bin_clauses_with_var, num_vars_to_try):
+    """
+    The original selection of the unit propagation probe, kept here as the reference.
+    """
+    vars_in_most_bin_clauses = [0] * num_vars_to_try
+    num_bin = [0] * num_vars_to_try
+
+    array_size = 0
+    for var in range(1, sat_instance.v + 1):
+        if sat_instance.var_states[var] != VarState.UNASSIGNED: continue
+
+        if array_size < num_vars_to_try: array_size += 1
+
+        j = 0
+        while j < array_size - 1 and num_bin_clauses_with_var[var] < num_bin[j]:
+            j += 1
+
+        for k in range(array_size - 1, j, -1):
+            vars_in_most_bin_clauses[k] = vars_in_most_bin_clauses[k - 1]
+            num_bin[k] = num_bin[k - 1]
+
+        vars_in_most_bin_clauses[j] = var
+        num_bin[j] = num_bin_clauses_with_var[var]
+
+    return vars_in_most_bin_clauses[:array_size]
+
+
+class DPLLTest(unittest.TestCase):
+    """
+    Run from the project root directory (SATfeatPy)
+    """
+
+    test_files = ["basic.cnf", "php10_7.cnf", "parity_5.cnf", "tseitin_10_4.cnf", "sat_matching_80_626_22182.cnf"]
+    file_directory = "cnf_examples/"
+
+    def assert_same_state(self, a, b):
+        self.assertEqual(a.num_active_vars, b.num_active_vars)
+        self.assertEqual(a.num_active_clauses, b.num_active_clauses)
+        self.assertEqual(a.var_states, b.var_states)
+
+    def test_watched_literals_state(self):
+        for test_file in self.test_files:
+            counting = SATInstance(self.file_directory + test_file, preprocess=False)
+            watched = SATInstance(self.file_directory + test_file, preprocess=False, watched_literals=True)
+            self.assert_same_state(counting, watched)
+
+            rng = random.Random(0)
+            for probe in range(20):
+                depth = 0
+                consistent = True
+                while consistent and counting.num_active_vars > 0:
+                    unassigned = [var for var in range(1, counting.v + 1)
+                                  if counting.var_states[var] == VarState.UNASSIGNED]
+                    var, value = rng.choice(unassigned), rng.random() < 0.5
+
+                    consistent = counting.dpll_prober.set_var_and_prop(var, value)
+                    self.assertEqual(consistent, watched.dpll_prober.set_var_and_prop(var, value))
+                    depth += 1
+                    self.assert_same_state(counting, watched)
+                    if consistent:
+                        self.assertEqual(counting.dpll_prober.bin_clause_counts(),
+                                         watched.dpll_prober.bin_clause_counts())
+
+                for _ in range(depth):
+                    counting.dpll_prober.backtrack()
+                    watched.dpll_prober.backtrack()
+                self.assert_same_state(counting, watched)
+
+    def test_unassigned_vars(self):
+        for test_file in self.test_files:
+            for watched_literals in [False, True]:
+                sat_inst = SATInstance(self.file_directory + test_file, preprocess=False,
+                                       watched_literals=watched_literals)
+                unassigned_vars = sat_inst.dpll_prober.unassigned_vars
+                initial = sorted(unassigned_vars.dense[:len(unassigned_vars)])
+
+                random.seed(0)
+                for probe in range(10):
+                    depth = 0
+                    consistent = True
+                    while consistent and sat_inst.num_active_vars > 0:
+                        unassigned = [var for var in range(1, sat_inst.v + 1)
+                                      if sat_inst.var_states[var] == VarState.UNASSIGNED]
+                        self.assertEqual(sorted(unassigned), sorted(unassigned_vars.dense[:len(unassigned_vars)]))
+                        self.assertEqual(sat_inst.num_active_vars, len(unassigned_vars))
+
+                        var = unassigned_vars.sample()
+                        self.assertIn(var, unassigned)
+                        consistent = sat_inst.dpll_prober.set_var_and_prop(var, random.random() < 0.5)
+                        depth += 1
+
+                    for _ in range(depth):
+                        sat_inst.dpll_prober.backtrack()
+                    self.assertEqual(initial, sorted(unassigned_vars.dense[:len(unassigned_vars)]))
+
+    def test_top_bin_clause_vars(self):
+        for test_file in self.test_files:
+            for watched_literals in [False, True]:
+                sat_inst = SATInstance(self.file_directory + test_file, preprocess=False,
+                                       watched_literals=watched_literals)
+                prober = sat_inst.dpll_prober
+
+                rng = random.Random(0)
+                for probe in range(10):
+                    depth = 0
+                    consistent = True
+                    while consistent and sat_inst.num_active_vars > 0:
+                        for k in [1, 3, 10]:
+                            expected = legacy_vars_in_most_bin_clauses(sat_inst, prober.bin_clause_counts(), k)
+                            self.assertEqual(expected, prober.top_bin_clause_vars(k))
+                        if watched_literals:
+                            # the counts kept up to date since the first selection
+                            self.assertEqual(prober.bin_clause_counts(), prober.bin_counts)
+
+                        unassigned = [var for var in range(1, sat_inst.v + 1)
+                                      if sat_inst.var_states[var] == VarState.UNASSIGNED]
+                        consistent = prober.set_var_and_prop(rng.choice(unassigned), rng.random() < 0.5)
+                        depth += 1
+
+                    for _ in range(depth):
+                        prober.backtrack()
+
+    def test_watched_literals_features(self):
+        for test_file in self.test_files:
+            features = []
+            for watched_literals in [False, True]:
+                random.seed(1)
+                sat_inst = SATInstance(self.file_directory + test_file, preprocess=False,
+                                       watched_literals=watched_literals)
+                sat_inst.dpll_prober.num_lob_probe = 100
+                sat_inst.dpll_prober.time_limit = 100
+                sat_inst.gen_dpll_probing_features()
+                features.append(sat_inst.features_dict)
+
+            self.assertEqual(features[0], features[1])
+
+    def test_probe_workers(self):
+        for test_file in self.test_files:
+            features = []
+            for num_workers in [1, 3, 3]:
+                sat_inst = SATInstance(self.file_directory + test_file, preprocess=False, probe_workers=num_workers)
+                sat_inst.dpll_prober.num_lob_probe = 90
+                sat_inst.dpll_prober.time_limit = 100
+                sat_inst.dpll_prober.seed = 7
+                var_states = list(sat_inst.var_states)
+                sat_inst.dpll_prober.search_space_probe()
+                features.append(sat_inst.dpll_prober.unit_props_log_nodes_dict)
+
+                # the probes leave the instance in its original state
+                self.assertEqual(var_states, list(sat_inst.var_states))
+                self.assertEqual(sat_inst.num_active_vars, len(sat_inst.dpll_prober.unassigned_vars))
+
+            # the same seed and workers give the same result
+            self.assertEqual(features[1], features[2])
+            for feature in features[1].values():
+                self.assertGreater(feature, 0)
+
+    def test_lobjois_estimator(self):
+        rng = random.Random(0)
+        depths = [rng.randint(0, 2000) for _ in range(200)]
+
+        estimator = LobjoisEstimator()
+        for depth in depths:
+            estimator.add(depth)
+        reference = LobjoisEstimator.from_depths(depths)
+
+        self.assertEqual(reference.num_samples, estimator.num_samples)
+        self.assertAlmostEqual(reference.log_num_nodes(), estimator.log_num_nodes())
+        self.assertAlmostEqual(reference.log_num_nodes_std_error(), estimator.log_num_nodes_std_error())
+        self.assertEqual(0.0, LobjoisEstimator.from_depths([5, 5, 5]).relative_ci())
+
+    def test_lobjois_convergence(self):
+        for test_file in self.test_files:
+            random.seed(1)
+            sat_inst = SATInstance(self.file_directory + test_file, preprocess=False)
+            prober = sat_inst.dpll_prober
+            prober.num_lob_probe = 2000
+            prober.time_limit = 100
+            prober.lobjois_relative_ci = 0.05
+            prober.search_space_probe()
+
+            features = prober.unit_props_log_nodes_dict
+            self.assertGreaterEqual(features["lobjois_num_probes"], prober.lobjois_min_probes)
+            if features["lobjois_num_probes"] < prober.num_lob_probe:
+                self.assertLessEqual(features["lobjois_log_num_nodes_relative_ci"], 0.05)
+
+    def test_bit_parallel_probes(self):
+        # every assignment of variable 1 or 2 propagates into a conflict on the other one
+        f = tempfile.NamedTemporaryFile("wb", suffix=".cnf", delete=False)
+        f.write(b"p cnf 3 5\n1 2 0\n1 -2 0\n-1 2 0\n-1 -2 0\n2 3 0\n")
+        f.close()
+        self.addCleanup(os.remove, f.name)
+
+        sat_inst = SATInstance(f.name, preprocess=False)
+        depths, solved = BitParallelProbes(sat_inst).run(np.random.default_rng(0))
+        self.assertEqual(64, len(depths))
+        self.assertFalse(solved)
+        for depth in depths:
+            # variable 3 is made irrelevant when 2 is set true first
+            self.assertIn(depth, [2, 3])
+
+        for test_file in self.test_files:
+            sat_inst = SATInstance(self.file_directory + test_file, preprocess=False)
+            depths, _ = BitParallelProbes(sat_inst).run(np.random.default_rng(0), 10)
+            self.assertEqual(10, len(depths))
+            for depth in depths:
+                self.assertGreaterEqual(depth, 1)
+                self.assertLessEqual(depth, sat_inst.num_active_vars)
+
+            prober = sat_inst.dpll_prober
+            prober.bit_parallel_lobjois = True
+            prober.num_lob_probe = 100
+            prober.time_limit = 100
+            prober.search_space_probe()
+            self.assertEqual(100, prober.unit_props_log_nodes_dict["lobjois_num_probes"])
+
+    def test_propagate_literals(self):
+        for test_file in self.test_files + ["sat_4color_200_1126_10020_preprocessed.cnf"]:
+            sat_inst = SATInstance(self.file_directory + test_file, preprocess=False)
+            unassigned = [var for var in range(1, sat_inst.v + 1) if sat_inst.var_states[var] == VarState.UNASSIGNED]
+            literals = [literal for var in unassigned[:32] for literal in [var, -var]]
+            failed, implied = BitParallelProbes(sat_inst).propagate_literals(literals)
+
+            # unit propagation reaches the same conflict or the same fixpoint in any order
+            num_active_vars = sat_inst.num_active_vars
+            for literal, literal_failed, literal_implied in zip(literals, failed, implied):
+                num_assigned = sum(1 for state in sat_inst.var_states[1:]
+                                   if state in [VarState.TRUE_VAL, VarState.FALSE_VAL])
+                consistent = sat_inst.dpll_prober.set_var_and_prop(abs(literal), literal > 0)
+                self.assertEqual(not consistent, literal_failed)
+                if consistent:
+                    self.assertEqual(num_assigned + 1 + literal_implied,
+                                     sum(1 for state in sat_inst.var_states[1:]
+                                         if state in [VarState.TRUE_VAL, VarState.FALSE_VAL]))
+                sat_inst.dpll_prober.backtrack()
+                self.assertEqual(num_active_vars, sat_inst.num_active_vars)
+
+    def test_lookahead_features(self):
+        for test_file in self.test_files:
+            random.seed(0)
+            sat_inst = SATInstance(self.file_directory + test_file, preprocess=False)
+            sat_inst.gen_lookahead_features(max_vars=16)
+
+            features = sat_inst.features_dict
+            self.assertEqual(min(16, sat_inst.num_active_vars), features["lookahead_num_vars"])
+            self.assertLessEqual(0, features["lookahead_failed_literals_ratio"])
+            self.assertLessEqual(features["lookahead_failed_vars_ratio"], features["lookahead_failed_literals_ratio"])
+            self.assertLessEqual(features["lookahead_implied_max"], 1)
+            self.assertLessEqual(features["lookahead_score_min"], features["lookahead_score_max"])
+
+    def test_mark_restore(self):
+        def state(sat_inst):
+            prober = sat_inst.dpll_prober
+            common = (sat_inst.num_active_vars, sat_inst.num_active_clauses, list(sat_inst.var_states),
+                      sorted(prober.unassigned_vars.dense[:len(prober.unassigned_vars)]), len(prober.reduced_vars))
+            if watched_literals:
+                return common + (list(prober.num_unsatisfied_clauses_with_var), bytes(prober.satisfied))
+            return common + (list(sat_inst.clause_states), list(sat_inst.clause_lengths),
+                             list(sat_inst.num_active_clauses_with_var), list(sat_inst.num_bin_clauses_with_var))
+
+        for test_file in self.test_files:
+            for watched_literals in [False, True]:
+                backtracked, restored = [SATInstance(self.file_directory + test_file, preprocess=False,
+                                                     watched_literals=watched_literals) for _ in range(2)]
+                rng = random.Random(0)
+                for probe in range(10):
+                    states = [state(backtracked)]
+                    marks = [restored.dpll_prober.mark()]
+                    consistent = True
+                    while consistent and backtracked.num_active_vars > 0:
+                        unassigned = [var for var in range(1, backtracked.v + 1)
+                                      if backtracked.var_states[var] == VarState.UNASSIGNED]
+                        var, value = rng.choice(unassigned), rng.random() < 0.5
+                        consistent = backtracked.dpll_prober.set_var_and_prop(var, value)
+                        restored.dpll_prober.set_var_and_prop(var, value)
+                        states.append(state(backtracked))
+                        marks.append(restored.dpll_prober.mark())
+
+                    # back to a level in the middle, and then to the root
+                    for level in [len(states) // 2, 0]:
+                        while len(backtracked.dpll_prober.reduced_vars) > states[level][4]:
+                            backtracked.dpll_prober.backtrack()
+                        restored.dpll_prober.restore(marks[level])
+                        self.assertEqual(states[level], state(backtracked))
+                        self.assertEqual(states[level], state(restored))
+
+
+if __name__ == '__main__':
+    os.chdir("..")
+    unittest.main()
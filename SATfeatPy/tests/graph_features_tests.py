@@ -0,0 +1,229 @@
+import os
+import random
+import unittest
+
+import numpy as np
+
+from feature_computation import graph_features, variable_graph, clause_graph, implication_graph, \
+    graph_features_manthey_alfonso, array_stats
+from feature_computation.cnf import CNF
+
+
+def as_lists(graph_lists):
+    """
+    :param graph_lists: degree and weight arrays of a graph
+    :return: the arrays as lists
+    """
+    return tuple(values.tolist() for values in graph_lists)
+
+
+class GraphFeaturesTest(unittest.TestCase):
+    """
+    Run from the project root directory (SATfeatPy)
+    """
+
+    def test_vcg_degrees(self):
+        # clause 1 repeats variable 2, clause 3 is a tautology, variable 4 occurs in no clause
+        clauses = [[1, -2], [2, 3, -2], [-1], [3, -3, 5]]
+        cnf = CNF.from_clauses(clauses, 5)
+
+        v_node_degrees, c_node_degrees = graph_features.create_vcg(cnf, 4, 5)
+        self.assertEqual([2, 2, 2, 0, 1], v_node_degrees)
+        self.assertEqual([2, 2, 1, 2], c_node_degrees)
+
+        # nodes past the given counts are left out, missing ones have degree 0
+        self.assertEqual(([2, 2], [2, 2, 1, 2, 0]), graph_features.create_vcg(cnf, 5, 2))
+
+    def test_vg_degrees_weights(self):
+        # the edge of variables 2 and 3 is added by the first clause, and keeps the weight of the second
+        cnf = CNF.from_clauses([[1, 2, 3], [4], [3, -1, 2]], 4)
+
+        node_degrees, weights = as_lists(variable_graph.vg_degrees_weights(cnf))
+        self.assertEqual([2, 2, 2], node_degrees)
+        self.assertEqual([0.5, 0.5, 0.25], weights)
+        self.assertEqual(node_degrees, graph_features.create_vg(cnf))
+
+    def test_vg_pair_budget(self):
+        # 15 pairs over the budget of 9, so only the pairs at most 2 literals apart are kept
+        cnf = CNF.from_clauses([[1, 2, 3, 4, 5, 6], [7, 8]], 8)
+        self.assertEqual(2, variable_graph.pair_band(cnf.clause_lengths(), 10))
+
+        node_degrees, weights = as_lists(variable_graph.vg_degrees_weights(cnf, max_pairs=10))
+        self.assertEqual([2, 3, 4, 4, 3, 2, 1, 1], node_degrees)
+        self.assertEqual(10, len(weights))
+        self.assertEqual(0.25, min(weights))
+
+    def test_vg_pair_budget_long_clause(self):
+        # a clause of 10^5 literals has about 5 * 10^9 pairs, only the ones of the band are built
+        cnf = CNF.from_clauses([list(range(1, 100001))], 100000)
+
+        node_degrees, weights = as_lists(variable_graph.vg_degrees_weights(cnf, max_pairs=300000))
+        self.assertEqual(3 * 100000 - 6, len(weights))
+        self.assertEqual([3, 4, 5] + [6] * (100000 - 6) + [5, 4, 3], node_degrees)
+        self.assertEqual(0.125, min(weights))
+
+    def test_cg_degrees_weights(self):
+        # clauses 0 and 2 share 1 (second clause with it after 0) and then -2 (first clause with it after 0)
+        cnf = CNF.from_clauses([[1, -2], [1, 3], [1, -2], [4]], 4)
+
+        node_degrees, weights = as_lists(clause_graph.cg_degrees_weights(cnf))
+        self.assertEqual([2, 2, 2], node_degrees)
+        # edges (0, 1), (0, 2), (1, 2)
+        self.assertEqual([1, 1, 1], weights)
+
+        # with the literals the other way round, edge (0, 2) is added first, by -2, and keeps the weight of 1
+        cnf = CNF.from_clauses([[-2, 1], [1, 3], [1, -2]], 3)
+        self.assertEqual([2, 1, 1], clause_graph.cg_degrees_weights(cnf)[1].tolist())
+
+    def test_cg_fanout(self):
+        # literal 1 is in 6 clauses, of which 3 are paired
+        random.seed(2)
+        cnf = CNF.from_clauses([[1, i] for i in range(2, 8)], 7)
+
+        node_degrees, weights = as_lists(clause_graph.cg_degrees_weights(cnf, max_fanout=3))
+        self.assertEqual([2, 2, 2], node_degrees)
+        self.assertEqual(3, len(weights))
+        self.assertEqual(len(clause_graph.cg_degrees_weights(cnf)[1]), 15)
+
+    def test_cg_pair_budget(self):
+        # 15 + 15 + 1 pairs over the budget of 13, so literals 1 and 2 keep 4 of their 6 clauses, and -1 both of its
+        random.seed(2)
+        cnf = CNF.from_clauses([[1, 2, i] for i in range(3, 9)] + [[-1], [-1, 9]], 9)
+        self.assertEqual(4, clause_graph.fanout_for_budget(lambda f: 2 * (min(f, 6) * (min(f, 6) - 1) // 2) + 1,
+                                                           clause_graph.MAX_CG_FANOUT, 13))
+
+        node_degrees, weights = as_lists(clause_graph.cg_degrees_weights(cnf, max_pairs=13))
+        self.assertTrue(6 <= len(weights) <= 13)
+        self.assertEqual(2 * len(weights), sum(node_degrees))
+        self.assertEqual(len(clause_graph.cg_degrees_weights(cnf)[1]), 16)
+
+    def test_rg_degrees_weights(self):
+        # clauses 0 and 1 clash on both variables, so their resolvents are tautologies
+        cnf = CNF.from_clauses([[1, 2], [-1, -2, 5], [-1, 3], [-2, 4]], 5)
+        self.assertEqual(([2, 1, 1], [0.25, 0.25]), as_lists(clause_graph.rg_degrees_weights(cnf)))
+
+        # with one clause per literal kept, the second clash of clauses 0 and 1 may be left out, and is checked (their
+        # edge would weigh 0.125)
+        random.seed(1)
+        for _ in range(10):
+            node_degrees, weights = as_lists(clause_graph.rg_degrees_weights(cnf, max_fanout=1))
+            self.assertTrue(sum(node_degrees) <= 4)
+            self.assertEqual([0.25] * (sum(node_degrees) // 2), weights)
+        self.assertEqual([2, 0, 1], clause_graph.clash_counts(cnf, np.array([0, 2, 0]), np.array([1, 3, 2])).tolist())
+        # a pair at a time
+        self.assertEqual([2, 0, 1], clause_graph.clash_counts(cnf, np.array([0, 2, 0]), np.array([1, 3, 2]),
+                                                              max_pairs=1).tolist())
+
+    def test_rg_pair_budget(self):
+        # 6 * 6 + 6 candidates over the budget of 10, so literals 1 and -1 keep 2 of their 6 clauses
+        random.seed(3)
+        cnf = CNF.from_clauses([[1, i] for i in range(2, 8)] + [[-1, -i] for i in range(2, 8)], 7)
+
+        node_degrees, weights = as_lists(clause_graph.rg_degrees_weights(cnf, max_pairs=10))
+        self.assertTrue(len(weights) <= 4)
+        self.assertEqual([0.25] * len(weights), weights)
+        self.assertEqual(36 - 6, len(clause_graph.rg_degrees_weights(cnf)[1]))
+
+    def test_big_and_gates(self):
+        # [1, 2, 3] is an exactly one constraint with the binary clauses, [1, -2, 4] is only a Blocked-AND
+        cnf = CNF.from_clauses([[1, 2, 3], [-1, -2], [-1, -3], [-2, -3], [1, -2, 4], [5]], 5)
+        big = implication_graph.ImplicationGraph(cnf)
+        self.assertEqual([-3, -2], big.literal_successors(1).tolist())
+        self.assertEqual([True, False], big.implies([2, 1], [-3, 2]).tolist())
+
+        # nodes 1, -1, 2, -2, ..., 5, -5
+        self.assertEqual(([2, 0, 2, 0, 2, 0, 0, 0, 0, 0], [1] * 6),
+                         as_lists(implication_graph.big_degrees_weights(cnf, big)))
+        and_lists, band_lists, exo_lists = map(as_lists, implication_graph.exo_and_band_degrees_weights(cnf, big))
+        self.assertEqual(([2, 2, 2, 2, 2, 2, 0, 0, 0, 0], [0.5, 0.5, 0.5, 0.25, 0.25, 0.25]), and_lists)
+        self.assertEqual(([2, 2, 2, 2, 0, 0, 2, 2, 0, 0], [0.5, 0.5, 0.5, 0.25, 0.25, 0.25]), band_lists)
+        self.assertEqual(([2, 0, 2, 0, 2, 0, 0, 0, 0, 0], [1, 1, 1]), exo_lists)
+
+        # the scan of a clause stops at the first missing implication, after adding the AND edges found before it
+        cnf = CNF.from_clauses([[-1, -2], [1, 2, 3, 4]], 4)
+        and_lists, band_lists, exo_lists = map(as_lists, implication_graph.exo_and_band_degrees_weights(cnf))
+        self.assertEqual([0, 1, 1, 0, 0, 0, 0, 0], and_lists[0])
+        self.assertEqual([0.5], and_lists[1])
+        self.assertEqual(([0] * 8, []), band_lists)
+        self.assertEqual(([0] * 8, []), exo_lists)
+
+    def test_big_equivalences(self):
+        # 1 = 2 = -3, 4 implies -4 through 5 and through -5, and 7, 8 are in no binary clause
+        clauses = [[-1, 2], [1, -2], [-2, -3], [2, 3], [-4, 5], [-4, -5], [-1, 6], [-2, 6], [7, 8, 1]]
+        features = implication_graph.equivalence_features(CNF.from_clauses(clauses, 8))
+        self.assertEqual(1, features["big_equiv_classes"])
+        self.assertEqual(3, features["big_equiv_vars"])
+        self.assertEqual(0, features["big_contradictory_vars"])
+        self.assertEqual(1, features["big_failed_literals"])
+        self.assertEqual(16, features["big_edges"])
+        # the cycles of the class and of its negation, one edge from each to 6 or -6, and the four edges of 4 and 5
+        self.assertEqual(12, features["big_reduced_edges"])
+
+        # x = -x makes both literals failed
+        features = implication_graph.equivalence_features(CNF.from_clauses([[1, 2], [-1, 2], [1, -2], [-1, -2]], 2))
+        self.assertEqual(2, features["big_contradictory_vars"])
+        self.assertEqual(4, features["big_failed_literals"])
+        self.assertEqual(0, features["big_equiv_classes"])
+
+        # 1 -> 2 -> 3 makes 1 -> 3 transitive
+        features = implication_graph.equivalence_features(CNF.from_clauses([[-1, 2], [-2, 3], [-1, 3]], 3))
+        self.assertEqual(4, features["big_reduced_edges"])
+
+    def test_manthey_alfonso_graph_subsets(self):
+        cnf = CNF.from_clauses([[1, 2, 3], [-1, -2], [-1, -3], [-2, -3], [1, -2, 4], [-4, 5]], 5)
+        all_features = {}
+        for stats_dict in graph_features_manthey_alfonso.graph_features(cnf):
+            all_features.update(stats_dict)
+
+        # only the requested graphs are computed, with the same features
+        features = {}
+        for stats_dict in graph_features_manthey_alfonso.graph_features(cnf, ["exo", "rg"]):
+            features.update(stats_dict)
+        self.assertEqual({"rg", "exo"}, {name.split("_")[0] for name in features})
+        self.assertEqual({name: all_features[name] for name in features}, features)
+
+        with self.assertRaises(ValueError):
+            list(graph_features_manthey_alfonso.graph_features(cnf, ["vcg", "vig"]))
+
+    def test_graph_stats(self):
+        # zeros and the rate of the mode are counted on arrays too, and chunks give the same stats
+        node_degrees = np.array([0, 2, 2, 3, 0, 2])
+        stats_dict = graph_features_manthey_alfonso.get_graph_stats("g_", node_degrees, np.array([0.5, 0.25]))
+        self.assertEqual(0, stats_dict["g_node_min"])
+        self.assertEqual(2, stats_dict["g_node_mode"])
+        self.assertEqual(2, stats_dict["g_node_zeros"])
+        self.assertEqual(0.5, stats_dict["g_node_val_rate"])
+        self.assertAlmostEqual(1.5, stats_dict["g_node_mean"])
+        self.assertAlmostEqual(0.375, stats_dict["g_weights_mean"])
+        # mquantiles of the sorted degrees 0, 0, 2, 2, 2, 3
+        for expected, q in zip([0.0, 2.0, 2.05], "123"):
+            self.assertAlmostEqual(expected, stats_dict["g_node_q" + q])
+        self.assertEqual(stats_dict, graph_features_manthey_alfonso.get_graph_stats(
+            "g_", iter([node_degrees[:4], node_degrees[4:]]), [[0.5], [0.25]]))
+
+        # no edges
+        self.assertEqual(0, graph_features_manthey_alfonso.get_graph_stats("g_", [1, 1])["g_weights_max"])
+
+    def test_value_sketch_buckets(self):
+        values = np.arange(1, 1001) * 1.5
+        sketch = array_stats.ValueSketch(max_exact=100, relative_accuracy=0.01)
+        for chunk in np.array_split(values, 4):
+            sketch.update(chunk)
+        self.assertTrue(sketch.bucketed)
+        self.assertEqual(1000, sketch.count)
+        self.assertAlmostEqual(values.mean(), sketch.mean)
+        for approximate, exact in zip(sketch.quantiles(), np.quantile(values, [0.25, 0.5, 0.75])):
+            self.assertTrue(abs(approximate - exact) <= 0.02 * exact)
+
+        # merging the exact sketch of the first half gives the same quantiles
+        first = array_stats.ValueSketch(max_exact=100)
+        first.update(values[:500])
+        second = array_stats.ValueSketch(max_exact=100)
+        second.update(values[500:])
+        first.merge(second)
+        self.assertEqual(sketch.quantiles(), first.quantiles())
+
+
+if __name__ == '__main__':
+    os.chdir("..")
+    unittest.main()
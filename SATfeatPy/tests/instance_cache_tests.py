@@ -0,0 +1,127 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from feature_computation import instance_cache
+from sat_instance.sat_instance import SATInstance
+
+
+class InstanceCacheTest(unittest.TestCase):
+    """
+    Run from the project root directory (SATfeatPy)
+    """
+
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def test_round_trip(self):
+        arrays = {"literals": np.array([1, -2, 3], dtype=np.int32),
+                  "clause_offsets": np.array([0, 2, 3], dtype=np.int64),
+                  "empty": np.zeros(0, dtype=np.int32)}
+        path = os.path.join(self.cache_dir, "x.satc")
+        instance_cache.write_cache(path, arrays, {"c": 2, "v": 3})
+
+        loaded, header = instance_cache.read_cache(path)
+        self.assertEqual({"c": 2, "v": 3}, header)
+        for name, a in arrays.items():
+            self.assertEqual(a.dtype, loaded[name].dtype)
+            self.assertEqual(a.tolist(), loaded[name].tolist())
+
+    def test_gbd_hash_key(self):
+        key = "00063d88244921d6ec46aeab6866a8e2"
+        self.assertEqual(key, instance_cache.instance_key("anni_2022/" + key + "-some-name.cnf.xz"))
+
+    def test_cached_instance_features(self):
+        cnf_path = "cnf_examples/php10_7.cnf"
+
+        features = []
+        for cache_dir in [None, self.cache_dir, self.cache_dir]:
+            random.seed(1)
+            sat_inst = SATInstance(cnf_path, preprocess=False, cache_dir=cache_dir)
+            sat_inst.dpll_prober.num_lob_probe = 100
+            sat_inst.gen_basic_features()
+            sat_inst.gen_dpll_probing_features()
+            features.append(sat_inst.features_dict)
+
+        self.assertTrue(os.path.isfile(instance_cache.cache_path(self.cache_dir, cnf_path, False)))
+        self.assertEqual(features[0], features[1])
+        self.assertEqual(features[0], features[2])
+
+    def test_cached_instance_arrays(self):
+        cnf_path = "cnf_examples/php10_7.cnf"
+        SATInstance(cnf_path, preprocess=False, cache_dir=self.cache_dir)
+
+        for watched_literals in [False, True]:
+            sat_inst = SATInstance(cnf_path, preprocess=False, cache_dir=self.cache_dir,
+                                   watched_literals=watched_literals)
+            sat_inst.dpll_prober.num_lob_probe = 20
+            sat_inst.gen_dpll_probing_features()
+
+            # the probes work on the read only mapped arrays, without building the list views
+            self.assertFalse(sat_inst.cnf.literals.flags.writeable)
+            self.assertIsNone(sat_inst.cnf._clause_lists)
+            self.assertIsNone(sat_inst.cnf._occurrence_lists)
+
+    def test_compact_vars(self):
+        # variables 2, 5 and 6 occur in no clause, and 7 only in a tautology
+        cnf_path = os.path.join(self.cache_dir, "holes.cnf")
+        with open(cnf_path, "w") as f:
+            f.write("p cnf 9 6\n1 -3 0\n3 4 -8 0\n-1 -4 0\n7 -7 9 0\n8 9 0\n-9 -3 4 0\n")
+
+        sat_inst = SATInstance(cnf_path, preprocess=False)
+        for cache_dir in [None, self.cache_dir, self.cache_dir]:
+            compacted = SATInstance(cnf_path, preprocess=False, cache_dir=cache_dir, compact_vars=True)
+
+            # the counts stay the header ones, the arrays are sized by the compacted ones
+            self.assertEqual((9, 6), (compacted.v, compacted.c))
+            self.assertEqual((5, 5), (compacted.cnf.num_vars, compacted.cnf.num_clauses))
+            self.assertEqual([0, 1, 3, 4, 8, 9], compacted.var_map.tolist())
+            self.assertEqual(sat_inst.clauses, [[int(np.sign(lit)) * compacted.original_var(abs(lit)) for lit in clause]
+                                                for clause in compacted.clauses])
+            self.assertEqual(len(compacted.var_states), compacted.cnf.num_vars + 1)
+            self.assertEqual(sat_inst.num_active_vars, compacted.num_active_vars)
+
+    def test_compact_vars_features(self):
+        # the variables of php10_7 renumbered to the even variables only, and a tautology that is removed
+        cnf_path = os.path.join(self.cache_dir, "holes.cnf")
+        sat_inst = SATInstance("cnf_examples/php10_7.cnf", preprocess=False)
+        with open(cnf_path, "w") as f:
+            f.write("p cnf " + str(2 * sat_inst.v + 1) + " " + str(sat_inst.c + 1) + "\n")
+            for clause in sat_inst.clauses + [[1, -1, 3]]:
+                f.write(" ".join(str(2 * lit) for lit in clause) + " 0\n")
+
+        for test_file in ["cnf_examples/php10_7.cnf", cnf_path]:
+            features = []
+            for compact_vars in [False, True]:
+                random.seed(1)
+                sat_inst = SATInstance(test_file, preprocess=False, compact_vars=compact_vars)
+                sat_inst.dpll_prober.num_lob_probe = 100
+                sat_inst.gen_basic_features()
+                sat_inst.gen_dpll_probing_features()
+                features.append(sat_inst.features_dict)
+
+            self.assertEqual(features[0], features[1])
+
+    def test_reorder(self):
+        sat_inst = SATInstance("cnf_examples/tseitin_10_4.cnf", preprocess=False)
+        sat_inst.gen_basic_features()
+        for cache_dir in [None, self.cache_dir, self.cache_dir]:
+            reordered = SATInstance("cnf_examples/tseitin_10_4.cnf", preprocess=False, cache_dir=cache_dir, reorder=True)
+
+            clauses = [sorted(int(np.sign(lit)) * reordered.original_var(abs(lit)) for lit in clause)
+                       for clause in reordered.clauses]
+            self.assertEqual([sorted(sat_inst.clauses[i]) for i in reordered.clause_map.tolist()], clauses)
+
+            # the base features do not depend on the order of the variables and clauses
+            reordered.gen_basic_features()
+            self.assertEqual(sat_inst.features_dict, reordered.features_dict)
+
+
+if __name__ == '__main__':
+    os.chdir("..")
+    unittest.main()
@@ -0,0 +1,103 @@
+import bz2
+import gzip
+import lzma
+import os
+import tempfile
+import unittest
+
+from feature_computation import parse_cnf, cnf_stream
+
+
+def legacy_parse_cnf(cnf_path):
+    """
+    The original line based parser, kept here as the reference for well formed files.
+    """
+    with open(cnf_path) as f:
+        clauses_list = []
+        for line in f:
+            if line[0] == 'c' or line[0] == 'p':
+                continue
+            clauses_list.append([int(x) for x in line.split(" ")[:-1]])
+    return clauses_list
+
+
+class ParseCnfTest(unittest.TestCase):
+    """
+    Run from the project root directory (SATfeatPy)
+    """
+
+    def write_cnf(self, text):
+        f = tempfile.NamedTemporaryFile("wb", suffix=".cnf", delete=False)
+        f.write(text)
+        f.close()
+        self.addCleanup(os.remove, f.name)
+        return f.name
+
+    def test_matches_legacy_parser(self):
+        test_files = ["basic.cnf", "php10_7.cnf", "parity_5.cnf", "parity_6.cnf", "subsetcard_5.cnf", "tseitin_10_4.cnf"]
+        file_directory = "cnf_examples/"
+
+        for test_file in test_files:
+            clauses, c, v = parse_cnf.parse_cnf(file_directory + test_file)
+            self.assertEqual(legacy_parse_cnf(file_directory + test_file), clauses)
+            self.assertEqual(len(clauses), c)
+
+    def test_csr_layout(self):
+        cnf_path = self.write_cnf(b"c comment\np cnf 5 4\n1 -2 0 3\n\t4 0\nc mid\n-5 0 1 2 3 4 5 0\n%\n0\n")
+
+        for block_size in [1, 3, 7, parse_cnf.BLOCK_SIZE]:
+            literals, clause_offsets, c, v = parse_cnf.parse_cnf_csr(cnf_path, block_size)
+            self.assertEqual(literals.dtype.name, "int32")
+            self.assertEqual(clause_offsets.dtype.name, "int64")
+            self.assertEqual([1, -2, 3, 4, -5, 1, 2, 3, 4, 5], literals.tolist())
+            self.assertEqual([0, 2, 4, 5, 10], clause_offsets.tolist())
+            self.assertEqual((4, 5), (c, v))
+
+    def test_header_validation(self):
+        cnf_path = self.write_cnf(b"p cnf 2 1\n1 2 0\n-1 0\n")
+        with self.assertRaises(ValueError):
+            parse_cnf.parse_cnf_csr(cnf_path)
+
+        cnf_path = self.write_cnf(b"p cnf 2 2\n1 3 0\n-1 0\n")
+        with self.assertRaises(ValueError):
+            parse_cnf.parse_cnf_csr(cnf_path)
+
+    def test_compressed_input(self):
+        cnf_path = "cnf_examples/php10_7.cnf"
+        with open(cnf_path, "rb") as f:
+            text = f.read()
+        literals, clause_offsets, c, v = parse_cnf.parse_cnf_csr(cnf_path)
+
+        for codec, compress in [("gzip", gzip.compress), ("bz2", bz2.compress), ("xz", lzma.compress)]:
+            # the codec is detected from the magic bytes, not the suffix
+            compressed_path = self.write_cnf(compress(text))
+            self.assertEqual(codec, cnf_stream.detect_codec(compressed_path))
+
+            res = parse_cnf.parse_cnf_csr(compressed_path, block_size=512)
+            self.assertEqual(literals.tolist(), res[0].tolist())
+            self.assertEqual(clause_offsets.tolist(), res[1].tolist())
+            self.assertEqual((c, v), res[2:])
+
+            plain_path, is_tmp = cnf_stream.plain_cnf_path(compressed_path)
+            self.assertTrue(is_tmp)
+            with open(plain_path, "rb") as f:
+                self.assertEqual(text, f.read())
+            os.remove(plain_path)
+
+    def test_parallel_matches_serial(self):
+        # small chunks, so that clauses span chunk boundaries
+        text = b"c comment\np cnf 5 6\n1 -2\n 0 3\n\t4 0\nc mid\n-5 0 1 2\n 3 4 5 0\n1 0\n2\n0\n%\n0\n1 2 0\n"
+        test_files = [self.write_cnf(text), "cnf_examples/php10_7.cnf", "cnf_examples/tseitin_10_4.cnf"]
+
+        for cnf_path in test_files:
+            literals, clause_offsets, c, v = parse_cnf.parse_cnf_csr(cnf_path)
+            for num_workers in [2, 3, 8]:
+                res = parse_cnf.parse_cnf_parallel(cnf_path, num_workers, block_size=5, min_chunk_size=1)
+                self.assertEqual(literals.tolist(), res[0].tolist())
+                self.assertEqual(clause_offsets.tolist(), res[1].tolist())
+                self.assertEqual((c, v), res[2:])
+
+
+if __name__ == '__main__':
+    os.chdir("..")
+    unittest.main()
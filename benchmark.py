@@ -1,12 +1,24 @@
 import os
+import signal
 import subprocess
 import time
 import re
+import tempfile
 from result import Result
-    
+from SATfeatPy.feature_computation.cnf_stream import CNF_SUFFIXES, detect_codec
+
+# command line tool that streams each codec of cnf_stream.detect_codec to stdout
+CODEC_COMMANDS = {
+    "gzip": "gzip",
+    "bz2": "bzip2",
+    "xz": "xz",
+    "zstd": "zstd",
+}
+BENCHMARK_SUFFIXES = CNF_SUFFIXES + (".smt",)
+
 class Benchmark:
-    def __init__(self, fn, timeout, solver_kind, solver_args):
-        self.path      = fn # anni_2022/{hash}-{name}.cnf
+    def __init__(self, fn, timeout, solver_kind, solver_args, decompress="pipe", scratch_dir=None, scratch_limit=None):
+        self.path      = fn # anni_2022/{hash}-{name}.cnf[.xz]
         basename = os.path.basename(fn)
         pos = basename.find("-")
         self.hash       = basename[:pos]
@@ -16,21 +28,122 @@ class Benchmark:
         self.solver_args = solver_args
         self.limit_time = timeout
         self.limit_memory = 2000
+        # compressed benchmarks are either piped into the solver ("pipe"),
+        # or unpacked into a scratch file of at most scratch_limit bytes ("scratch")
+        self.codec = detect_codec(fn)
+        self.decompress = decompress
+        self.scratch_dir = scratch_dir
+        self.scratch_limit = scratch_limit
 
-    def execute(self):
+    def solver_command(self, path):
+        # path "-" means the formula is read from stdin
+        if path == "-":
+            z3_input = "-dimacs -in"
+            path = ""
+        else:
+            z3_input = path
         COMMAND_MAP = {
-            "z3": f"solver/z3 {self.solver_args} -T:{self.limit_time} -memory:{self.limit_memory} {self.path}",
-            "kissat": f"solver/kissat-3.1.0 {self.solver_args} -q -n --time={self.limit_time} {self.path}",
-            "cadical": f"solver/cadical-1.9.0 {self.solver_args} -q -n -t {self.limit_time} {self.path}",
-            "cryptominisat": f"solver/cryptominisat5 {self.solver_args} --verb=0 --maxtime={self.limit_time} {self.path}"
+            "z3": f"solver/z3 {self.solver_args} -T:{self.limit_time} -memory:{self.limit_memory} {z3_input}",
+            "kissat": f"solver/kissat-3.1.0 {self.solver_args} -q -n --time={self.limit_time} {path}",
+            "cadical": f"solver/cadical-1.9.0 {self.solver_args} -q -n -t {self.limit_time} {path}",
+            "cryptominisat": f"solver/cryptominisat5 {self.solver_args} --verb=0 --maxtime={self.limit_time} {path}"
         }
-        print(COMMAND_MAP[self.solver_kind])
+        return COMMAND_MAP[self.solver_kind]
+
+    def decompress_command(self):
+        return [CODEC_COMMANDS[self.codec], "-dc", self.path]
+
+    def start_decompress(self):
+        # the decompressor's stderr goes to a temporary file, not a pipe: its warnings are only read once it exits, and
+        # a full pipe would block it while the solver waits for the rest of the formula
+        decompress_log = tempfile.TemporaryFile()
+        decompress = subprocess.Popen(self.decompress_command(), stdout=subprocess.PIPE, stderr=decompress_log)
+        return decompress, decompress_log
+
+    @staticmethod
+    def finish_decompress(decompress, decompress_log):
+        # waits for the decompressor, returns its stderr
+        decompress.wait()
+        decompress_log.seek(0)
+        decompress_err = decompress_log.read().decode(errors="replace")
+        decompress_log.close()
+        return decompress_err
+
+    def unpack_to_scratch(self):
+        # stream the decompressed benchmark into a scratch file, giving up once it exceeds the limit
+        # returns the scratch file, or None and the reason it could not be unpacked
+        fd, scratch = tempfile.mkstemp(prefix="bench-", suffix=".cnf", dir=self.scratch_dir)
+        written = 0
+        over_limit = False
+        with os.fdopen(fd, "wb") as out:
+            proc, decompress_log = self.start_decompress()
+            for chunk in iter(lambda: proc.stdout.read(1 << 22), b""):
+                written += len(chunk)
+                if self.scratch_limit is not None and written > self.scratch_limit:
+                    over_limit = True
+                    proc.kill()
+                    break
+                out.write(chunk)
+            proc.stdout.close()
+            decompress_err = self.finish_decompress(proc, decompress_log)
+        if over_limit:
+            os.remove(scratch)
+            return None, f"decompressed benchmark exceeds {self.scratch_limit} bytes"
+        if proc.returncode != 0:
+            # a truncated or corrupt benchmark must not reach the solver as a valid formula
+            os.remove(scratch)
+            return None, f"{self.codec} failed with exit code {proc.returncode}: {decompress_err}"
+        return scratch, None
+
+    def run_piped(self):
+        # the decompressor writes into the solver's stdin; returns the solver's log, its elapsed time (which includes
+        # waiting for the decoded formula), and the decompressor's error if it failed
+        decompress, decompress_log = self.start_decompress()
         start_time = time.perf_counter()
-        log = subprocess.run(COMMAND_MAP[self.solver_kind],
-                             capture_output=True, shell=True, text=True)
+        solver = subprocess.Popen(self.solver_command("-"), stdin=decompress.stdout, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, shell=True, text=True)
+        # the solver holds the only reading end, so the decompressor gets SIGPIPE if the solver stops early
+        decompress.stdout.close()
+        stdout, stderr = solver.communicate()
+        end_time = time.perf_counter()
+        decompress_err = self.finish_decompress(decompress, decompress_log)
+
+        error = None
+        if decompress.returncode not in (0, -signal.SIGPIPE):
+            error = f"{self.codec} failed with exit code {decompress.returncode}: {decompress_err}"
+        log = subprocess.CompletedProcess(self.solver_command("-"), solver.returncode, stdout, stderr)
+        return log, end_time - start_time, error
+
+    def execute(self):
+        if self.codec is not None and self.decompress == "pipe":
+            print(f"{' '.join(self.decompress_command())} | {self.solver_command('-')}")
+            log, elapsed_s, error = self.run_piped()
+            if error is not None:
+                return Result(self, "error", error, elapsed_s, includes_decoding=True)
+            return self.parse_result(log, elapsed_s, includes_decoding=True)
+
+        scratch = None
+        if self.codec is None:
+            command = self.solver_command(self.path)
+        else:
+            scratch, error = self.unpack_to_scratch()
+            if scratch is None:
+                return Result(self, "error", error, 0.0)
+            command = self.solver_command(scratch)
+        print(command)
+        start_time = time.perf_counter()
+        try:
+            log = subprocess.run(command,
+                                 capture_output=True, shell=True, text=True)
+        finally:
+            if scratch is not None:
+                os.remove(scratch)
         end_time = time.perf_counter()
 
         elapsed_s = end_time - start_time
+        return self.parse_result(log, elapsed_s)
+
+    def parse_result(self, log, elapsed_s, includes_decoding=False):
         # print("stdout:")
         # print(log.stdout)
         # print("stderr:")
@@ -54,4 +167,4 @@ class Benchmark:
         else:
             status = "unknown"
 
-        return Result(self, status, log.stderr, elapsed_s)
\ No newline at end of file
+        return Result(self, status, log.stderr, elapsed_s, includes_decoding)
\ No newline at end of file
@@ -1,12 +1,14 @@
 import datetime
 
 class Result(object):
-    def __init__(self, bm, status, comment, cpu_time):
+    def __init__(self, bm, status, comment, cpu_time, includes_decoding=False):
         assert status in ("sat", "unsat", "unknown", "timeout", "oom", "error")
         self.benchmark     = bm
         self.status        = status
         self.comment       = comment
         self.cpu_time      = cpu_time
+        # the benchmark was piped from its decompressor, so cpu_time also covers the solver waiting for the decoding
+        self.includes_decoding = includes_decoding
 
     def __str__(self):
         MAP = {
@@ -18,7 +20,8 @@ class Result(object):
             "error"   : 'err',
         }
 
-        return f"(runtime:{self.cpu_time}) [{MAP[self.status]}] {self.benchmark.name}"
+        decoding = " incl. decoding" if self.includes_decoding else ""
+        return f"(runtime:{self.cpu_time}{decoding}) [{MAP[self.status]}] {self.benchmark.name}"
 
     def print_summary(self, progress, start_time):
         now = datetime.datetime.now()
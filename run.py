@@ -4,7 +4,7 @@ import os
 import datetime
 import pandas as pd
 
-from benchmark import Benchmark
+from benchmark import Benchmark, BENCHMARK_SUFFIXES
 
 def process(bm):
     return bm.execute()
@@ -32,6 +32,17 @@ def main():
                     default=30,
                     type=int,
                     help="set global timeout, default is 60 seconds")
+    ap.add_argument("--decompress",
+                    default="pipe",
+                    choices=["pipe", "scratch"],
+                    help="how compressed benchmarks reach the solver: piped to stdin, or unpacked to a scratch file")
+    ap.add_argument("--scratch_dir",
+                    default=None,
+                    help="directory for scratch files, default is the system temp directory")
+    ap.add_argument("--scratch_limit",
+                    default=None,
+                    type=float,
+                    help="largest decompressed benchmark (in GB) unpacked to a scratch file")
     ### Result ###
     ap.add_argument("--add_to_csv",
                     default=None)
@@ -49,11 +60,14 @@ def main():
         cnt = 0
         for path, _, files in os.walk(d):
             for file in sorted(files):
-                if file.endswith(".cnf") or file.endswith(".smt"):
+                if file.endswith(BENCHMARK_SUFFIXES):
                     bm = Benchmark(os.path.join(path, file), 
                                    options.timeout, 
                                    options.solver_kind, 
-                                   options.solver_args)
+                                   options.solver_args,
+                                   options.decompress,
+                                   options.scratch_dir,
+                                   int(options.scratch_limit * 2**30) if options.scratch_limit else None)
                     benchmarks.append(bm)
                     cnt += 1
                     if options.count and cnt >= options.count: